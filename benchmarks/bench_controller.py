@@ -0,0 +1,83 @@
+import contextlib
+import logging
+import time
+from log_utils import LOGGER_ROOT
+from traffic_logic import TrafficLightController
+
+APPROACHES_PER_INTERSECTION = 4
+VEHICLE_TYPES = ('car', 'bus', 'truck', 'Motorcycle')
+
+
+def build_config(num_intersections):
+    timings = {
+        "min_green": 8, "yellow": 3, "all_red": 1, "gap_time": 3.5, "skip_threshold": 2.0,
+        "emergency_green": 12, "ambulance_request_timeout": 8.0, "base_max_green": 20,
+        "queued_weighted_demand_extension_factor": 0.5, "absolute_max_green": 45,
+        "realtime_flow_extension_increment": 1.5, "realtime_flow_min_weighted_demand": 2.5,
+    }
+    traffic_config = {}
+    for int_index in range(num_intersections):
+        phases = {f"Green{approach_index}": [f"I{int_index}-A{approach_index}"] for approach_index in range(APPROACHES_PER_INTERSECTION)}
+        traffic_config[f"I{int_index}"] = {"phases": phases, "timings": dict(timings), "demand_threshold": 3.0}
+    return traffic_config
+
+
+def _time_loop(iterations, body):
+    start = time.perf_counter()
+    for iteration in range(iterations):
+        body(iteration)
+    return time.perf_counter() - start
+
+
+@contextlib.contextmanager
+def _quiet_controller_logging():
+    # Unconfigured, controller warnings reach stderr via logging.lastResort inside the timed loop
+    traffic_logger = logging.getLogger(LOGGER_ROOT)
+    null_handler = logging.NullHandler()
+    saved_propagate = traffic_logger.propagate
+    traffic_logger.addHandler(null_handler)
+    traffic_logger.propagate = False
+    try:
+        yield
+    finally:
+        traffic_logger.removeHandler(null_handler)
+        traffic_logger.propagate = saved_propagate
+
+
+def _measure(num_intersections, demand_updates, ticks):
+    controller = TrafficLightController(build_config(num_intersections), {'car': 1.0, 'bus': 3.0, 'truck': 2.0}, 1.0)
+    approaches = sorted(controller.get_all_approach_names())
+    sim_time = [time.time()]
+
+    def demand_body(iteration):
+        approach_name = approaches[iteration % len(approaches)]
+        controller.update_demand(approach_name, iteration % 5, sim_time[0], ambulance_detected=(iteration % 997 == 0))
+        controller.update_weighted_demand(approach_name, {VEHICLE_TYPES[iteration % 4]: iteration % 3}, sim_time[0])
+
+    demand_seconds = _time_loop(demand_updates, demand_body)
+    tick_seconds = 0.0
+    for iteration in range(ticks):
+        sim_time[0] += 0.5
+        demand_body(iteration)
+        tick_start = time.perf_counter()
+        controller.update_state(sim_time[0])
+        tick_seconds += time.perf_counter() - tick_start
+        controller.drain_state_events()
+    return len(approaches), demand_seconds, tick_seconds
+
+
+def run(intersection_counts=(1, 10, 100), demand_updates=20000, ticks=2000, repeats=5):
+    """ Returns result records: update_demand/update_weighted_demand cost per call and update_state cost per tick (best of `repeats`). """
+    results = []
+    for num_intersections in intersection_counts:
+        with _quiet_controller_logging():
+            runs = [_measure(num_intersections, demand_updates, ticks) for _ in range(repeats)]
+        num_approaches = runs[0][0]
+        demand_seconds = min(run_result[1] for run_result in runs)
+        tick_seconds = min(run_result[2] for run_result in runs)
+        params = {'intersections': num_intersections, 'approaches': num_approaches}
+        results.append({'name': 'controller.update_demand+weighted', 'params': dict(params, calls=demand_updates),
+                        'value': demand_seconds / demand_updates * 1e6, 'unit': 'us/call', 'higher_is_better': False})
+        results.append({'name': 'controller.update_state', 'params': dict(params, ticks=ticks),
+                        'value': tick_seconds / ticks * 1e6, 'unit': 'us/tick', 'higher_is_better': False})
+    return results
@@ -0,0 +1,74 @@
+import multiprocessing as mp
+import os
+import time
+from queue import Empty
+from benchmarks.synthetic_clips import ensure_clips, lane_polygon
+from video_processor import process_video_worker
+
+
+def _run_once(model_name, clip_paths, every_n, num_threads, device, conf_threshold, target_classes, timeout_s, inference_mode="seg"):
+    results_queue = mp.Queue()
+    processes = []
+    for clip_index, clip_path in enumerate(clip_paths):
+        camera_name = f"Bench{clip_index}"
+        worker_args = (camera_name, clip_path, model_name, None, list(target_classes), [], conf_threshold,
+                       every_n, device, results_queue, {camera_name: lane_polygon(640, 360)})
+        resource_plan = {'cpus': None, 'intra_op_threads': num_threads, 'cv2_threads': num_threads}
+        process = mp.Process(target=process_video_worker, args=worker_args, kwargs={'resource_plan': resource_plan, 'inference_mode': inference_mode}, daemon=True)
+        process.start()
+        processes.append(process)
+
+    summaries, errors, lane_updates = [], [], 0
+    deadline = time.monotonic() + timeout_s
+    try:
+        while len(summaries) + len(errors) < len(clip_paths) and time.monotonic() < deadline:
+            try:
+                message = results_queue.get(timeout=1.0)
+            except Empty:
+                if not any(p.is_alive() for p in processes): break
+                continue
+            if message.get('type') == 'final_summary': summaries.append(message)
+            elif message.get('type') == 'error': errors.append(message.get('message'))
+            elif message.get('type') == 'lane_update': lane_updates += 1
+    finally:
+        for process in processes:
+            process.join(timeout=10.0)
+            if process.is_alive(): process.terminate()
+
+    if errors or len(summaries) < len(clip_paths):
+        raise RuntimeError(f"Benchmark run failed: {errors or 'timed out / missing summaries'}")
+    busiest_seconds = max(summary['processing_time_sec'] for summary in summaries)
+    frames_read = sum(summary['total_frames_read'] for summary in summaries)
+    frames_processed = sum(summary['processed_frames_counted'] for summary in summaries)
+    return {'frames_read_per_s': frames_read / busiest_seconds, 'frames_processed_per_s': frames_processed / busiest_seconds,
+            'lane_updates': lane_updates}
+
+
+def run(model_name="yoloe-11s-seg.pt", every_n_values=(1, 5), approach_counts=(1, 2), thread_counts=(1, None),
+        device="cpu", clip_frames=150, conf_threshold=0.1, target_classes=('car', 'bus', 'truck'), timeout_s=900,
+        inference_modes=("seg", "detect")):
+    """
+    Runs process_video_worker on synthetic clips over the parameter grid; None in thread_counts means all cores.
+    Seg results keep their original params (no 'inference_mode' key) so they still compare against older runs.
+    """
+    ctx_method = mp.get_start_method(allow_none=True)
+    if ctx_method is None: mp.set_start_method('spawn')
+    clip_paths = ensure_clips(max(approach_counts), num_frames=clip_frames)
+    results = []
+    for inference_mode in inference_modes:
+        for num_approaches in approach_counts:
+            for every_n in every_n_values:
+                for num_threads in thread_counts:
+                    threads = num_threads or os.cpu_count() or 1
+                    measured = _run_once(model_name, clip_paths[:num_approaches], every_n, threads, device,
+                                         conf_threshold, target_classes, timeout_s, inference_mode)
+                    params = {'model': model_name, 'device': device, 'approaches': num_approaches, 'process_every_n': every_n,
+                              'threads': threads, 'clip_frames': clip_frames}
+                    if inference_mode != "seg": params['inference_mode'] = inference_mode
+                    results.append({'name': 'detection.frames_read_per_s', 'params': params,
+                                    'value': measured['frames_read_per_s'], 'unit': 'frames/s', 'higher_is_better': True})
+                    results.append({'name': 'detection.frames_processed_per_s', 'params': params,
+                                    'value': measured['frames_processed_per_s'], 'unit': 'frames/s', 'higher_is_better': True})
+                    print(f"[Bench] mode={inference_mode} approaches={num_approaches} every_n={every_n} threads={threads}: "
+                          f"{measured['frames_read_per_s']:.1f} read/s, {measured['frames_processed_per_s']:.1f} processed/s")
+    return results
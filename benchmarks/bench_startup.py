@@ -0,0 +1,25 @@
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("torch", "ultralytics", "matplotlib", "cv2")
+_PROBE = ("import sys, time, json; start = time.perf_counter(); import gui; "
+          "print(json.dumps({'seconds': time.perf_counter() - start, "
+          "'heavy': [name for name in %r if name in sys.modules]}))" % (HEAVY_MODULES,))
+
+
+def run(repeats=5):
+    """ Times `import gui` (the GUI process import graph) in fresh interpreters; best of `repeats`. """
+    samples = []
+    for _ in range(repeats):
+        output = subprocess.check_output([sys.executable, "-c", _PROBE], cwd=REPO_ROOT, text=True, stderr=subprocess.DEVNULL)
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    best = min(samples, key=lambda sample: sample['seconds'])
+    params = {'repeats': repeats}
+    return [
+        {'name': 'startup.import_gui', 'params': params, 'value': best['seconds'] * 1000, 'unit': 'ms', 'higher_is_better': False},
+        {'name': 'startup.heavy_modules_in_gui', 'params': params, 'value': len(best['heavy']), 'unit': 'modules',
+         'higher_is_better': False, 'detail': best['heavy']},
+    ]
@@ -0,0 +1,52 @@
+import argparse
+import json
+import sys
+
+
+def _result_key(result):
+    return (result['name'], json.dumps(result['params'], sort_keys=True))
+
+
+def compare(baseline, candidate, threshold):
+    """ Returns (rows, regressions); a regression is a change in the bad direction larger than `threshold` (fraction). """
+    baseline_by_key = {_result_key(result): result for result in baseline['results']}
+    rows, regressions = [], []
+    for result in candidate['results']:
+        base = baseline_by_key.get(_result_key(result))
+        if base is None:
+            continue
+        if base['value']:
+            change = (result['value'] - base['value']) / base['value']
+        else:
+            change = 0.0 if result['value'] == base['value'] else (float('inf') if result['value'] > 0 else float('-inf'))
+        worse = -change if result.get('higher_is_better') else change
+        row = (result['name'], result['params'], base['value'], result['value'], result['unit'], change)
+        rows.append(row)
+        if worse > threshold: regressions.append(row)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two run_benchmarks.py result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown as a fraction (default 0.10).")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline, encoding='utf-8') as f: baseline = json.load(f)
+    with open(args.candidate, encoding='utf-8') as f: candidate = json.load(f)
+    rows, regressions = compare(baseline, candidate, args.threshold)
+
+    print(f"Baseline {baseline['meta'].get('git_revision')} vs candidate {candidate['meta'].get('git_revision')}")
+    for name, params, base_value, new_value, unit, change in rows:
+        marker = "REGRESSION" if (name, params, base_value, new_value, unit, change) in regressions else ""
+        print(f"  {name:<36} {json.dumps(params, sort_keys=True):<90} {base_value:10.3f} -> {new_value:10.3f} {unit:<9} {change * 100:+6.1f}% {marker}")
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold * 100:.0f}%.")
+        return 1
+    print("No regressions.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path: sys.path.insert(0, REPO_ROOT)
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _int_list(text):
+    return [int(item) if item != "all" else None for item in text.split(",") if item]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detection throughput and controller tick benchmarks.")
+    parser.add_argument("--suite", choices=("all", "controller", "detection", "startup"), default="all")
+    parser.add_argument("--out", default=None, help="Result JSON path (default: benchmarks/results/<git rev>.json).")
+    parser.add_argument("--model", default="yoloe-11s-seg.pt")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--every-n", type=_int_list, default=[1, 5], help="Comma-separated PROCESS_EVERY_N_FRAMES values.")
+    parser.add_argument("--approaches", type=_int_list, default=[1, 2], help="Comma-separated concurrent approach counts.")
+    parser.add_argument("--threads", type=_int_list, default=[1, None], help="Comma-separated CPU thread counts ('all' = every core).")
+    parser.add_argument("--clip-frames", type=int, default=150)
+    parser.add_argument("--inference-modes", type=lambda text: [mode for mode in text.split(",") if mode], default=["seg", "detect"],
+                        help="Comma-separated INFERENCE_MODE values to benchmark (seg, detect).")
+    parser.add_argument("--intersections", type=_int_list, default=[1, 10, 100], help="Controller sizes to micro-benchmark.")
+    args = parser.parse_args(argv)
+
+    results = []
+    if args.suite in ("all", "controller"):
+        from benchmarks import bench_controller
+        results += bench_controller.run(intersection_counts=args.intersections)
+    if args.suite in ("all", "startup"):
+        from benchmarks import bench_startup
+        results += bench_startup.run()
+    if args.suite in ("all", "detection"):
+        from benchmarks import bench_detection
+        results += bench_detection.run(model_name=args.model, every_n_values=args.every_n, approach_counts=args.approaches,
+                                       thread_counts=args.threads, device=args.device, clip_frames=args.clip_frames,
+                                       inference_modes=args.inference_modes)
+
+    revision = _git_revision()
+    report = {
+        'meta': {'git_revision': revision, 'timestamp': dt.datetime.now().isoformat(timespec='seconds'),
+                 'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+                 'suite': args.suite},
+        'results': results,
+    }
+    out_path = args.out or os.path.join(REPO_ROOT, "benchmarks", "results", f"{revision}.json")
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    with open(out_path, 'w', encoding='utf-8') as out_file:
+        json.dump(report, out_file, indent=2)
+    for result in results:
+        print(f"[Bench] {result['name']} {result['params']}: {result['value']:.3f} {result['unit']}")
+    print(f"[Bench] Wrote {len(results)} results to {out_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+import os
+import numpy as np
+import cv2
+
+CLIP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "clips")
+
+
+def lane_polygon(width, height):
+    """ Trapezoid lane covering the middle of the synthetic road. """
+    return np.array([[int(width * 0.30), height - 1], [int(width * 0.70), height - 1],
+                     [int(width * 0.58), int(height * 0.25)], [int(width * 0.42), int(height * 0.25)]], dtype=np.int32)
+
+
+def generate_clip(path, num_frames=150, width=640, height=360, fps=25, num_vehicles=6, seed=0):
+    """ Deterministic road scene with box 'vehicles' moving down the lane; same seed, same bytes on the same OpenCV build. """
+    rng = np.random.default_rng(seed)
+    background = np.full((height, width, 3), (70, 110, 60), dtype=np.uint8)
+    cv2.fillPoly(background, [np.array([[int(width * 0.2), height - 1], [int(width * 0.8), height - 1],
+                                        [int(width * 0.6), 0], [int(width * 0.4), 0]], dtype=np.int32)], (90, 90, 90))
+    for y in range(0, height, 40):
+        cv2.line(background, (width // 2, y), (width // 2, y + 20), (230, 230, 230), 2)
+
+    vehicles = [{'x': rng.uniform(0.42, 0.58) * width, 'y': rng.uniform(-height, height * 0.5),
+                 'speed': rng.uniform(2.0, 6.0), 'w': rng.integers(30, 70), 'h': rng.integers(40, 90),
+                 'color': tuple(int(c) for c in rng.integers(40, 255, size=3))} for _ in range(num_vehicles)]
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise IOError(f"Could not open video writer for {path}")
+    try:
+        for _ in range(num_frames):
+            frame = background.copy()
+            for vehicle in vehicles:
+                vehicle['y'] += vehicle['speed']
+                if vehicle['y'] > height: vehicle['y'] = -vehicle['h']
+                x0, y0 = int(vehicle['x'] - vehicle['w'] / 2), int(vehicle['y'])
+                cv2.rectangle(frame, (x0, y0), (x0 + int(vehicle['w']), y0 + int(vehicle['h'])), vehicle['color'], -1)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
+
+
+def ensure_clips(count, num_frames=150, width=640, height=360):
+    """ Generates (once) and returns `count` clip paths, one per benchmark approach. """
+    paths = []
+    for clip_index in range(count):
+        path = os.path.join(CLIP_DIR, f"synthetic_{width}x{height}_{num_frames}f_{clip_index}.mp4")
+        if not os.path.exists(path):
+            generate_clip(path, num_frames=num_frames, width=width, height=height, seed=clip_index)
+        paths.append(path)
+    return paths
@@ -1,13 +1,30 @@
 VERSION = "3.6 (Weighted Green Time)"
 MODEL_NAME = "yoloe-11m-seg.pt"
+INFERENCE_MODE = "seg"  # "seg": run the model as is; "detect": load the seg checkpoint into the box-only YOLOE architecture (no mask head; only boxes are used) - compare both with benchmarks/bench_detection.py first
 AMBULANCE_MODEL_NAME = "C:\\Users\\harish\\Downloads\\last.pt"
 AMBULANCE_CLASS_NAMES = ["ambulance","ambulanceSiren"]
+AMBULANCE_DETECTION_MODE = "separate_model"  # "separate_model": AMBULANCE_MODEL_NAME scans every frame; "prompt": the general YOLOE model is prompted for AMBULANCE_PROMPT_CLASSES too (one inference per frame)
+AMBULANCE_PROMPT_CLASSES = ["ambulance"]  # text prompts added to TARGET_CLASSES in "prompt" mode; counted as vehicles under their own name
+AMBULANCE_VERIFY_WITH_MODEL = True  # "prompt" mode: confirm candidate boxes by running AMBULANCE_MODEL_NAME on their crops (only when candidates appear)
+AMBULANCE_VERIFY_CROP_PADDING = 0.15  # fraction of the box width/height added around each verification crop
 TARGET_CLASSES = [
     'Bicycle',  'Motorcycle',
     'bus', 'car', 'mini truck', 'truck'
  ]
 CONFIDENCE_THRESHOLD = 0.1
 PROCESS_EVERY_N_FRAMES = 5
+ADAPTIVE_SAMPLING_ENABLED = True
+ADAPTIVE_SAMPLING_GREEN_EVERY_N = 2
+ADAPTIVE_SAMPLING_IDLE_EVERY_N = 15
+ADAPTIVE_SAMPLING_STABLE_QUEUE_SECONDS = 5.0
+MOTION_WAKE_CHECK_EVERY_N = 3
+MOTION_PIXEL_DELTA = 25
+MOTION_MIN_CHANGED_FRACTION = 0.02
+MOTION_DOWNSAMPLE_SCALE = 0.25
+MOTION_GATE_ENABLED = True
+MOTION_GATE_MIN_CHANGED_FRACTION = 0.01
+MOTION_GATE_BACKGROUND_RATE = 0.05
+MOTION_GATE_MAX_REUSE_FRAMES = 25
 VEHICLE_TYPE_WEIGHTS = {
     'bus': 3.0,
     'truck': 2.0,
@@ -23,6 +40,10 @@ VIDEO_PATHS = [
     ("Westbound", "C:\\Users\\Harish\\Downloads\\vids\\amb2.mp4"),
     ("Southbound", "C:\\Users\\Harish\\Downloads\\vids\\vid4.mp4"),
 ]
+# Optional: split one camera (a VIDEO_PATHS name) into several zones, each a separate approach.
+# e.g. "Northbound": ["Northbound-Left", "Northbound-Through", "Northbound-Right"]
+CAMERA_ZONES = {
+}
 TRAFFIC_LIGHT_CONFIG = {
     "Intersection1": {
         "phases": {
@@ -49,6 +70,15 @@ TRAFFIC_LIGHT_CONFIG = {
     },
 }
 QUEUE_CHECK_INTERVAL_MS = 100
+QUEUE_DRAIN_MAX_MS = 25
+QUEUE_WAKEUP_ENABLED = True  # workers signal a pipe the Tk loop watches, so queues drain on arrival (POSIX; Windows keeps polling)
+QUEUE_FALLBACK_POLL_MS = 500  # safety poll while the wakeup pipe is active (dead-worker checks, missed wakeups)
+LANE_CHANNEL_CAPACITY_PER_APPROACH = 8  # bounded per-camera lane_update channel (x zones); the oldest update is dropped when full
+LANE_UPDATE_MAX_AGE_S = 2.0  # lane updates whose frame was captured longer ago than this are discarded, not fed to the controller
+LANE_UPDATE_SUPPRESS_UNCHANGED = True  # workers send a zone's lane_update only when its counts / ambulance flag change, plus heartbeats
+WORKER_HEARTBEAT_INTERVAL_S = 1.0  # max silence per zone while suppressing; keep well below gap_time and ambulance_request_timeout
+EMERGENCY_FAST_PATH_ENABLED = True  # ambulance detections go through a priority queue and trigger preemption on arrival
+EMERGENCY_ALERT_REPEAT_S = 1.0  # per approach, while the ambulance stays in view (also refreshes the request timeout)
 TRAFFIC_LOGIC_UPDATE_INTERVAL_MS = 500
 PLOT_UPDATE_INTERVAL_MS = 2000
 DEFAULT_FONT_SIZE = 10
@@ -61,12 +91,49 @@ UI_TRAFFIC_LIGHT_COLS = 2
 PLOT_HISTORY_SECONDS = 60
 PLOT_MAX_POINTS = int((PLOT_HISTORY_SECONDS * 1000) / max(1, QUEUE_CHECK_INTERVAL_MS))
 PLOT_ENABLE = True
+METRICS_ENABLED = True
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+LATENCY_TRACE_WINDOW = 2048
+PROFILE_ENABLED = False  # also enabled by `python main.py --profile`
+PROFILE_SAMPLING = False
+PROFILE_SAMPLING_INTERVAL_S = 0.005
+PROFILE_OUTPUT_DIR = "profiles"
+INFERENCE_DEVICE = "auto"  # "auto" picks cuda when available, resolved inside each worker; or "cpu" / "cuda" / "cuda:1"
+WORKER_RESTART_ENABLED = True  # restart crashed workers (resuming from their last frame); their approaches run on recall meanwhile
+WORKER_RESTART_MAX_ATTEMPTS = 5  # consecutive failures before a camera is given up (it then stays on recall)
+WORKER_RESTART_BACKOFF_S = 1.0  # doubled after each consecutive failure
+WORKER_RESTART_BACKOFF_MAX_S = 60.0
+WORKER_HEALTHY_AFTER_S = 120.0  # uptime after which the failure count resets
+PRELAUNCH_WORKERS = True  # start workers (model load + warm-up) while lane polygons are still being drawn
+WORKER_START_METHOD = "spawn"  # "forkserver" (Linux/macOS): fork workers from a template with torch/ultralytics already imported
+WORKER_PRELOAD_MODELS = True  # with forkserver, also load MODEL_NAME / AMBULANCE_MODEL_NAME into the template (shared copy-on-write)
+RESOURCE_PLANNING_ENABLED = True  # give each worker its own CPU block and matching torch/OpenCV thread counts
+RESOURCE_PIN_CPUS = True
+RESOURCE_RESERVED_CORES = 1  # left unpinned for the GUI / controller process
+RESOURCE_MAX_THREADS_PER_WORKER = None  # None = the worker's whole CPU block
+LOG_FILE = "logs/traffic.jsonl"
+LOG_LEVEL = "INFO"
+LOG_CONSOLE_LEVEL = "INFO"
+LOG_MAX_BYTES = 5_000_000
+LOG_BACKUP_COUNT = 5
+LOG_RATE_LIMIT_INTERVAL_S = 5.0
+LOG_RATE_LIMIT_BURST = 5
 ESP32_ENABLED = False
 ESP32_PORT = "COM3"
 ESP32_BAUDRATE = 115200
+ESP32_PROTOCOL = "binary"  # "binary" (framed, CRC-8, ACKed) or "ascii" for firmware that still expects "N:G,E:R\n" lines
+ESP32_ACK_TIMEOUT_S = 0.5
+ESP32_RECONNECT_BACKOFF_INITIAL_S = 1.0
+ESP32_RECONNECT_BACKOFF_MAX_S = 30.0
 ESP32_APPROACH_MAPPING = {
     "Northbound": "N",
     "Eastbound": "E",
     "Westbound": "W",
     "Southbound": "S"
+}
+# Optional: one device per intersection in TRAFFIC_LIGHT_CONFIG. Intersections not listed use
+# ESP32_PORT / ESP32_APPROACH_MAPPING; intersections given the same port share one connection.
+# e.g. "Intersection2": {"port": "COM4", "approach_mapping": {"Main-North": "N", "Main-South": "S"}}
+ESP32_DEVICES = {
 }
\ No newline at end of file
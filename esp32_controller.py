@@ -1,98 +1,324 @@
 import serial
 import time
-import traceback
+import threading
+from collections import defaultdict
+import metrics
+from esp32_protocol import AckParser, encode_lamp_frame, ACK_STATUS_OK
+from log_utils import get_logger
+
+logger = get_logger("esp32")
 
 class ESP32SerialController:
-    def __init__(self, port, baudrate, approach_mapping):
+    def __init__(self, port, baudrate, approach_mapping, reconnect_backoff_initial=1.0, reconnect_backoff_max=30.0,
+                 protocol="binary", ack_timeout=0.5, on_command_sent=None):
         self.port = port
         self.baudrate = baudrate
-        self.approach_mapping = approach_mapping 
+        self.approach_mapping = approach_mapping
+        self.protocol = protocol
+        self.ack_timeout = ack_timeout
+        self.on_command_sent = on_command_sent
         self.serial_connection = None
         self.is_connected = False
-        self._connect()
+        self.reconnect_backoff_initial = reconnect_backoff_initial
+        self.reconnect_backoff_max = reconnect_backoff_max
+
+        self._condition = threading.Condition()
+        self._desired_lamps = {}
+        self._pending_trace = None
+        self._sent_lamps = None
+        self._sent_generation = 0  # bumped whenever _sent_lamps is invalidated (rejection, ACK timeout, reconnect)
+        self._pending = False
+        self._stop_requested = False
+        self._reconnect_requested = False
+        self._next_seq = 0
+        self._inflight = {}
+        self.confirmed_lamps = {}
+        self.stats = {
+            'updates_requested': 0, 'commands_sent': 0, 'commands_coalesced': 0, 'commands_dropped': 0,
+            'reconnect_attempts': 0, 'last_write_latency_ms': 0.0, 'max_write_latency_ms': 0.0, 'total_write_latency_ms': 0.0,
+            'acks_received': 0, 'acks_rejected': 0, 'ack_timeouts': 0,
+            'last_rtt_ms': 0.0, 'max_rtt_ms': 0.0, 'total_rtt_ms': 0.0,
+        }
+        self._writer_thread = threading.Thread(target=self._writer_loop, name=f"ESP32Writer-{port}", daemon=True)
+        self._writer_thread.start()
+        self._reader_thread = None
+        if self.protocol == "binary":
+            self._reader_thread = threading.Thread(target=self._reader_loop, name=f"ESP32Reader-{port}", daemon=True)
+            self._reader_thread.start()
 
     def _connect(self):
         try:
             if self.serial_connection and self.serial_connection.is_open:
                 self.serial_connection.close()
-            
-            self.serial_connection = serial.Serial(self.port, self.baudrate, timeout=1)
-            time.sleep(2) 
+
+            self.serial_connection = serial.Serial(self.port, self.baudrate, timeout=0.1, write_timeout=1)
+            time.sleep(2)
+            self.serial_connection.reset_input_buffer()
             self.is_connected = True
-            print(f"[ESP32] Successfully connected to {self.port} at {self.baudrate} baud.")
+            logger.info("Successfully connected to %s at %s baud.", self.port, self.baudrate)
         except serial.SerialException as e:
-            print(f"[ESP32 Error] Failed to connect to {self.port}: {e}")
-            self.serial_connection = None 
+            logger.error("Failed to connect to %s: %s", self.port, e)
+            self.serial_connection = None
             self.is_connected = False
-        except Exception as e_generic: 
-            print(f"[ESP32 Error] A generic error occurred during connection to {self.port}: {e_generic}")
-            traceback.print_exc()
+        except Exception as e_generic:
+            logger.exception("A generic error occurred during connection to %s: %s", self.port, e_generic)
             self.serial_connection = None
             self.is_connected = False
 
 
-    def update_lights(self, approach_statuses):
-        
-        if not self.is_connected or not self.serial_connection: 
-            return
-
-        command_parts = []
+    def update_lights(self, approach_statuses, trace=None):
+        """ Queues lamp states for the writer thread; never blocks on the serial port. """
+        lamp_changes = {}
         for approach_name, status_info in approach_statuses.items():
             short_code = self.approach_mapping.get(approach_name)
             if short_code:
-                
-                light_state_char = status_info.get('state', 'RED')[0].upper() 
-                if light_state_char not in ('R', 'Y', 'G'): 
-                    light_state_char = 'R' 
-                command_parts.append(f"{short_code}:{light_state_char}")
-        
-        if not command_parts:
-            
+                light_state_char = status_info.get('state', 'RED')[0].upper()
+                if light_state_char not in ('R', 'Y', 'G'):
+                    light_state_char = 'R'
+                lamp_changes[short_code] = light_state_char
+
+        if not lamp_changes:
             return
 
-        command_string = ",".join(command_parts) + "\n"
-        self.send_command(command_string)
+        with self._condition:
+            self.stats['updates_requested'] += 1
+            if self._pending:
+                self.stats['commands_coalesced'] += 1
+            self._desired_lamps.update(lamp_changes)
+            if trace is not None: self._pending_trace = trace
+            self._pending = True
+            self._condition.notify_all()  # the reader thread also waits on this condition while disconnected
+
+    def _format_command(self, lamp_states):
+        if self.protocol == "binary":
+            seq = self._next_seq
+            self._next_seq = (self._next_seq + 1) % 256
+            return seq, encode_lamp_frame(seq, lamp_states)
+        command_string = ",".join(f"{short_code}:{light_state_char}" for short_code, light_state_char in lamp_states.items()) + "\n"
+        return None, command_string.encode('ascii')
+
+    def _invalidate_sent(self):
+        """ Forgets what the device was last sent so the next state is resent in full. Call with the condition held. """
+        self._sent_lamps = None
+        self._sent_generation += 1
+
+    def _expire_unacked(self):
+        """ Unacknowledged frames older than ack_timeout force a full-state resend. Call with the condition held. """
+        now = time.perf_counter()
+        expired = [seq for seq, (sent_at, _) in self._inflight.items() if now - sent_at > self.ack_timeout]
+        for seq in expired:
+            del self._inflight[seq]
+            self.stats['ack_timeouts'] += 1
+        if expired:
+            self._invalidate_sent()
+            if self._desired_lamps: self._pending = True
+
+    def _writer_loop(self):
+        backoff = self.reconnect_backoff_initial
+        while not self._stop_requested:
+            if not self.is_connected or self._reconnect_requested:
+                self._reconnect_requested = False
+                self.stats['reconnect_attempts'] += 1
+                self._connect()
+                if not self.is_connected:
+                    retry_at = time.monotonic() + backoff
+                    with self._condition:
+                        while not self._stop_requested and not self._reconnect_requested and time.monotonic() < retry_at:
+                            self._condition.wait(timeout=retry_at - time.monotonic())
+                    backoff = min(backoff * 2, self.reconnect_backoff_max)
+                    continue
+                backoff = self.reconnect_backoff_initial
+                with self._condition:
+                    self._invalidate_sent()
+                    self._inflight.clear()
+                    if self._desired_lamps: self._pending = True
+
+            with self._condition:
+                self._expire_unacked()
+                while not self._pending and not self._stop_requested and not self._reconnect_requested:
+                    self._condition.wait(timeout=self.ack_timeout if self._inflight else None)
+                    self._expire_unacked()
+                if self._stop_requested or self._reconnect_requested: continue
+                lamp_states = dict(self._desired_lamps)
+                trace, self._pending_trace = self._pending_trace, None
+                self._pending = False
+                if lamp_states == self._sent_lamps:
+                    continue
+                send_generation = self._sent_generation
+
+            seq, command_bytes = self._format_command(lamp_states)
+            if seq is not None:
+                with self._condition:
+                    self._inflight[seq] = (time.perf_counter(), lamp_states)
+            if self.send_command(command_bytes):
+                with self._condition:
+                    # A rejection/timeout/reconnect during the write already asked for a resend; don't mask it
+                    if self._sent_generation == send_generation:
+                        self._sent_lamps = lamp_states
+                if trace is not None and self.on_command_sent:
+                    self.on_command_sent(trace, time.time())
+            elif seq is not None:
+                with self._condition:
+                    self._inflight.pop(seq, None)
+
+    def _reader_loop(self):
+        ack_parser = AckParser()
+        while not self._stop_requested:
+            connection = self.serial_connection
+            if not self.is_connected or connection is None:
+                with self._condition:
+                    self._condition.wait(timeout=0.2)
+                continue
+            try:
+                data = connection.read(connection.in_waiting or 1)
+            except Exception:
+                time.sleep(0.2)
+                continue
+            if data:
+                for seq, status in ack_parser.feed(data):
+                    self._handle_ack(seq, status)
+
+    def _handle_ack(self, seq, status):
+        with self._condition:
+            inflight_entry = self._inflight.pop(seq, None)
+            if inflight_entry is None:
+                return
+            sent_at, lamp_states = inflight_entry
+            rtt_ms = (time.perf_counter() - sent_at) * 1000.0
+            self.stats['last_rtt_ms'] = rtt_ms
+            self.stats['total_rtt_ms'] += rtt_ms
+            self.stats['max_rtt_ms'] = max(self.stats['max_rtt_ms'], rtt_ms)
+            metrics.SERIAL_ACK_RTT_MS.observe(rtt_ms, port=self.port)
+            if status == ACK_STATUS_OK:
+                self.stats['acks_received'] += 1
+                self.confirmed_lamps = lamp_states
+            else:
+                self.stats['acks_rejected'] += 1
+                self._invalidate_sent()
+                self._pending = True
+                self._condition.notify_all()
+
+    def lamps_confirmed(self):
+        """ True when the last state acknowledged by the device matches what the host wants shown. """
+        with self._condition:
+            return bool(self._desired_lamps) and self.confirmed_lamps == self._desired_lamps
 
-    def send_command(self, command_string):
-        """ Sends a formatted command string to the ESP32. """
+    def send_command(self, command_bytes):
+        """ Writes an encoded command (binary frame or ASCII line) to the ESP32. Runs on the writer thread. """
         if not self.is_connected or not self.serial_connection:
-            print("[ESP32 Error] Attempted to send command while not connected.")
-            return
+            return False
 
         try:
-            
-            print(f"[ESP32 Sending] > {command_string.strip()}")
-            
-            bytes_written = self.serial_connection.write(command_string.encode('ascii'))
-            self.serial_connection.flush() 
-            
+            write_start = time.perf_counter()
+            self.serial_connection.write(command_bytes)
+            self.serial_connection.flush()
+            write_latency_ms = (time.perf_counter() - write_start) * 1000.0
+            self.stats['commands_sent'] += 1
+            self.stats['last_write_latency_ms'] = write_latency_ms
+            self.stats['total_write_latency_ms'] += write_latency_ms
+            self.stats['max_write_latency_ms'] = max(self.stats['max_write_latency_ms'], write_latency_ms)
+            metrics.SERIAL_WRITE_LATENCY_MS.observe(write_latency_ms, port=self.port)
+            return True
+
         except serial.SerialTimeoutException:
-            print(f"[ESP32 Error] Serial write timeout on {self.port}.")
-            
+            logger.error("Serial write timeout on %s. Command dropped.", self.port)
+            self.stats['commands_dropped'] += 1
         except serial.SerialException as e:
-            print(f"[ESP32 Error] Failed to write to serial port {self.port}: {e}")
-            self.is_connected = False 
-            self.close() 
-        except Exception as e_gen: 
-            print(f"[ESP32 Error] Unexpected error during send to {self.port}: {e_gen}")
-            traceback.print_exc()
-            self.is_connected = False
-            self.close()
+            logger.error("Failed to write to serial port %s: %s", self.port, e)
+            self.stats['commands_dropped'] += 1
+            self._close_port()
+        except Exception as e_gen:
+            logger.exception("Unexpected error during send to %s: %s", self.port, e_gen)
+            self.stats['commands_dropped'] += 1
+            self._close_port()
+        metrics.SERIAL_COMMANDS_DROPPED.inc(port=self.port)
+        with self._condition:
+            self._pending = True
+        return False
 
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['avg_write_latency_ms'] = stats['total_write_latency_ms'] / stats['commands_sent'] if stats['commands_sent'] else 0.0
+        acks_total = stats['acks_received'] + stats['acks_rejected']
+        stats['avg_rtt_ms'] = stats['total_rtt_ms'] / acks_total if acks_total else 0.0
+        stats['is_connected'] = self.is_connected
+        stats['protocol'] = self.protocol
+        if self.protocol == "binary":
+            stats['lamps_confirmed'] = self.lamps_confirmed()
+        return stats
 
-    def close(self):
+    def _close_port(self):
         if self.serial_connection and self.serial_connection.is_open:
             try:
                 self.serial_connection.close()
-                print(f"[ESP32] Serial connection to {self.port} closed.")
+                logger.info("Serial connection to %s closed.", self.port)
             except Exception as e:
-                print(f"[ESP32 Error] Error closing serial port {self.port}: {e}")
+                logger.error("Error closing serial port %s: %s", self.port, e)
         self.is_connected = False
-        self.serial_connection = None 
+        self.serial_connection = None
+
+    def _request_stop(self):
+        with self._condition:
+            self._stop_requested = True
+            self._condition.notify_all()
+
+    def close(self):
+        self._request_stop()
+        for thread in (self._writer_thread, self._reader_thread):
+            if thread and thread.is_alive() and thread is not threading.current_thread():
+                thread.join(timeout=3.0)
+        self._close_port()
 
-    def reconnect(self): 
+    def reconnect(self):
         if not self.is_connected:
-            print(f"[ESP32] Attempting to reconnect to {self.port}...")
-            self.close() 
-            self._connect()
+            logger.info("Reconnect to %s requested.", self.port)
+            with self._condition:
+                self._reconnect_requested = True
+                self._condition.notify_all()
         return self.is_connected
+
+
+class ESP32DeviceManager:
+    """ Routes each intersection's lamp updates to its own device; intersections sharing a port share one pooled controller. """
+    def __init__(self, device_config, baudrate, **controller_kwargs):
+        self.controllers = {}
+        self.intersection_ports = {}
+        mappings_by_port = defaultdict(dict)
+        baudrate_by_port = {}
+        for intersection_name, device in device_config.items():
+            port = device['port']
+            port_mapping = mappings_by_port[port]
+            for approach_name, short_code in device.get('approach_mapping', {}).items():
+                if short_code in port_mapping.values():
+                    logger.warning("Lane code '%s' on %s is already used; '%s' (%s) will share that lamp.", short_code, port, approach_name, intersection_name)
+                port_mapping[approach_name] = short_code
+            baudrate_by_port.setdefault(port, device.get('baudrate', baudrate))
+            self.intersection_ports[intersection_name] = port
+
+        for port, port_mapping in mappings_by_port.items():
+            self.controllers[port] = ESP32SerialController(port, baudrate_by_port[port], port_mapping, **controller_kwargs)
+            intersections = [name for name, p in self.intersection_ports.items() if p == port]
+            logger.info("Device %s serves %s (%s lamps).", port, ', '.join(intersections), len(port_mapping))
+
+    def update_lights(self, intersection_name, approach_statuses, trace=None):
+        """ Hands the update to the intersection's controller; each controller has its own writer thread, so a stalled port only delays itself. """
+        port = self.intersection_ports.get(intersection_name)
+        if port is not None:
+            self.controllers[port].update_lights(approach_statuses, trace)
+
+    def get_stats(self):
+        all_stats = {}
+        for port, controller in self.controllers.items():
+            stats = controller.get_stats()
+            stats['intersections'] = [name for name, p in self.intersection_ports.items() if p == port]
+            all_stats[port] = stats
+        return all_stats
+
+    def reconnect(self):
+        return {port: controller.reconnect() for port, controller in self.controllers.items()}
+
+    def close(self):
+        for controller in self.controllers.values():
+            controller._request_stop()
+        for controller in self.controllers.values():
+            controller.close()
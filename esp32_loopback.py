@@ -0,0 +1,100 @@
+import os
+import argparse
+import pty
+import time
+import tty
+import select
+import threading
+from esp32_protocol import LampFrameParser, decode_lamp_payload, encode_ack, ACK_STATUS_OK, ACK_STATUS_BAD_PAYLOAD
+
+
+class LoopbackESP32:
+    """ Pseudo-terminal stand-in for the ESP32 firmware: applies binary lamp frames (and legacy ASCII lines) and ACKs them. """
+    def __init__(self, ack_delay_s=0.0, drop_every_n=0):
+        self.ack_delay_s = ack_delay_s
+        self.drop_every_n = drop_every_n
+        self.lamps = {code: 'R' for code in "NESW"}
+        self.frames_received = 0
+        self.ascii_lines_received = 0
+        self.acks_sent = 0
+        self._master_fd, self._slave_fd = pty.openpty()
+        tty.setraw(self._slave_fd)
+        self.port = os.ttyname(self._slave_fd)
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="ESP32Loopback", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        frame_parser = LampFrameParser()
+        line_buffer = bytearray()
+        while self._running:
+            ready, _, _ = select.select([self._master_fd], [], [], 0.1)
+            if not ready:
+                continue
+            try:
+                data = os.read(self._master_fd, 256)
+            except OSError:
+                break
+            for seq, payload in frame_parser.feed(data):
+                self.frames_received += 1
+                if self.drop_every_n and self.frames_received % self.drop_every_n == 0:
+                    continue
+                lamp_states = decode_lamp_payload(payload)
+                if lamp_states is not None:
+                    self.lamps.update(lamp_states)
+                if self.ack_delay_s:
+                    time.sleep(self.ack_delay_s)
+                os.write(self._master_fd, encode_ack(seq, ACK_STATUS_OK if lamp_states is not None else ACK_STATUS_BAD_PAYLOAD))
+                self.acks_sent += 1
+            if b'\xa5' not in data:
+                line_buffer.extend(data)
+                while b'\n' in line_buffer:
+                    line, _, rest = bytes(line_buffer).partition(b'\n')
+                    line_buffer = bytearray(rest)
+                    self._apply_ascii_line(line.decode('ascii', errors='ignore'))
+
+    def _apply_ascii_line(self, line):
+        self.ascii_lines_received += 1
+        for part in line.strip().split(","):
+            if len(part) == 3 and part[1] == ':' and part[0] in self.lamps:
+                self.lamps[part[0]] = part[2]
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=1.0)
+        for fd in (self._master_fd, self._slave_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Emulate ESP32 lamp controllers on pseudo-terminals.")
+    parser.add_argument("--devices", type=int, default=1, help="Number of emulated devices (one per intersection in ESP32_DEVICES).")
+    parser.add_argument("--ack-delay-ms", type=float, default=0.0, help="Delay before each ACK, to emulate a slow device.")
+    args = parser.parse_args()
+
+    devices = [LoopbackESP32(ack_delay_s=args.ack_delay_ms / 1000.0).start() for _ in range(max(1, args.devices))]
+    for device_index, device in enumerate(devices):
+        print(f"[ESP32 Loopback] Device {device_index} on {device.port}.")
+    print("[ESP32 Loopback] Set ESP32_PORT / ESP32_DEVICES ports to these paths. Ctrl+C to stop.")
+    try:
+        last_lamps = [None] * len(devices)
+        while True:
+            time.sleep(0.5)
+            for device_index, device in enumerate(devices):
+                if device.lamps != last_lamps[device_index]:
+                    last_lamps[device_index] = dict(device.lamps)
+                    print(f"[ESP32 Loopback] {device.port}: {last_lamps[device_index]} (frames={device.frames_received}, acks={device.acks_sent})")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for device in devices:
+            device.stop()
@@ -0,0 +1,99 @@
+FRAME_SYNC = 0xA5
+ACK_SYNC = 0x5A
+ACK_STATUS_OK = 0x00
+ACK_STATUS_BAD_PAYLOAD = 0x01
+MAX_PAYLOAD_LEN = 16
+
+LANE_CODES = "NESW"
+STATE_CODES = {'R': 0, 'Y': 1, 'G': 2, 'O': 3}
+STATE_CHARS = {code: char for char, code in STATE_CODES.items()}
+
+
+def _build_crc8_table(poly=0x07):
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return table
+
+_CRC8_TABLE = _build_crc8_table()
+
+def crc8(data):
+    crc = 0
+    for byte in data:
+        crc = _CRC8_TABLE[crc ^ byte]
+    return crc
+
+
+def encode_lamp_frame(seq, lamp_states):
+    # Frame: SYNC | LEN | SEQ | one byte per lane (lane index << 4 | state code) | CRC8(LEN..payload)
+    payload = bytes((LANE_CODES.index(short_code) << 4) | STATE_CODES.get(state_char, STATE_CODES['R'])
+                    for short_code, state_char in lamp_states.items() if short_code in LANE_CODES)
+    if len(payload) > MAX_PAYLOAD_LEN:
+        raise ValueError(f"Too many lanes for one frame: {len(payload)} > {MAX_PAYLOAD_LEN}")
+    body = bytes([len(payload), seq & 0xFF]) + payload
+    return bytes([FRAME_SYNC]) + body + bytes([crc8(body)])
+
+def decode_lamp_payload(payload):
+    lamp_states = {}
+    for byte in payload:
+        lane_index, state_code = byte >> 4, byte & 0x0F
+        if lane_index >= len(LANE_CODES) or state_code not in STATE_CHARS:
+            return None
+        lamp_states[LANE_CODES[lane_index]] = STATE_CHARS[state_code]
+    return lamp_states
+
+def encode_ack(seq, status=ACK_STATUS_OK):
+    body = bytes([seq & 0xFF, status & 0xFF])
+    return bytes([ACK_SYNC]) + body + bytes([crc8(body)])
+
+
+class LampFrameParser:
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        """ Returns (seq, payload_bytes) for every complete, CRC-valid frame; other bytes are passed over. """
+        self._buffer.extend(data)
+        frames = []
+        while True:
+            sync_index = self._buffer.find(bytes([FRAME_SYNC]))
+            if sync_index < 0:
+                self._buffer.clear(); break
+            del self._buffer[:sync_index]
+            if len(self._buffer) < 2: break
+            payload_len = self._buffer[1]
+            if payload_len > MAX_PAYLOAD_LEN:
+                del self._buffer[0]; continue
+            frame_len = 4 + payload_len
+            if len(self._buffer) < frame_len: break
+            body = bytes(self._buffer[1:frame_len - 1])
+            if crc8(body) != self._buffer[frame_len - 1]:
+                del self._buffer[0]; continue
+            frames.append((body[1], body[2:]))
+            del self._buffer[:frame_len]
+        return frames
+
+
+class AckParser:
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        """ Returns (seq, status) for every CRC-valid ACK; interleaved debug text is skipped. """
+        self._buffer.extend(data)
+        acks = []
+        while True:
+            sync_index = self._buffer.find(bytes([ACK_SYNC]))
+            if sync_index < 0:
+                self._buffer.clear(); break
+            del self._buffer[:sync_index]
+            if len(self._buffer) < 4: break
+            body = bytes(self._buffer[1:3])
+            if crc8(body) != self._buffer[3]:
+                del self._buffer[0]; continue
+            acks.append((body[0], body[1]))
+            del self._buffer[:4]
+        return acks
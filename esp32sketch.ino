@@ -38,7 +38,21 @@ LaneLeds eastLane  = {ER_PIN, EY_PIN, EG_PIN, 'R'};
 LaneLeds southLane = {SR_PIN, SY_PIN, SG_PIN, 'R'};
 LaneLeds westLane  = {WR_PIN, WY_PIN, WG_PIN, 'R'};
 
-// Buffer for incoming serial data
+// Lane index order used by the binary protocol (must match LANE_CODES in esp32_protocol.py)
+LaneLeds* lanesByIndex[4] = {&northLane, &eastLane, &southLane, &westLane};
+const char STATE_CHARS[4] = {'R', 'Y', 'G', 'O'};
+
+// Binary frame: 0xA5 | LEN | SEQ | LEN bytes (lane index << 4 | state) | CRC-8 (poly 0x07) over LEN..payload
+// ACK:          0x5A | SEQ | STATUS | CRC-8 over SEQ, STATUS
+const uint8_t FRAME_SYNC = 0xA5;
+const uint8_t ACK_SYNC = 0x5A;
+const uint8_t ACK_STATUS_OK = 0x00;
+const uint8_t ACK_STATUS_BAD_PAYLOAD = 0x01;
+const int MAX_PAYLOAD_LEN = 16;
+uint8_t frameBuffer[MAX_PAYLOAD_LEN + 3]; // LEN, SEQ, payload, CRC
+int frameIndex = -1; // -1: not inside a binary frame
+
+// Buffer for legacy ASCII commands
 const int SERIAL_BUFFER_SIZE = 64; // Max command length "N:R,E:R,S:R,W:R\n" is well within this
 char serialBuffer[SERIAL_BUFFER_SIZE];
 int serialBufferIndex = 0;
@@ -49,7 +63,7 @@ const long BAUD_RATE = 115200;
 void setup() {
   Serial.begin(BAUD_RATE);
   Serial.println("ESP32 Traffic Light Controller Initialized.");
-  Serial.println("Waiting for commands (e.g., N:G,E:R,S:R,W:R\\n)...");
+  Serial.println("Waiting for binary lamp frames (legacy ASCII N:G,E:R,S:R,W:R\\n also accepted)...");
 
   // Initialize LED pins as outputs
   pinMode(NR_PIN, OUTPUT);
@@ -75,16 +89,66 @@ void setup() {
   setLaneState(westLane, 'R');
 }
 
-void loop() {
-  if (Serial.available() > 0) {
-    char incomingChar = Serial.read();
+uint8_t crc8(const uint8_t* data, int len) {
+  uint8_t crc = 0;
+  for (int i = 0; i < len; i++) {
+    crc ^= data[i];
+    for (int bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x80) ? (uint8_t)((crc << 1) ^ 0x07) : (uint8_t)(crc << 1);
+    }
+  }
+  return crc;
+}
+
+void sendAck(uint8_t seq, uint8_t status) {
+  uint8_t ack[4] = {ACK_SYNC, seq, status, 0};
+  ack[3] = crc8(ack + 1, 2);
+  Serial.write(ack, 4);
+}
+
+void processFrame() {
+  int payloadLen = frameBuffer[0];
+  if (crc8(frameBuffer, payloadLen + 2) != frameBuffer[payloadLen + 2]) {
+    return; // Corrupt frame: no ACK, the host resends after its ACK timeout
+  }
+  uint8_t seq = frameBuffer[1];
+  uint8_t status = ACK_STATUS_OK;
+  for (int i = 0; i < payloadLen; i++) {
+    uint8_t laneIndex = frameBuffer[2 + i] >> 4;
+    uint8_t stateCode = frameBuffer[2 + i] & 0x0F;
+    if (laneIndex < 4 && stateCode < 4) {
+      setLaneState(*lanesByIndex[laneIndex], STATE_CHARS[stateCode]);
+    } else {
+      status = ACK_STATUS_BAD_PAYLOAD;
+    }
+  }
+  sendAck(seq, status);
+}
 
-    if (incomingChar == '\n') { // End of command
+void handleFrameByte(uint8_t incomingByte) {
+  frameBuffer[frameIndex++] = incomingByte;
+  if (frameIndex == 1 && frameBuffer[0] > MAX_PAYLOAD_LEN) {
+    frameIndex = -1; // Impossible length, resync on the next sync byte
+  } else if (frameIndex >= 1 && frameIndex == frameBuffer[0] + 3) {
+    processFrame();
+    frameIndex = -1;
+  }
+}
+
+void loop() {
+  while (Serial.available() > 0) {
+    uint8_t incomingByte = Serial.read();
+
+    if (frameIndex >= 0) {
+      handleFrameByte(incomingByte);
+    } else if (incomingByte == FRAME_SYNC && serialBufferIndex == 0) {
+      frameIndex = 0;
+    } else if (incomingByte == '\n') { // End of legacy ASCII command
       serialBuffer[serialBufferIndex] = '\0'; // Null-terminate the string
       processCommand(serialBuffer);
       serialBufferIndex = 0; // Reset buffer for next command
     } else if (serialBufferIndex < SERIAL_BUFFER_SIZE - 1) {
-      serialBuffer[serialBufferIndex++] = incomingChar;
+      serialBuffer[serialBufferIndex++] = (char)incomingByte;
     } else {
       // Buffer overflow, reset (shouldn't happen with expected command length)
       Serial.println("Error: Serial buffer overflow. Command ignored.");
@@ -94,9 +158,6 @@ void loop() {
 }
 
 void processCommand(char* command) {
-  Serial.print("Received command: ");
-  Serial.println(command);
-
   // Example command: "N:G,E:R,S:R,W:R"
   char* part = strtok(command, ","); // Split by comma
 
@@ -154,6 +215,8 @@ void setLaneState(LaneLeds &lane, char state) {
       digitalWrite(lane.greenPin, HIGH);
       lane.currentLed = 'G';
       break;
+    case 'O': // Off
+      break;
     default:
       Serial.print("Unknown light state '");
       Serial.print(state);
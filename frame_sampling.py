@@ -0,0 +1,135 @@
+import cv2
+import numpy as np
+
+SAMPLE = "sample"
+MOTION_CHECK = "motion_check"
+SKIP = "skip"
+
+
+def lane_roi_bounds(zone_polygons, frame_shape, margin=8):
+    frame_h, frame_w = frame_shape[:2]
+    all_points = np.concatenate([np.asarray(polygon).reshape(-1, 2) for polygon in zone_polygons])
+    x0, y0 = all_points.min(axis=0) - margin
+    x1, y1 = all_points.max(axis=0) + margin + 1
+    return (int(max(0, x0)), int(max(0, y0)), int(min(frame_w, x1)), int(min(frame_h, y1)))
+
+
+def downsample_roi(frame, roi_bounds, scale):
+    x0, y0, x1, y1 = roi_bounds
+    roi = frame[y0:y1, x0:x1]
+    gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if roi.ndim == 3 else roi
+    if scale >= 1.0:
+        return gray
+    return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def changed_fraction(current_small, reference_small, pixel_delta):
+    if reference_small is None or reference_small.shape != current_small.shape:
+        return 1.0
+    diff = cv2.absdiff(current_small, reference_small)
+    return float(np.count_nonzero(diff > pixel_delta)) / max(1, diff.size)
+
+
+class AdaptiveFrameSampler:
+    def __init__(self, base_every_n, sampling_control=None, check_every_n=0,
+                 pixel_delta=25, min_changed_fraction=0.02, downsample_scale=0.25):
+        self.base_every_n = max(1, int(base_every_n))
+        self.sampling_control = sampling_control
+        self.check_every_n = max(0, int(check_every_n))
+        self.pixel_delta = pixel_delta
+        self.min_changed_fraction = min_changed_fraction
+        self.downsample_scale = downsample_scale
+        self.roi_bounds = None
+        self.reference_small = None
+        self.frames_since_sample = None
+        self.motion_wakeups = 0
+
+    def set_roi(self, zone_polygons, frame_shape):
+        self.roi_bounds = lane_roi_bounds(zone_polygons, frame_shape)
+        self.reference_small = None
+
+    def current_interval(self):
+        if self.sampling_control is None:
+            return self.base_every_n
+        return max(1, int(self.sampling_control.value))
+
+    def next_action(self):
+        if self.frames_since_sample is None:
+            return SAMPLE
+        gap = self.frames_since_sample + 1
+        if gap >= self.current_interval():
+            return SAMPLE
+        if self.check_every_n > 0 and self.roi_bounds is not None and gap % self.check_every_n == 0:
+            return MOTION_CHECK
+        return SKIP
+
+    def motion_detected(self, frame):
+        current_small = downsample_roi(frame, self.roi_bounds, self.downsample_scale)
+        fraction = changed_fraction(current_small, self.reference_small, self.pixel_delta)
+        self.reference_small = current_small
+        if fraction >= self.min_changed_fraction:
+            self.motion_wakeups += 1
+            return True
+        return False
+
+    def mark_skipped(self):
+        self.frames_since_sample = (self.frames_since_sample or 0) + 1
+
+    def mark_sampled(self, frame):
+        self.frames_since_sample = 0
+        if self.roi_bounds is not None and self.check_every_n > 0:
+            self.reference_small = downsample_roi(frame, self.roi_bounds, self.downsample_scale)
+
+
+class MotionGate:
+    def __init__(self, pixel_delta=25, min_changed_fraction=0.01, downsample_scale=0.25,
+                 background_rate=0.05, max_reuse_frames=25):
+        self.pixel_delta = pixel_delta
+        self.min_changed_fraction = min_changed_fraction
+        self.downsample_scale = downsample_scale
+        self.background_rate = background_rate
+        self.max_reuse_frames = max(0, int(max_reuse_frames))
+        self.roi_bounds = None
+        self.roi_mask = None
+        self.background = None
+        self.consecutive_reuses = 0
+        self.frames_checked = 0
+        self.frames_skipped = 0
+
+    def set_roi(self, zone_polygons, frame_shape):
+        self.roi_bounds = lane_roi_bounds(zone_polygons, frame_shape)
+        x0, y0, x1, y1 = self.roi_bounds
+        full_mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        for polygon in zone_polygons:
+            shifted = np.asarray(polygon, dtype=np.int32).reshape(-1, 2) - np.array([x0, y0], dtype=np.int32)
+            cv2.fillPoly(full_mask, [shifted.reshape(-1, 1, 2)], 255)
+        if self.downsample_scale < 1.0:
+            full_mask = cv2.resize(full_mask, None, fx=self.downsample_scale, fy=self.downsample_scale, interpolation=cv2.INTER_NEAREST)
+        self.roi_mask = full_mask > 0
+        self.background = None
+        self.consecutive_reuses = 0
+
+    @property
+    def skip_ratio(self):
+        return self.frames_skipped / self.frames_checked if self.frames_checked else 0.0
+
+    def should_infer(self, frame, have_previous_result=True):
+        self.frames_checked += 1
+        current_small = downsample_roi(frame, self.roi_bounds, self.downsample_scale).astype(np.float32)
+        if self.background is None or self.background.shape != current_small.shape:
+            self.background = current_small
+            self.consecutive_reuses = 0
+            return True
+
+        diff = cv2.absdiff(current_small, self.background)
+        changed_pixels = np.count_nonzero((diff > self.pixel_delta) & self.roi_mask)
+        fraction = changed_pixels / max(1, np.count_nonzero(self.roi_mask))
+        cv2.accumulateWeighted(current_small, self.background, self.background_rate)
+
+        if fraction >= self.min_changed_fraction or not have_previous_result or \
+           self.consecutive_reuses >= self.max_reuse_frames:
+            self.consecutive_reuses = 0
+            return True
+        self.consecutive_reuses += 1
+        self.frames_skipped += 1
+        return False
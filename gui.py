@@ -4,34 +4,50 @@ import multiprocessing as mp
 from queue import Empty
 import time
 import os
+import threading
 import traceback
-from collections import defaultdict, deque 
-import datetime as dt 
-import torch 
+from collections import defaultdict 
 from functools import partial 
 
-try:
-    import matplotlib
-    matplotlib.use('TkAgg') 
-    from matplotlib.figure import Figure
-    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-    import matplotlib.dates as mdates
-    MATPLOTLIB_AVAILABLE = True
-    print("[GUI] Matplotlib found and loaded.")
-except ImportError:
-    MATPLOTLIB_AVAILABLE = False
-    print("\nWARNING: Matplotlib not found. Install it ('pip install matplotlib') to enable plots.\n")
-
 import config 
-from video_processor import process_video_worker 
 from traffic_logic import TrafficLightController
-from polygon_utils import define_polygon_interactive
+from ring_buffer import RingBuffer
+import metrics
+import log_utils
+import resource_planner
+from latency_tracing import LatencyTracer, TRACE_STAGES, TRACE_PERCENTILES
+from worker_supervisor import WorkerSupervisor
+from lane_channel import LaneChannel, validate_heartbeat_interval
+from queue_wakeup import QueueWakeup
+
+emergency_logger = log_utils.get_logger("emergency")
+
+# Heavy libraries stay out of the GUI process: torch/ultralytics load only in workers, cv2 (polygon_utils,
+# video_processor) when polygon definition starts, and matplotlib when the plots are first built with PLOT_ENABLE.
+MATPLOTLIB_AVAILABLE = False
+_plot_backend = None
+
+def _load_plot_backend():
+    """ Imports matplotlib on first call; returns (Figure, FigureCanvasTkAgg) or None if it is not installed. """
+    global _plot_backend, MATPLOTLIB_AVAILABLE
+    if _plot_backend is None:
+        try:
+            import matplotlib
+            matplotlib.use('TkAgg') 
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            _plot_backend, MATPLOTLIB_AVAILABLE = (Figure, FigureCanvasTkAgg), True
+            print("[GUI] Matplotlib found and loaded.")
+        except ImportError:
+            _plot_backend = False
+            print("\nWARNING: Matplotlib not found. Install it ('pip install matplotlib') to enable plots.\n")
+    return _plot_backend or None
 
 if config.ESP32_ENABLED:
     try:
-        from esp32_controller import ESP32SerialController
+        from esp32_controller import ESP32DeviceManager
         ESP32_CONTROLLER_AVAILABLE = True
-        print("[GUI] ESP32SerialController found and will be used.")
+        print("[GUI] ESP32DeviceManager found and will be used.")
     except ImportError:
         ESP32_CONTROLLER_AVAILABLE = False
         print("\nWARNING: esp32_controller.py not found or has issues. ESP32 communication will be disabled.\n")
@@ -69,6 +85,7 @@ class LaneCounterApp:
         self.style.configure("default.Horizontal.TProgressbar", background=default_bar_bg, troughcolor=default_trough)
 
         self.defined_polygons = {}
+        self.zone_to_camera = {}
         self.skipped_approaches = []
         self.processes = []
         self.process_map = {}
@@ -77,49 +94,90 @@ class LaneCounterApp:
         self.traffic_light_ui = {}
         self.finished_workers = 0
         self.active_workers_initial_count = 0
+        self.summaries_displayed = False
         self.traffic_logic_timer_id = None
         self.plot_update_timer_id = None
-        self.esp32_controller = None
+        self.esp32_devices = None
         self.manual_overrides_gui_state = defaultdict(bool) 
-
-        self.approach_history = defaultdict(lambda: deque(maxlen=config.PLOT_MAX_POINTS))
-        self.manager = mp.Manager()
+        self.sampling_controls = {}
+        self.prelaunched = {}
+        self.stale_approaches = set()
+        self.lane_channels = {}
+        self.priority_queue = mp.Queue() if config.EMERGENCY_FAST_PATH_ENABLED else None
+        self.priority_listener = None
+        self.queue_wakeup = None
+        self.queue_check_id = None
+        self.queue_drain_pending = False
+        self.shed_counts = defaultdict(lambda: defaultdict(int))
+        self.supervisor = WorkerSupervisor(config.WORKER_RESTART_MAX_ATTEMPTS, config.WORKER_RESTART_BACKOFF_S,
+                                           config.WORKER_RESTART_BACKOFF_MAX_S, config.WORKER_HEALTHY_AFTER_S) if config.WORKER_RESTART_ENABLED else None
+        self.resource_plan = {}
+        self.last_lane_counts = {}
+        self.last_count_change_time = {}
+        self.phase_started = {}
+        self.metrics_server = None
+        self.latency_tracer = None
+        self.decided_traces = {}
+
+        self.approach_history = defaultdict(lambda: RingBuffer(config.PLOT_MAX_POINTS, columns=2))
+        # Spawned, not forked from the forkserver: as the first process started there, the Manager would start the template
+        # (and its model preload) before the window appears, and would itself be a fork of that template.
+        self.manager = mp.get_context('spawn').Manager()
         self.results_queue = self.manager.Queue()
+        if config.QUEUE_WAKEUP_ENABLED and QueueWakeup.supported(self.root.tk):
+            self.queue_wakeup = QueueWakeup()
+
+        if config.METRICS_ENABLED:
+            try:
+                self.metrics_server = metrics.start_metrics_server(config.METRICS_HOST, config.METRICS_PORT)
+                print(f"[GUI] Metrics available at http://{config.METRICS_HOST}:{config.METRICS_PORT}/metrics")
+            except OSError as e_metrics:
+                print(f"[GUI Warning] Could not start metrics endpoint on {config.METRICS_HOST}:{config.METRICS_PORT}: {e_metrics}")
 
         if config.ESP32_ENABLED and ESP32_CONTROLLER_AVAILABLE:
             try:
-                configured_video_approaches = [name for name, path in config.VIDEO_PATHS]
-                valid_esp32_mapping = {}
-                for gui_approach, esp_code in config.ESP32_APPROACH_MAPPING.items():
-                    if gui_approach in configured_video_approaches:
-                        valid_esp32_mapping[gui_approach] = esp_code
-                    else:
-                        print(f"[GUI Warning] ESP32_APPROACH_MAPPING contains key '{gui_approach}' which is not in VIDEO_PATHS. It will be ignored for ESP32.")
-                
-                if not valid_esp32_mapping and config.ESP32_APPROACH_MAPPING:
+                configured_video_approaches = [zone for name, path in config.VIDEO_PATHS for zone in self._zones_for_camera(name)]
+                device_config = {}
+                for intersection_name, int_config in config.TRAFFIC_LIGHT_CONFIG.items():
+                    intersection_approaches = {appr for phase_approaches in int_config['phases'].values() for appr in phase_approaches}
+                    explicit_device = intersection_name in config.ESP32_DEVICES
+                    device = config.ESP32_DEVICES.get(intersection_name,
+                                                      {'port': config.ESP32_PORT, 'approach_mapping': config.ESP32_APPROACH_MAPPING})
+                    valid_esp32_mapping = {}
+                    for gui_approach, esp_code in device.get('approach_mapping', {}).items():
+                        if gui_approach not in configured_video_approaches:
+                            print(f"[GUI Warning] ESP32 mapping for {intersection_name} contains key '{gui_approach}' which is not in VIDEO_PATHS/CAMERA_ZONES. It will be ignored for ESP32.")
+                        elif gui_approach in intersection_approaches:
+                            valid_esp32_mapping[gui_approach] = esp_code
+                        elif explicit_device:
+                            print(f"[GUI Warning] ESP32_DEVICES['{intersection_name}'] maps '{gui_approach}', which is not an approach of that intersection. It will be ignored.")
+                    if valid_esp32_mapping:
+                        device_config[intersection_name] = {**device, 'approach_mapping': valid_esp32_mapping}
+
+                if not device_config and (config.ESP32_APPROACH_MAPPING or config.ESP32_DEVICES):
                     messagebox.showwarning("ESP32 Config Warning",
-                                           "ESP32_APPROACH_MAPPING in config.py does not contain any "
+                                           "ESP32_APPROACH_MAPPING / ESP32_DEVICES in config.py do not contain any "
                                            "approach names currently defined in VIDEO_PATHS. "
                                            "ESP32 communication might not work as expected.")
-                    print("[GUI Warning] ESP32_APPROACH_MAPPING is empty after filtering against VIDEO_PATHS. ESP32 commands may be ineffective.")
+                    print("[GUI Warning] ESP32 mappings are empty after filtering against VIDEO_PATHS. ESP32 commands may be ineffective.")
 
-                self.esp32_controller = ESP32SerialController(
-                    port=config.ESP32_PORT,
+                self.esp32_devices = ESP32DeviceManager(
+                    device_config,
                     baudrate=config.ESP32_BAUDRATE,
-                    approach_mapping=valid_esp32_mapping
+                    reconnect_backoff_initial=config.ESP32_RECONNECT_BACKOFF_INITIAL_S,
+                    reconnect_backoff_max=config.ESP32_RECONNECT_BACKOFF_MAX_S,
+                    protocol=config.ESP32_PROTOCOL,
+                    ack_timeout=config.ESP32_ACK_TIMEOUT_S,
+                    on_command_sent=self._on_esp32_command_sent
                 )
-                if not self.esp32_controller.is_connected:
-                    messagebox.showwarning("ESP32 Connection Failed",
-                                           f"Failed to connect to ESP32 on {config.ESP32_PORT}.\n"
-                                           "The simulation will run without hardware control.\n"
-                                           "Check ESP32 connection and port settings in config.py.")
+                print(f"[GUI] ESP32 writers started for {len(self.esp32_devices.controllers)} device(s); connecting in the background.")
             except Exception as e_esp_init:
                 messagebox.showerror("ESP32 Init Error",
                                      f"Failed to initialize ESP32 controller: {e_esp_init}\n"
                                      "The simulation will run without hardware control.")
                 print(f"[GUI Error] Failed to initialize ESP32 controller: {e_esp_init}")
                 traceback.print_exc()
-                self.esp32_controller = None 
+                self.esp32_devices = None 
         elif config.ESP32_ENABLED and not ESP32_CONTROLLER_AVAILABLE:
              messagebox.showwarning("ESP32 Init Warning",
                                      "ESP32 is enabled in config, but the ESP32 controller module "
@@ -137,6 +195,19 @@ class LaneCounterApp:
              traceback.print_exc()
              self.root.quit()
              return
+        if config.LANE_UPDATE_SUPPRESS_UNCHANGED:
+            try:
+                validate_heartbeat_interval(config.WORKER_HEARTBEAT_INTERVAL_S, config.TRAFFIC_LIGHT_CONFIG)
+            except ValueError as e:
+                messagebox.showerror("Configuration Error", f"{e}\n\nLower WORKER_HEARTBEAT_INTERVAL_S in config.py.")
+                print(f"[GUI Init Error] {e}")
+                self.root.quit()
+                return
+
+        approach_to_intersection = {approach_name: int_name for int_name in self.controller.get_intersection_names()
+                                    for approach_name in self.controller.get_approaches_for_intersection(int_name)}
+        self.latency_tracer = LatencyTracer(approach_to_intersection, window=config.LATENCY_TRACE_WINDOW,
+                                            on_stage_latency=lambda stage, latency_ms: metrics.TRACE_STAGE_LATENCY_MS.observe(latency_ms, stage=stage))
 
         self._setup_ui_frames()
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
@@ -167,7 +238,9 @@ class LaneCounterApp:
 
     def initialize_application(self):
         print("[GUI] Starting application initialization...")
+        if config.PRELAUNCH_WORKERS: self._prelaunch_workers()
         if not self._run_polygon_definition():
+            self._release_prelaunched_workers()
             try: self.root.destroy()
             except: pass
             return False
@@ -175,6 +248,10 @@ class LaneCounterApp:
         self._start_processing()
         return True
 
+    @staticmethod
+    def _zones_for_camera(camera_name):
+        return list(config.CAMERA_ZONES.get(camera_name, [camera_name]))
+
     def center_window(self, width=800, height=600):
         screen_width = self.root.winfo_screenwidth()
         screen_height = self.root.winfo_screenheight()
@@ -186,16 +263,19 @@ class LaneCounterApp:
         self.status_label.config(text="Define Lane Polygons for Approaches...")
         self.root.update()
         print("[GUI] Starting interactive polygon definition...")
+        from polygon_utils import define_polygon_interactive
         self.defined_polygons.clear()
+        self.zone_to_camera.clear()
         self.skipped_approaches.clear()
         defined_count = 0
-        approaches_to_define = list(config.VIDEO_PATHS)
-        if not approaches_to_define:
+        if not config.VIDEO_PATHS:
              messagebox.showerror("Configuration Error", "No video paths defined in config.py.")
              return False
+        approaches_to_define = [(zone_name, camera_name, path) for camera_name, path in config.VIDEO_PATHS
+                                for zone_name in self._zones_for_camera(camera_name)]
         controller_approaches = self.controller.get_all_approach_names()
-        valid_approaches_for_definition = [(name, path) for name, path in approaches_to_define if name in controller_approaches]
-        skipped_due_to_config = [name for name, path in approaches_to_define if name not in controller_approaches]
+        valid_approaches_for_definition = [(name, camera, path) for name, camera, path in approaches_to_define if name in controller_approaches]
+        skipped_due_to_config = [name for name, camera, path in approaches_to_define if name not in controller_approaches]
         if skipped_due_to_config:
             print(f"[GUI Warning] Approaches skipped (not in TrafficLightConfig): {skipped_due_to_config}")
             self.skipped_approaches.extend(skipped_due_to_config)
@@ -203,7 +283,7 @@ class LaneCounterApp:
         if initial_approach_count == 0:
              messagebox.showerror("Configuration Error", "No configured video paths match approaches in the traffic controller.")
              return False
-        for i, (approach_name, video_path) in enumerate(valid_approaches_for_definition):
+        for i, (approach_name, camera_name, video_path) in enumerate(valid_approaches_for_definition):
             self.status_label.config(text=f"Define Polygon: Approach {i+1}/{initial_approach_count} ({approach_name})")
             self.root.update()
             if not os.path.exists(video_path):
@@ -212,7 +292,8 @@ class LaneCounterApp:
                 self.skipped_approaches.append(approach_name)
                 continue
             polygon = define_polygon_interactive(approach_name, video_path)
-            if polygon is not None: self.defined_polygons[approach_name] = polygon; defined_count += 1
+            if polygon is not None:
+                self.defined_polygons[approach_name] = polygon; self.zone_to_camera[approach_name] = camera_name; defined_count += 1
             else: self.skipped_approaches.append(approach_name)
         if not self.defined_polygons:
             messagebox.showerror("Error", "No lane polygons were defined. Cannot start.")
@@ -268,7 +349,8 @@ class LaneCounterApp:
                 approach_to_intersection_map[managed_appr] = int_name
 
         for i, approach_name in enumerate(active_approach_names):
-            video_path = next((path for name, path in config.VIDEO_PATHS if name == approach_name), "N/A")
+            camera_name = self.zone_to_camera.get(approach_name, approach_name)
+            video_path = next((path for name, path in config.VIDEO_PATHS if name == camera_name), "N/A")
             video_filename = os.path.basename(video_path)
 
             approach_outer_frame = ttk.Frame(self.approaches_frame, padding=0)
@@ -288,6 +370,7 @@ class LaneCounterApp:
                 "status": tk.StringVar(value="Initializing..."),
                 "frame_idx": tk.StringVar(value="Frame: -"),
                 "agg_detect": tk.StringVar(value="Detected Now (All): 0"),
+                "inference_skip": tk.StringVar(value="Inference Skipped: -"),
                 "ambulance_status": tk.StringVar(value=""),
                 "class_counts": {}
             }
@@ -305,6 +388,8 @@ class LaneCounterApp:
             
             ttk.Label(text_elements_frame, textvariable=vars_dict["frame_idx"]).pack(anchor=tk.W, pady=1)
             ttk.Label(text_elements_frame, textvariable=vars_dict["agg_detect"], font=("TkDefaultFont", config.DEFAULT_FONT_SIZE, "bold")).pack(anchor=tk.W, pady=1)
+            if config.MOTION_GATE_ENABLED:
+                ttk.Label(text_elements_frame, textvariable=vars_dict["inference_skip"], font=("TkDefaultFont", config.DEFAULT_FONT_SIZE - 1)).pack(anchor=tk.W, pady=1)
 
             class_frame = ttk.Frame(text_elements_frame) 
             class_frame.pack(anchor=tk.W, fill=tk.X, pady=(5,0))
@@ -329,26 +414,33 @@ class LaneCounterApp:
                 override_button_widget.grid(row=0, column=1, padx=(10,0), pady=(5,0), sticky="ne")
             
             plot_info = None
-            if config.PLOT_ENABLE and MATPLOTLIB_AVAILABLE:
+            plot_backend = _load_plot_backend() if config.PLOT_ENABLE else None
+            if plot_backend:
+                Figure, FigureCanvasTkAgg = plot_backend
                 try:
                     plot_frame = ttk.Frame(approach_outer_frame, borderwidth=1, relief="sunken")
                     plot_frame.grid(row=1, column=0, sticky="nsew", pady=(5, 0))
 
                     fig = Figure(figsize=(4, 2.2), dpi=85) 
                     ax = fig.add_subplot(111)
-                    ax.set_title("Recent Count Trend", fontsize=8)
-                    ax.set_ylabel("Count", fontsize=7)
-                    ax.tick_params(axis='both', which='major', labelsize=6)
-                    ax.grid(True, linestyle='--', alpha=0.6)
-                    ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-                    fig.autofmt_xdate(rotation=30, ha='right')
+                    ax.set_title("Recent Count Trend", fontsize=9, pad=2)
+                    ax.set_ylabel("Count", fontsize=8)
+                    ax.set_xlabel("Seconds ago", fontsize=7)
+                    ax.tick_params(axis='both', which='major', labelsize=7)
+                    ax.grid(True, linestyle=':', linewidth=0.5, alpha=0.7)
+                    ax.set_xlim(-config.PLOT_HISTORY_SECONDS, 0)
+                    ax.set_ylim(-0.5, 5)
+                    line, = ax.plot([], [], marker='.', linestyle='-', markersize=3, color='tab:blue', animated=True)
+                    no_data_text = ax.text(0.5, 0.5, 'No data in window', horizontalalignment='center', verticalalignment='center',
+                                           transform=ax.transAxes, fontsize=8, color='grey', animated=True)
                     fig.tight_layout(pad=0.8)
 
                     canvas = FigureCanvasTkAgg(fig, master=plot_frame)
                     canvas_widget = canvas.get_tk_widget()
                     canvas_widget.pack(fill=tk.BOTH, expand=True)
+                    plot_info = {'fig': fig, 'ax': ax, 'canvas': canvas, 'line': line, 'no_data_text': no_data_text, 'background': None}
+                    canvas.mpl_connect('draw_event', partial(self._on_plot_draw, plot_info))
                     canvas.draw()
-                    plot_info = {'fig': fig, 'ax': ax, 'canvas': canvas}
                 except Exception as plot_e:
                      print(f"[GUI Error] Failed to create plot for {approach_name}: {plot_e}")
                      ttk.Label(approach_outer_frame, text="Plot Error", foreground="red").grid(row=1, column=0, sticky="nsew", pady=(5,0))
@@ -356,7 +448,7 @@ class LaneCounterApp:
             self.approach_widgets[approach_name] = {
                 'frame': approach_info_frame, 'vars': vars_dict, 'status_label': status_label_widget,
                 'ambulance_label': ambulance_label, 'class_labels': label_dict, 'plot': plot_info,
-                'override_button': override_button_widget 
+                'override_button': override_button_widget, 'text_cache': {}
             }
         
         last_row_approaches = (len(active_approach_names) - 1) // max_cols_approaches if active_approach_names else -1
@@ -440,121 +532,350 @@ class LaneCounterApp:
         self.root.update()
 
 
+    def _worker_options(self):
+        motion_options = {
+            'check_every_n': config.MOTION_WAKE_CHECK_EVERY_N,
+            'pixel_delta': config.MOTION_PIXEL_DELTA,
+            'min_changed_fraction': config.MOTION_MIN_CHANGED_FRACTION,
+            'downsample_scale': config.MOTION_DOWNSAMPLE_SCALE,
+        }
+        motion_gate_options = {
+            'pixel_delta': config.MOTION_PIXEL_DELTA,
+            'min_changed_fraction': config.MOTION_GATE_MIN_CHANGED_FRACTION,
+            'downsample_scale': config.MOTION_DOWNSAMPLE_SCALE,
+            'background_rate': config.MOTION_GATE_BACKGROUND_RATE,
+            'max_reuse_frames': config.MOTION_GATE_MAX_REUSE_FRAMES,
+        } if config.MOTION_GATE_ENABLED else None
+        profile_options = {'sampling': config.PROFILE_SAMPLING, 'sampling_interval_s': config.PROFILE_SAMPLING_INTERVAL_S,
+                           'output_dir': config.PROFILE_OUTPUT_DIR} if config.PROFILE_ENABLED else None
+        log_options = {'level': config.LOG_LEVEL, 'rate_limit_interval_s': config.LOG_RATE_LIMIT_INTERVAL_S,
+                       'rate_limit_burst': config.LOG_RATE_LIMIT_BURST}
+        delta_options = {'heartbeat_interval_s': config.WORKER_HEARTBEAT_INTERVAL_S} if config.LANE_UPDATE_SUPPRESS_UNCHANGED else None
+        ambulance_options = {'mode': config.AMBULANCE_DETECTION_MODE, 'prompt_classes': list(config.AMBULANCE_PROMPT_CLASSES),
+                             'verify': config.AMBULANCE_VERIFY_WITH_MODEL, 'crop_padding': config.AMBULANCE_VERIFY_CROP_PADDING}
+        return {'motion_options': motion_options, 'motion_gate_options': motion_gate_options, 'log_queue': log_utils.get_log_queue(),
+                'log_options': log_options, 'profile_options': profile_options, 'delta_options': delta_options,
+                'ambulance_options': ambulance_options, 'inference_mode': config.INFERENCE_MODE}
+
+    def _plan_resources(self, camera_names):
+        if not config.RESOURCE_PLANNING_ENABLED: return {}
+        resource_plan = resource_planner.plan_worker_resources(
+            camera_names, reserved_cores=config.RESOURCE_RESERVED_CORES,
+            max_threads_per_worker=config.RESOURCE_MAX_THREADS_PER_WORKER, pin_cpus=config.RESOURCE_PIN_CPUS)
+        resource_planner.log_plan(resource_plan)
+        return resource_plan
+
+    def _launch_worker(self, camera_name, video_path, lane_polygons, resource_entry, polygon_inbox=None, start_frame=0):
+        """ Starts one camera worker. With lane_polygons None it loads its models and waits for polygons on polygon_inbox. """
+        from video_processor import process_video_worker
+        sampling_control = mp.RawValue('i', config.PROCESS_EVERY_N_FRAMES) if config.ADAPTIVE_SAMPLING_ENABLED else None
+        self.sampling_controls[camera_name] = sampling_control
+        if camera_name not in self.lane_channels:  # kept across supervisor restarts
+            self.lane_channels[camera_name] = LaneChannel(config.LANE_CHANNEL_CAPACITY_PER_APPROACH * len(self._zones_for_camera(camera_name)))
+        p = mp.Process( target=process_video_worker, args=(
+                camera_name, video_path, config.MODEL_NAME, config.AMBULANCE_MODEL_NAME,
+                config.TARGET_CLASSES, config.AMBULANCE_CLASS_NAMES, config.CONFIDENCE_THRESHOLD,
+                config.PROCESS_EVERY_N_FRAMES, config.INFERENCE_DEVICE, self.results_queue, lane_polygons
+            ), kwargs=dict(self._worker_options(), sampling_control=sampling_control,
+                           resource_plan=resource_entry, polygon_inbox=polygon_inbox, start_frame=start_frame,
+                           lane_channel=self.lane_channels[camera_name], priority_queue=self.priority_queue,
+                           alert_repeat_s=config.EMERGENCY_ALERT_REPEAT_S, queue_wakeup=self.queue_wakeup), daemon=True )
+        p.start()
+        return p
+
+    def _prelaunch_workers(self):
+        """ Starts workers before polygon definition so YOLOE loads and warms up while the operator draws. """
+        controller_approaches = self.controller.get_all_approach_names()
+        cameras = [(camera_name, path) for camera_name, path in config.VIDEO_PATHS
+                   if os.path.exists(path) and any(zone in controller_approaches for zone in self._zones_for_camera(camera_name))]
+        if not cameras: return
+        self.sampling_controls.clear()
+        self.resource_plan = self._plan_resources([camera_name for camera_name, _ in cameras])
+        print(f"[GUI] Prelaunching {len(cameras)} workers (device hint '{config.INFERENCE_DEVICE}') to load models during polygon definition...")
+        for camera_name, video_path in cameras:
+            polygon_inbox = mp.Queue(maxsize=1)
+            try:
+                p = self._launch_worker(camera_name, video_path, None, self.resource_plan.get(camera_name), polygon_inbox)
+            except Exception as e:
+                print(f"[GUI Error] Failed to prelaunch worker for {camera_name}: {e}. It will be started after polygon definition.")
+                continue
+            self.prelaunched[camera_name] = {'process': p, 'inbox': polygon_inbox}
+            print(f"[GUI] Prelaunched worker PID: {p.pid} for: {camera_name}")
+
+    def _release_prelaunched_workers(self):
+        for camera_name, handle in self.prelaunched.items():
+            try: handle['inbox'].put_nowait(None)
+            except Exception as e: print(f"[GUI Warning] Could not release prelaunched worker for {camera_name}: {e}")
+            self.processes.append(handle['process'])
+        self.prelaunched.clear()
+
     def _start_processing(self):
         self.status_label.config(text="Starting Worker Processes...")
         print(f"[GUI] Starting parallel processing for {len(self.defined_polygons)} approaches...")
         self.root.update()
-        device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        print(f"[GUI] Using device hint '{device}' for workers.")
+        device = config.INFERENCE_DEVICE
+        print(f"[GUI] Using device hint '{device}' for workers{' (resolved in each worker)' if device == 'auto' else ''}.")
         self.active_workers_initial_count = 0
         self.processes.clear()
         self.process_map.clear()
         self.finished_workers = 0
+        self.summaries_displayed = False
         self.final_summaries.clear()
 
+        polygons_by_camera = defaultdict(dict)
         for approach_name, polygon in self.defined_polygons.items():
-            video_path = next((path for name, path in config.VIDEO_PATHS if name == approach_name), None)
-            if not video_path: print(f"[GUI Error] Missing video path for {approach_name}. Skipping."); continue
-            
-            p = mp.Process( target=process_video_worker, args=(
-                    approach_name, video_path, config.MODEL_NAME, config.AMBULANCE_MODEL_NAME,
-                    config.TARGET_CLASSES, config.AMBULANCE_CLASS_NAMES, config.CONFIDENCE_THRESHOLD,
-                    config.PROCESS_EVERY_N_FRAMES, device, self.results_queue, polygon
-                ), daemon=True )
-            self.processes.append(p)
+            polygons_by_camera[self.zone_to_camera.get(approach_name, approach_name)][approach_name] = polygon
+
+        if not self.prelaunched:
+            self.sampling_controls.clear()
+            self.resource_plan = self._plan_resources(list(polygons_by_camera.keys()))
+
+        for camera_name, zone_polygons in polygons_by_camera.items():
+            video_path = next((path for name, path in config.VIDEO_PATHS if name == camera_name), None)
+            if not video_path: print(f"[GUI Error] Missing video path for {camera_name}. Skipping."); continue
             try:
-                 p.start(); self.process_map[p.pid] = approach_name
-                 print(f"[GUI] Launched worker PID: {p.pid} for: {approach_name}")
-                 self.active_workers_initial_count += 1
-                 if approach_name in self.approach_widgets:
-                     self.approach_widgets[approach_name]['vars']['status'].set("Processing...")
-                     self.approach_widgets[approach_name]['status_label'].config(foreground="blue", font=("TkDefaultFont", config.DEFAULT_FONT_SIZE, "bold"))
+                 handle = self.prelaunched.pop(camera_name, None)
+                 if handle is not None:
+                     p = handle['process']
+                     handle['inbox'].put(zone_polygons)
+                     print(f"[GUI] Handed polygons to prelaunched worker PID: {p.pid} for: {camera_name} (zones: {list(zone_polygons.keys())})")
+                 else:
+                     p = self._launch_worker(camera_name, video_path, zone_polygons, self.resource_plan.get(camera_name))
+                     print(f"[GUI] Launched worker PID: {p.pid} for: {camera_name} (zones: {list(zone_polygons.keys())})")
+                 self.processes.append(p); self.process_map[p.pid] = camera_name
+                 if self.supervisor: self.supervisor.register(camera_name, video_path, zone_polygons, time.time())
+                 self.active_workers_initial_count += len(zone_polygons)
+                 for approach_name in zone_polygons:
+                     if approach_name in self.approach_widgets:
+                         self.approach_widgets[approach_name]['vars']['status'].set("Processing...")
+                         self.approach_widgets[approach_name]['status_label'].config(foreground="blue", font=("TkDefaultFont", config.DEFAULT_FONT_SIZE, "bold"))
             except Exception as e:
-                 print(f"[GUI Error] Failed to start process for {approach_name}: {e}"); traceback.print_exc()
-                 if approach_name in self.approach_widgets:
-                      self.approach_widgets[approach_name]['vars']['status'].set("ERROR: Start Failed")
-                      self.approach_widgets[approach_name]['status_label'].config(foreground="red", font=("TkDefaultFont", config.DEFAULT_FONT_SIZE, "bold"))
+                 print(f"[GUI Error] Failed to start process for {camera_name}: {e}"); traceback.print_exc()
+                 for approach_name in zone_polygons:
+                     if approach_name in self.approach_widgets:
+                          self.approach_widgets[approach_name]['vars']['status'].set("ERROR: Start Failed")
+                          self.approach_widgets[approach_name]['status_label'].config(foreground="red", font=("TkDefaultFont", config.DEFAULT_FONT_SIZE, "bold"))
+        self._release_prelaunched_workers()  # cameras whose zones were all skipped
 
         if self.active_workers_initial_count == 0:
             messagebox.showerror("Error", "No worker processes started."); self.status_label.config(text="Error: No workers."); return
 
         self.status_label.config(text=f"Processing {self.active_workers_initial_count} approaches...")
+        if self.priority_queue is not None and self.priority_listener is None:
+            self.priority_listener = threading.Thread(target=self._priority_listener_loop, name="emergency-listener", daemon=True)
+            self.priority_listener.start()
+        if self.queue_wakeup is not None:
+            self.root.tk.createfilehandler(self.queue_wakeup.fileno(), tk.READABLE, self._on_queue_wakeup)
+            print("[GUI] Queue draining is event-driven (worker wakeup pipe).")
         self._check_queue()
         self._run_traffic_logic_loop()
         if config.PLOT_ENABLE and MATPLOTLIB_AVAILABLE: self._update_plots()
         print("[GUI] Processing started.")
 
+    def _on_queue_wakeup(self, fd, mask):
+        self.queue_wakeup.clear()
+        if self.queue_check_id is not None:
+            if self.queue_drain_pending: return  # the drain continuation already scheduled will pick it up
+            self.root.after_cancel(self.queue_check_id)
+        self._check_queue()
+
     def _check_queue(self):
+        self.queue_check_id = None
+        drain_deadline = time.perf_counter() + config.QUEUE_DRAIN_MAX_MS / 1000.0
+        pending_lane_ui = {}
+        queue_emptied = False
+        # Lane updates first: each camera's final_summary/error on results_queue follows its last lane update
+        lanes_emptied = self._drain_lane_channels(drain_deadline, pending_lane_ui)
         try:
-            while True:
+            while time.perf_counter() < drain_deadline:
                 result = self.results_queue.get_nowait()
                 approach_name = result.get('approach', None)
 
                 if approach_name and approach_name in self.approach_widgets:
-                    widget_info = self.approach_widgets[approach_name]
-                    vars_dict = widget_info['vars']
-                    status_label = widget_info['status_label']
-                    current_status_val = vars_dict['status'].get()
                     msg_type = result.get('type')
-
                     if msg_type == 'lane_update':
-                        aggregate_count = result.get('in_lane_current_frame_agg', 0)
-                        counts_by_type = result.get('counts_by_type', {}) 
-                        ambulance_detected = result.get('ambulance_detected', False)
-                        frame_idx = result.get('frame_index', '-')
-                        timestamp = time.time() 
-
-                        self.approach_history[approach_name].append((timestamp, aggregate_count)) 
-
-                        if "Finished" not in current_status_val and "ERROR" not in current_status_val and "Paused" not in current_status_val:
-                             vars_dict['frame_idx'].set(f"Frame: {frame_idx}")
-                             vars_dict['agg_detect'].set(f"Detected Now (All): {aggregate_count}")
-                             if "Processing" not in current_status_val:
-                                 vars_dict['status'].set("Processing...")
-                                 status_label.config(foreground="blue", font=("TkDefaultFont", config.DEFAULT_FONT_SIZE, "bold"))
-
-                        for class_name_ui in config.TARGET_CLASSES:
-                            if class_name_ui in vars_dict['class_counts']:
-                                count = counts_by_type.get(class_name_ui, 0)
-                                vars_dict['class_counts'][class_name_ui].set(f"{class_name_ui.title()}: {count}")
-
-                        vars_dict['ambulance_status'].set("AMBULANCE!" if ambulance_detected else "")
-                        
-                        self.controller.update_demand(approach_name, aggregate_count, timestamp, ambulance_detected)
-                        self.controller.update_weighted_demand(approach_name, counts_by_type, timestamp)
-
-
-                    elif msg_type == 'status_update':
-                         new_status = result.get('status', 'Unknown')
-                         if "Finished" not in current_status_val and "ERROR" not in current_status_val:
-                             vars_dict['status'].set(new_status)
-                             if "Paused" in new_status: status_label.config(foreground="orange", font=("TkDefaultFont", config.DEFAULT_FONT_SIZE - 1, "italic"))
-                             elif "Processing" in new_status: status_label.config(foreground="blue", font=("TkDefaultFont", config.DEFAULT_FONT_SIZE, "bold"))
-                             else: status_label.config(foreground="grey", font=("TkDefaultFont", config.DEFAULT_FONT_SIZE - 1, "italic"))
-                    elif msg_type == 'final_summary':
-                        print(f"[GUI] Received final summary for: {approach_name}")
-                        self.final_summaries[approach_name] = result; self.finished_workers += 1
-                        vars_dict['status'].set("Finished OK"); vars_dict['agg_detect'].set("Detected Now (All): 0")
-                        vars_dict['ambulance_status'].set("")
-                        for class_name_ui in config.TARGET_CLASSES:
-                             if class_name_ui in vars_dict['class_counts']: vars_dict['class_counts'][class_name_ui].set(f"{class_name_ui.title()}: 0")
-                        status_label.config(foreground="green", font=("TkDefaultFont", config.DEFAULT_FONT_SIZE, "bold"))
-                    elif msg_type == 'error':
-                        print(f"[GUI Error] Received error for: {approach_name} - {result.get('message', 'Unknown error')}")
-                        self.final_summaries[approach_name] = result; self.finished_workers += 1
-                        error_msg_short = str(result.get('message', 'Unknown error'))[:40] + '...'; vars_dict['status'].set(f"ERROR: {error_msg_short}")
-                        vars_dict['ambulance_status'].set(""); status_label.config(foreground="red", font=("TkDefaultFont", config.DEFAULT_FONT_SIZE, "bold"))
-
-        except Empty: self._check_dead_processes()
-
-        if self.active_workers_initial_count > 0 and self.finished_workers >= self.active_workers_initial_count:
+                        self._accept_lane_update(approach_name, result, pending_lane_ui)
+                    else:
+                        if msg_type in ('final_summary', 'error'):
+                            pending_lane_ui.pop(approach_name, None)
+                        self._apply_control_message(approach_name, msg_type, result)
+
+        except Empty: queue_emptied = lanes_emptied
+
+        for approach_name, result in pending_lane_ui.items():
+            self._apply_lane_update_to_widgets(approach_name, result)
+
+        if queue_emptied: self._check_dead_processes()
+
+        if self.active_workers_initial_count > 0 and self.finished_workers >= self.active_workers_initial_count and not self.summaries_displayed:
             self.status_label.config(text=f"All {self.active_workers_initial_count} video processing tasks finished.")
             print("[GUI] All worker processes accounted for.")
-            
+            self.summaries_displayed = True
             
             self.display_final_summaries() 
         
-        self.root.after(config.QUEUE_CHECK_INTERVAL_MS, self._check_queue)
+        # With the wakeup pipe the timer is only a safety net (dead workers, a missed wakeup); otherwise it is the poll
+        self.queue_drain_pending = not queue_emptied
+        if not queue_emptied: delay_ms = 1
+        elif self.queue_wakeup is not None: delay_ms = config.QUEUE_FALLBACK_POLL_MS
+        else: delay_ms = config.QUEUE_CHECK_INTERVAL_MS
+        self.queue_check_id = self.root.after(delay_ms, self._check_queue)
+
+    def _priority_listener_loop(self):
+        """ Off the Tk thread: applies ambulance alerts to the controller on arrival and pushes the resulting lamps to the ESP32 at once. """
+        while True:
+            try: alert = self.priority_queue.get()
+            except (EOFError, OSError): return
+            if alert is None: return
+            approach_name = alert.get('approach')
+            alert_age_s = time.time() - alert['capture']
+            if alert_age_s > config.LANE_UPDATE_MAX_AGE_S:
+                # Backlog after a stall: the ambulance has likely passed, so no preemption for it
+                emergency_logger.warning("Dropped emergency alert for %s: frame is %.1fs old (> %ss).", approach_name,
+                                         alert_age_s, config.LANE_UPDATE_MAX_AGE_S, extra={'approach': approach_name})
+                continue
+            try:
+                events = self.controller.handle_emergency_alert(approach_name, time.time())
+            except Exception as e:
+                emergency_logger.error("Emergency alert for %s failed: %s", approach_name, e, extra={'approach': approach_name}); continue
+            if not events: continue
+            # Lamps first; metrics and logging only after the push
+            if self.esp32_devices:
+                for event in events:
+                    if event['lamp_changes']:
+                        self.esp32_devices.update_lights(event['intersection'], {appr: {'state': lamp_state} for appr, lamp_state in event['lamp_changes'].items()})
+            metrics.EMERGENCY_ALERT_LATENCY_MS.observe((time.time() - alert['capture']) * 1000.0, approach=approach_name)
+            emergency_logger.info("Fast path: ambulance on %s -> %s", approach_name,
+                                  [(event['intersection'], event['state']) for event in events], extra={'approach': approach_name})
+
+    def _drain_lane_channels(self, drain_deadline, pending_lane_ui):
+        """ Drains every camera's bounded lane channel until empty or the deadline; returns True if all were emptied. """
+        for camera_name, lane_channel in self.lane_channels.items():
+            metrics.LANE_CHANNEL_DEPTH.set(lane_channel.qsize(), camera=camera_name)
+            while True:
+                if time.perf_counter() >= drain_deadline: return False
+                try: result = lane_channel.get_nowait()
+                except Empty:
+                    # Counted but still in the worker's feeder thread (its wakeup may already be consumed): retry shortly
+                    if lane_channel.qsize() > 0: return False
+                    break
+                approach_name = result.get('approach')
+                if approach_name in self.approach_widgets:
+                    self._accept_lane_update(approach_name, result, pending_lane_ui)
+        return True
+
+    def _accept_lane_update(self, approach_name, result, pending_lane_ui):
+        drain_time = time.time()
+        if self.supervisor: self.supervisor.record_progress(result.get('camera', approach_name), result.get('frame_index'), drain_time)
+        if approach_name in self.stale_approaches: self._set_approach_stale(approach_name, False)
+        if result.get('channel_dropped'):
+            self.shed_counts[approach_name]['channel_full'] += result['channel_dropped']
+            metrics.LANE_UPDATES_SHED.inc(result['channel_dropped'], approach=approach_name, reason="channel_full")
+        capture_time = (result.get('trace') or {}).get('capture')
+        if capture_time is not None and drain_time - capture_time > config.LANE_UPDATE_MAX_AGE_S:
+            # Too old to describe current traffic; counting it would inflate queued demand. Shed counts are in sampled frames.
+            self.shed_counts[approach_name]['too_old'] += result.get('repeat_count', 1)
+            metrics.LANE_UPDATES_SHED.inc(result.get('repeat_count', 1), approach=approach_name, reason="too_old")
+            return
+        self._apply_lane_update_to_controller(approach_name, result)
+        pending_lane_ui[approach_name] = result
+
+    def _apply_lane_update_to_controller(self, approach_name, result):
+        aggregate_count = result.get('in_lane_current_frame_agg', 0)
+        counts_by_type = result.get('counts_by_type', {}) 
+        ambulance_detected = result.get('ambulance_detected', False)
+        drain_time = time.time()
+        capture_time = (result.get('trace') or {}).get('capture')
+        timestamp = min(capture_time, drain_time) if capture_time is not None else drain_time
+        self._record_lane_update_metrics(approach_name, result, drain_time)
+
+        self.approach_history[approach_name].append(timestamp, aggregate_count)
+        if self.last_lane_counts.get(approach_name) != aggregate_count:
+            self.last_lane_counts[approach_name] = aggregate_count
+            self.last_count_change_time[approach_name] = timestamp
+
+        # With delta suppression one message can stand for several identical sampled frames
+        repeat_count = result.get('repeat_count', 1)
+        self.controller.update_demand(approach_name, aggregate_count, timestamp, ambulance_detected, repeat_count)
+        self.controller.update_weighted_demand(approach_name, counts_by_type, timestamp, repeat_count)
+
+    def _record_lane_update_metrics(self, approach_name, result, drain_time):
+        frames_skipped = result.get('frames_skipped_since_update', 0)
+        metrics.FRAMES_READ.inc(result.get('frames_read_since_update', 0), approach=approach_name)
+        if frames_skipped: metrics.FRAMES_DROPPED.inc(frames_skipped, approach=approach_name, reason="sampling")
+        if result.get('decode_ms') is not None: metrics.DECODE_LATENCY_MS.observe(result['decode_ms'], approach=approach_name)
+        repeat_count = result.get('repeat_count', 1)
+        inferences = result.get('inferences_since_update', 0 if result.get('inference_skipped') else 1)
+        if inferences: metrics.INFERENCES.inc(inferences, approach=approach_name)
+        if repeat_count > inferences: metrics.FRAMES_DROPPED.inc(repeat_count - inferences, approach=approach_name, reason="motion_gate")
+        if result.get('inference_ms') is not None: metrics.INFERENCE_LATENCY_MS.observe(result['inference_ms'], approach=approach_name)
+        if repeat_count > 1: metrics.LANE_UPDATES_SUPPRESSED.inc(repeat_count - 1, approach=approach_name)
+        trace = result.get('trace')
+        if trace:
+            metrics.MESSAGE_LAG_MS.observe(max(0.0, (drain_time - trace['capture']) * 1000.0), approach=approach_name)
+            if self.latency_tracer: self.latency_tracer.mark_drain(approach_name, trace, drain_time)
+
+    def _set_widget_text(self, widget_info, key, var, text):
+        text_cache = widget_info['text_cache']
+        if text_cache.get(key) != text:
+            text_cache[key] = text
+            var.set(text)
+
+    def _apply_lane_update_to_widgets(self, approach_name, result):
+        widget_info = self.approach_widgets[approach_name]
+        vars_dict = widget_info['vars']
+        status_label = widget_info['status_label']
+        current_status_val = vars_dict['status'].get()
+        counts_by_type = result.get('counts_by_type', {}) 
+        sampling_every_n = result.get('sampling_every_n')
+
+        if "Finished" not in current_status_val and "ERROR" not in current_status_val and "Paused" not in current_status_val:
+             self._set_widget_text(widget_info, 'frame_idx', vars_dict['frame_idx'],
+                                   f"Frame: {result.get('frame_index', '-')}" + (f" (1/{sampling_every_n})" if sampling_every_n else ""))
+             self._set_widget_text(widget_info, 'agg_detect', vars_dict['agg_detect'], f"Detected Now (All): {result.get('in_lane_current_frame_agg', 0)}")
+             self._set_widget_text(widget_info, 'inference_skip', vars_dict['inference_skip'],
+                                   f"Inference Skipped: {result.get('inference_skip_ratio', 0.0) * 100:.0f}%")
+             if "Processing" not in current_status_val:
+                 vars_dict['status'].set("Processing...")
+                 status_label.config(foreground="blue", font=("TkDefaultFont", config.DEFAULT_FONT_SIZE, "bold"))
+
+        for class_name_ui, class_var in vars_dict['class_counts'].items():
+            self._set_widget_text(widget_info, class_name_ui, class_var, f"{class_name_ui.title()}: {counts_by_type.get(class_name_ui, 0)}")
+
+        self._set_widget_text(widget_info, 'ambulance_status', vars_dict['ambulance_status'], "AMBULANCE!" if result.get('ambulance_detected', False) else "")
+
+    def _apply_control_message(self, approach_name, msg_type, result):
+        widget_info = self.approach_widgets[approach_name]
+        vars_dict = widget_info['vars']
+        status_label = widget_info['status_label']
+        current_status_val = vars_dict['status'].get()
+        widget_info['text_cache'].clear()
+
+        if msg_type == 'status_update':
+             new_status = result.get('status', 'Unknown')
+             if "Finished" not in current_status_val and "ERROR" not in current_status_val:
+                 vars_dict['status'].set(new_status)
+                 if "Paused" in new_status: status_label.config(foreground="orange", font=("TkDefaultFont", config.DEFAULT_FONT_SIZE - 1, "italic"))
+                 elif "Processing" in new_status: status_label.config(foreground="blue", font=("TkDefaultFont", config.DEFAULT_FONT_SIZE, "bold"))
+                 else: status_label.config(foreground="grey", font=("TkDefaultFont", config.DEFAULT_FONT_SIZE - 1, "italic"))
+        elif msg_type == 'final_summary':
+            print(f"[GUI] Received final summary for: {approach_name}")
+            self.final_summaries[approach_name] = result; self.finished_workers += 1
+            vars_dict['status'].set("Finished OK"); vars_dict['agg_detect'].set("Detected Now (All): 0")
+            vars_dict['ambulance_status'].set("")
+            for class_name_ui in config.TARGET_CLASSES:
+                 if class_name_ui in vars_dict['class_counts']: vars_dict['class_counts'][class_name_ui].set(f"{class_name_ui.title()}: 0")
+            status_label.config(foreground="green", font=("TkDefaultFont", config.DEFAULT_FONT_SIZE, "bold"))
+        elif msg_type == 'error' and result.get('restartable') and self.supervisor and self.supervisor.can_restart(result.get('camera')):
+            # The worker exits after this; _check_dead_processes schedules the restart
+            print(f"[GUI Error] Received error for: {approach_name} - {result.get('message', 'Unknown error')}. Worker will be restarted.")
+            vars_dict['status'].set("Worker error, restarting...")
+            vars_dict['ambulance_status'].set(""); status_label.config(foreground="orange", font=("TkDefaultFont", config.DEFAULT_FONT_SIZE, "bold"))
+        elif msg_type == 'error':
+            print(f"[GUI Error] Received error for: {approach_name} - {result.get('message', 'Unknown error')}")
+            self.final_summaries[approach_name] = result; self.finished_workers += 1
+            error_msg_short = str(result.get('message', 'Unknown error'))[:40] + '...'; vars_dict['status'].set(f"ERROR: {error_msg_short}")
+            vars_dict['ambulance_status'].set(""); status_label.config(foreground="red", font=("TkDefaultFont", config.DEFAULT_FONT_SIZE, "bold"))
 
 
     def _check_dead_processes(self):
@@ -564,42 +885,125 @@ class LaneCounterApp:
             for pid in pids_to_check:
                  if pid not in active_pids:
                      if pid in self.process_map:
-                         dead_approach_name = self.process_map[pid]
-                         if dead_approach_name not in self.final_summaries:
-                             print(f"\n!!! [GUI Error] Worker PID {pid} for {dead_approach_name} terminated unexpectedly. !!!")
-                             self.final_summaries[dead_approach_name] = {'type':'error', 'error': 'Process terminated unexpectedly', 'approach': dead_approach_name}
-                             self.finished_workers += 1
-                             if dead_approach_name in self.approach_widgets:
-                                 self.approach_widgets[dead_approach_name]['vars']['status'].set("ERROR: Terminated")
-                                 self.approach_widgets[dead_approach_name]['status_label'].config(foreground="red", font=("TkDefaultFont", config.DEFAULT_FONT_SIZE, "bold"))
-                                 self.approach_widgets[dead_approach_name]['vars']['ambulance_status'].set("")
+                         dead_camera_name = self.process_map[pid]
+                         dead_approach_names = [name for name, camera in self.zone_to_camera.items()
+                                                if camera == dead_camera_name and name not in self.final_summaries]
+                         restart_delay = self.supervisor.worker_died(dead_camera_name, time.time()) if self.supervisor and dead_approach_names else None
+                         if restart_delay is not None:
+                             print(f"\n!!! [GUI Error] Worker PID {pid} for camera {dead_camera_name} terminated unexpectedly. Restarting in {restart_delay:.0f}s. !!!")
+                         for dead_approach_name in dead_approach_names:
+                             self._set_approach_stale(dead_approach_name, True)
+                             if restart_delay is not None:
+                                 if dead_approach_name in self.approach_widgets:
+                                     self.approach_widgets[dead_approach_name]['text_cache'].clear()
+                                     self.approach_widgets[dead_approach_name]['vars']['status'].set(f"Restarting in {restart_delay:.0f}s (stale)")
+                                     self.approach_widgets[dead_approach_name]['status_label'].config(foreground="orange", font=("TkDefaultFont", config.DEFAULT_FONT_SIZE, "bold"))
+                                 continue
+                             print(f"\n!!! [GUI Error] Worker PID {pid} for {dead_approach_name} (camera {dead_camera_name}) terminated unexpectedly. !!!")
+                             self._mark_approach_terminated(dead_approach_name)
                          del self.process_map[pid]
 
+    def _mark_approach_terminated(self, approach_name):
+        self.final_summaries[approach_name] = {'type':'error', 'error': 'Process terminated unexpectedly', 'approach': approach_name}
+        self.finished_workers += 1
+        if approach_name in self.approach_widgets:
+            self.approach_widgets[approach_name]['text_cache'].clear()
+            self.approach_widgets[approach_name]['vars']['status'].set("ERROR: Terminated")
+            self.approach_widgets[approach_name]['status_label'].config(foreground="red", font=("TkDefaultFont", config.DEFAULT_FONT_SIZE, "bold"))
+            self.approach_widgets[approach_name]['vars']['ambulance_status'].set("")
+
+    def _set_approach_stale(self, approach_name, is_stale):
+        if is_stale: self.stale_approaches.add(approach_name)
+        else: self.stale_approaches.discard(approach_name)
+        self.controller.set_stale(approach_name, is_stale)
+        metrics.STALE_APPROACHES.set(len(self.stale_approaches))
+
+    def _restart_due_workers(self, current_time):
+        if not self.supervisor: return
+        for camera_name in self.supervisor.due_restarts(current_time):
+            worker = self.supervisor.workers[camera_name]
+            start_frame = self.supervisor.resume_frame(camera_name)
+            self.supervisor.restarted(camera_name, current_time)
+            try:
+                p = self._launch_worker(camera_name, worker['video_path'], worker['zone_polygons'],
+                                        self.resource_plan.get(camera_name), start_frame=start_frame)
+            except Exception as e:
+                print(f"[GUI Error] Restart of worker for {camera_name} failed: {e}")
+                if self.supervisor.worker_died(camera_name, current_time) is None:
+                    for approach_name in worker['zone_polygons']:
+                        if approach_name not in self.final_summaries: self._mark_approach_terminated(approach_name)
+                continue
+            self.processes.append(p); self.process_map[p.pid] = camera_name
+            metrics.WORKER_RESTARTS.inc(camera=camera_name)
+            print(f"[GUI] Restarted worker PID: {p.pid} for: {camera_name} from frame {start_frame} (restart #{worker['total_restarts']}).")
+
 
     def _run_traffic_logic_loop(self):
-        state_changed = self.controller.update_state(time.time())
+        current_time = time.time()
+        tick_start = time.perf_counter()
+        self.controller.update_state(current_time)
+        metrics.CONTROLLER_TICK_MS.observe((time.perf_counter() - tick_start) * 1000.0)
+        self.decided_traces = self.latency_tracer.mark_decision(current_time)
         self._update_traffic_light_display()
+        self.decided_traces = {}
+        self._export_trace_percentiles()
+        self._sample_results_queue_depth()
+        self._update_sampling_controls(current_time)
+        self._restart_due_workers(current_time)
         self.traffic_logic_timer_id = self.root.after(config.TRAFFIC_LOGIC_UPDATE_INTERVAL_MS, self._run_traffic_logic_loop)
 
+    def _sample_results_queue_depth(self):
+        # qsize() on the Manager proxy is an IPC round-trip, so it is sampled on the controller tick, not per drain
+        try:
+            metrics.QUEUE_DEPTH.set(self.results_queue.qsize())
+        except (NotImplementedError, OSError, EOFError):
+            pass
+
+    def _desired_sampling_interval(self, approach_name, approach_status, current_time):
+        light_state = approach_status.get('state', 'RED')
+        if light_state == 'GREEN' or approach_status.get('ambulance_request_active', False):
+            return config.ADAPTIVE_SAMPLING_GREEN_EVERY_N
+        last_change_time = self.last_count_change_time.get(approach_name)
+        if light_state == 'RED' and last_change_time is not None and \
+           current_time - last_change_time >= config.ADAPTIVE_SAMPLING_STABLE_QUEUE_SECONDS:
+            return config.ADAPTIVE_SAMPLING_IDLE_EVERY_N
+        return config.PROCESS_EVERY_N_FRAMES
+
+    def _update_sampling_controls(self, current_time):
+        if not self.sampling_controls: return
+        all_approach_statuses = self.controller.get_all_approach_statuses()
+        desired_by_camera = {}
+        for approach_name, camera_name in self.zone_to_camera.items():
+            desired = self._desired_sampling_interval(approach_name, all_approach_statuses.get(approach_name, {}), current_time)
+            desired_by_camera[camera_name] = min(desired, desired_by_camera.get(camera_name, desired))
+        for camera_name, sampling_control in self.sampling_controls.items():
+            if sampling_control is not None and camera_name in desired_by_camera:
+                if sampling_control.value != desired_by_camera[camera_name]:
+                    sampling_control.value = desired_by_camera[camera_name]
+
 
 
     def _update_traffic_light_display(self):
-        all_approach_statuses = self.controller.get_all_approach_statuses()
-        intersection_names = self.controller.get_intersection_names()
+        for event in self.controller.drain_state_events():
+            self._apply_state_event(event)
+        self._update_intersection_timers()
+        self._update_demand_widgets()
+
+    def _apply_state_event(self, event):
+        int_name = event['intersection']
+        previous_phase = self.phase_started.get(int_name)
+        if previous_phase and previous_phase[:2] != (event['phase'], event['state']):
+            metrics.PHASE_DURATION_S.observe(event['timestamp'] - previous_phase[2], intersection=int_name,
+                                             phase=previous_phase[0], state=previous_phase[1])
+        if not previous_phase or previous_phase[:2] != (event['phase'], event['state']):
+            self.phase_started[int_name] = (event['phase'], event['state'], event['timestamp'])
+        ui_info = self.traffic_light_ui.get(int_name)
         light_color_map = {'GREEN': 'green', 'YELLOW': 'yellow', 'RED': 'red'}
 
-        for int_name in intersection_names:
-            if int_name not in self.traffic_light_ui: continue
-            ui_info = self.traffic_light_ui[int_name]
-            int_status = self.controller.get_intersection_status(int_name)
-
-            current_intersection_gui_state = int_status.get('state', 'N/A')
-            ui_info['status_vars']['phase'].set(f"Phase: {int_status.get('phase', 'N/A')}")
+        if ui_info:
+            current_intersection_gui_state = event['state']
+            ui_info['status_vars']['phase'].set(f"Phase: {event['phase']}")
             ui_info['status_vars']['state'].set(f"State: {current_intersection_gui_state}")
-            timer_val = int_status.get('timer', 0.0)
-            timer_text = f"Timer: {timer_val:.1f}s"
-            if int_status.get('is_emergency', False): timer_text += " (EMERGENCY)"
-            ui_info['status_vars']['timer'].set(timer_text)
 
             timer_widget = ui_info['status_vars'].get("timer_widget")
             progress_bar_widget = ui_info['status_vars'].get("progress_bar_widget")
@@ -617,28 +1021,53 @@ class LaneCounterApp:
             if timer_widget and timer_widget.winfo_exists(): timer_widget.config(foreground=timer_fg_color)
             if progress_bar_widget and progress_bar_widget.winfo_exists(): progress_bar_widget.configure(style=pb_style_to_apply)
 
+            for approach_name, lamp_state in event['lamp_changes'].items():
+                approach_ui_elems = ui_info['approaches'].get(approach_name)
+                if approach_ui_elems and approach_ui_elems.get('canvas') and approach_ui_elems['canvas'].winfo_exists():
+                    approach_ui_elems['canvas'].config(bg=light_color_map.get(lamp_state, 'grey'))
+
+        if event['lamp_changes'] and self.esp32_devices and not event.get('dispatched'):
+            self.esp32_devices.update_lights(event['intersection'], {appr: {'state': lamp_state} for appr, lamp_state in event['lamp_changes'].items()},
+                                             trace=self.decided_traces.get(int_name))
+
+    def _on_esp32_command_sent(self, trace, send_time):
+        if self.latency_tracer: self.latency_tracer.mark_serial_send(trace, send_time)
+
+    def _export_trace_percentiles(self):
+        for stage_name, stage_percentiles in self.latency_tracer.percentiles().items():
+            for percentile in TRACE_PERCENTILES:
+                metrics.TRACE_STAGE_PERCENTILE_MS.set(stage_percentiles[percentile], stage=stage_name, quantile=f"0.{percentile:02d}")
+
+    def _update_intersection_timers(self):
+        for int_name, ui_info in self.traffic_light_ui.items():
+            int_status = self.controller.get_intersection_status(int_name)
+            timer_val = int_status.get('timer', 0.0)
+            timer_text = f"Timer: {timer_val:.1f}s"
+            if int_status.get('is_emergency', False): timer_text += " (EMERGENCY)"
+            ui_info['status_vars']['timer'].set(timer_text)
+
             max_duration = int_status.get('max_duration', 0.0)
             progress_percent = min(max(timer_val, 0) / max_duration, 1.0) * 100 if max_duration > 0 else 0
             ui_info['status_vars']['progress'].set(progress_percent)
 
+    def _update_demand_widgets(self):
+        all_approach_statuses = self.controller.get_all_approach_statuses()
+
+        for ui_info in self.traffic_light_ui.values():
             for approach_name, approach_ui_elems in ui_info['approaches'].items():
                 approach_status = all_approach_statuses.get(approach_name, {})
-                current_light_state_from_logic = approach_status.get('state', 'RED')
                 current_raw_demand = approach_status.get('demand', 0)
                 current_weighted_demand = approach_status.get('weighted_demand', 0.0)
-                amb_req = approach_status.get('ambulance_request_active', False)
-                is_man_red_from_logic = approach_status.get('is_manually_red', False)
 
                 demand_text_tl = f"{approach_name}\nDemand: {current_raw_demand} (W: {current_weighted_demand:.1f})"
-                if amb_req: demand_text_tl += "\n(AMB REQ!)"
-                if is_man_red_from_logic: demand_text_tl += "\n(MANUAL RED)"
+                if approach_status.get('ambulance_request_active', False): demand_text_tl += "\n(AMB REQ!)"
+                if approach_status.get('is_manually_red', False): demand_text_tl += "\n(MANUAL RED)"
+                if approach_status.get('stale', False): demand_text_tl += "\n(STALE - ON RECALL)"
+                if approach_ui_elems.get('demand_text') == demand_text_tl:
+                    continue
+                approach_ui_elems['demand_text'] = demand_text_tl
                 approach_ui_elems['demand_var'].set(demand_text_tl)
 
-                new_color = light_color_map.get(current_light_state_from_logic, 'grey')
-                if approach_ui_elems.get('canvas') and approach_ui_elems['canvas'].winfo_exists():
-                    if approach_ui_elems['canvas'].cget('bg') != new_color:
-                        approach_ui_elems['canvas'].config(bg=new_color)
-
                 demand_canvas = approach_ui_elems.get('demand_bar_canvas')
                 bar_item = approach_ui_elems.get('demand_bar_item')
                 if demand_canvas and bar_item and demand_canvas.winfo_exists():
@@ -649,11 +1078,12 @@ class LaneCounterApp:
                         bar_width = max(0, bar_width)
                         demand_canvas.coords(bar_item, 0, 0, bar_width, 10)
                     except tk.TclError: pass
-        
-       
+
         for approach_name_stat, stat_widget_info in self.approach_widgets.items():
-            approach_status_stat = all_approach_statuses.get(approach_name_stat, {})
-            is_man_red_stat = approach_status_stat.get('is_manually_red', False)
+            is_man_red_stat = all_approach_statuses.get(approach_name_stat, {}).get('is_manually_red', False)
+            if stat_widget_info.get('override_state_shown') == is_man_red_stat:
+                continue
+            stat_widget_info['override_state_shown'] = is_man_red_stat
             override_button_stat = stat_widget_info.get("override_button")
             if override_button_stat and override_button_stat.winfo_exists():
                 expected_button_text_stat = "Release Red" if is_man_red_stat else "Force Red"
@@ -663,14 +1093,11 @@ class LaneCounterApp:
             self.manual_overrides_gui_state[approach_name_stat] = is_man_red_stat
 
 
-        if self.esp32_controller and self.esp32_controller.is_connected:
-            current_statuses_for_esp = self.controller.get_all_approach_statuses()
-            if current_statuses_for_esp:
-                esp_light_states = {appr: {'state': data['state']} for appr, data in current_statuses_for_esp.items()}
-                self.esp32_controller.update_lights(esp_light_states)
-
-
-
+    def _on_plot_draw(self, plot_info, event=None):
+        canvas = plot_info['canvas']; ax = plot_info['ax']
+        plot_info['background'] = canvas.copy_from_bbox(ax.bbox)
+        ax.draw_artist(plot_info['line']); ax.draw_artist(plot_info['no_data_text'])
+        canvas.blit(ax.bbox)
 
     def _update_plots(self):
         if not config.PLOT_ENABLE or not MATPLOTLIB_AVAILABLE:
@@ -686,36 +1113,25 @@ class LaneCounterApp:
 
                  ax = plot_info['ax']
                  canvas = plot_info['canvas']
-                 history_deque = self.approach_history.get(approach_name)
-
-                 if not history_deque: continue 
-
-                 plot_data = [(dt.datetime.fromtimestamp(ts), count) for ts, count in list(history_deque) if ts >= history_cutoff_time]
-
-                 ax.clear() 
-
-                 if plot_data:
-                     timestamps, counts = zip(*plot_data)
-                     ax.plot(timestamps, counts, marker='.', linestyle='-', markersize=3, color='tab:blue')
-                     ax.set_ylim(bottom=-0.5) 
-                     max_count = max(counts) if counts else 0
-                     ax.set_ylim(top=max(max_count * 1.2, 5)) 
+                 history = self.approach_history.get(approach_name)
+                 if history is None: continue 
+
+                 history_data = history.view()
+                 in_window = history_data[:, 0] >= history_cutoff_time
+                 seconds_ago = history_data[in_window, 0] - current_time
+                 counts = history_data[in_window, 1]
+                 plot_info['line'].set_data(seconds_ago, counts)
+                 plot_info['no_data_text'].set_visible(counts.size == 0)
+
+                 y_top_needed = max(float(counts.max()) * 1.2, 5) if counts.size else 5
+                 y_top_current = ax.get_ylim()[1]
+                 if y_top_needed > y_top_current or y_top_needed < y_top_current / 2 or plot_info['background'] is None:
+                     ax.set_ylim(-0.5, y_top_needed)
+                     canvas.draw_idle()
                  else:
-                     now_dt = dt.datetime.fromtimestamp(current_time)
-                     then_dt = dt.datetime.fromtimestamp(history_cutoff_time)
-                     ax.plot([then_dt, now_dt], [0, 0], color='grey', alpha=0) 
-                     ax.set_ylim(0, 5)
-                     ax.text(0.5, 0.5, 'No data in window', horizontalalignment='center', verticalalignment='center', transform=ax.transAxes, fontsize=8, color='grey')
-
-                 ax.set_title("Recent Count Trend", fontsize=9, pad=2)
-                 ax.set_ylabel("Count", fontsize=8)
-                 ax.tick_params(axis='x', labelsize=7)
-                 ax.tick_params(axis='y', labelsize=7)
-                 ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-                 ax.grid(True, linestyle=':', linewidth=0.5, alpha=0.7) 
-                 plot_info['fig'].tight_layout(pad=0.8) 
-
-                 canvas.draw() 
+                     canvas.restore_region(plot_info['background'])
+                     ax.draw_artist(plot_info['line']); ax.draw_artist(plot_info['no_data_text'])
+                     canvas.blit(ax.bbox)
 
         except Exception as e:
             print(f"[GUI Plot Error] Failed to update plots: {e}")
@@ -743,7 +1159,9 @@ class LaneCounterApp:
         skipped_count = len(skipped_approach_names)
         defined_polygons_set = set(self.defined_polygons.keys())
 
-        for approach_name_sum, video_path_sum in config.VIDEO_PATHS:
+        approaches_for_summary = [(zone_name, video_path) for camera_name, video_path in config.VIDEO_PATHS
+                                  for zone_name in self._zones_for_camera(camera_name)]
+        for approach_name_sum, video_path_sum in approaches_for_summary:
             filename_base = os.path.basename(video_path_sum)
             summary_text += f"--- Summary for Approach: {approach_name_sum} ({filename_base}) ---\n"
 
@@ -759,7 +1177,7 @@ class LaneCounterApp:
                 elif data.get('type') == 'final_summary':
                     summary_text += f"  STATUS: Completed OK\n"
                     summary_text += f"  Total frames read: {data.get('total_frames_read', 'N/A')}\n"
-                    summary_text += f"  Frames processed: {data.get('processed_frames_counted', 'N/A')} (Every {config.PROCESS_EVERY_N_FRAMES})\n"
+                    summary_text += f"  Frames processed: {data.get('processed_frames_counted', 'N/A')} (Every {config.PROCESS_EVERY_N_FRAMES}{', adaptive' if config.ADAPTIVE_SAMPLING_ENABLED else ''})\n"
                     summary_text += f"  Vehicles IN LANE (Total Agg): {data.get('total_vehicles_in_lane_agg', 'N/A')}\n"
                     total_counts_by_type = data.get('total_counts_by_type', {})
                     if total_counts_by_type:
@@ -768,10 +1186,21 @@ class LaneCounterApp:
                     else: summary_text += "  Total Counts by Type (In Lane): None Recorded\n"
                     summary_text += f"  General Vehicles Outside Lane: {data.get('total_general_detections_outside_lane', 'N/A')}\n"
                     summary_text += f"  Ambulances Detected Outside Lane: {data.get('total_ambulances_outside_lane', 'N/A')}\n"
+                    summary_text += f"  Inference skipped (no motion): {data.get('inference_skipped_frames', 0)} frames\n"
+                    if config.LANE_UPDATE_SUPPRESS_UNCHANGED:
+                        summary_text += f"  Unchanged lane updates suppressed: {data.get('suppressed_repeats', 0)} (heartbeat {config.WORKER_HEARTBEAT_INTERVAL_S}s)\n"
+                    shed = self.shed_counts.get(approach_name_sum, {})
+                    summary_text += f"  Lane updates shed (sampled frames): {shed.get('too_old', 0)} too old (> {config.LANE_UPDATE_MAX_AGE_S}s), {shed.get('channel_full', 0)} dropped (channel full)\n"
                     proc_time = data.get('processing_time_sec', 0)
                     summary_text += f"  Processing time: {proc_time:.2f} sec\n"
                     avg_read_fps = data.get('avg_reading_fps', 0); avg_proc_fps = data.get('avg_processing_rate_fps', 0)
-                    summary_text += f"  Avg reading FPS: {avg_read_fps:.2f}\n"; summary_text += f"  Avg processing rate: {avg_proc_fps:.2f} fps\n\n"
+                    summary_text += f"  Avg reading FPS: {avg_read_fps:.2f}\n"; summary_text += f"  Avg processing rate: {avg_proc_fps:.2f} fps\n"
+                    if data.get('profile'):
+                        summary_text += f"  Stage profile ({data.get('profile_path', 'not saved')}):\n"
+                        for stage_name, stage_stats in data['profile'].items():
+                            summary_text += (f"    - {stage_name:<22} avg {stage_stats['avg_ms']:8.2f} ms  max {stage_stats['max_ms']:8.2f} ms  "
+                                             f"x{stage_stats['count']:<6} {stage_stats['share_of_wall'] * 100:5.1f}% of wall\n")
+                    summary_text += "\n"
                     processed_ok_count += 1
                 else: 
                     summary_text += f"  STATUS: Incomplete Final Data\n"; summary_text += f"  Data Received: {str(data)[:150]}...\n\n"
@@ -782,6 +1211,21 @@ class LaneCounterApp:
 
         summary_text += "----------------------------------------------------------------------\n"
         summary_text += f"Overall Processed: {processed_ok_count} OK, {processed_err_count} Error, {missing_summary_count} Missing Summary. Skipped Initially: {skipped_count}.\n"
+        for esp_port, esp_stats in (self.esp32_devices.get_stats().items() if self.esp32_devices else []):
+            summary_text += (f"ESP32 link {esp_port} ({', '.join(esp_stats['intersections'])}): {esp_stats['commands_sent']} sent, {esp_stats['commands_coalesced']} coalesced, "
+                             f"{esp_stats['commands_dropped']} dropped, avg write {esp_stats['avg_write_latency_ms']:.2f} ms "
+                             f"(max {esp_stats['max_write_latency_ms']:.2f} ms), {esp_stats['reconnect_attempts']} connect attempts.\n")
+            if esp_stats['protocol'] == "binary":
+                summary_text += (f"ESP32 ACKs: {esp_stats['acks_received']} ok, {esp_stats['acks_rejected']} rejected, "
+                                 f"{esp_stats['ack_timeouts']} timed out, RTT avg {esp_stats['avg_rtt_ms']:.2f} ms "
+                                 f"(max {esp_stats['max_rtt_ms']:.2f} ms), lamps confirmed: {esp_stats['lamps_confirmed']}.\n")
+        trace_percentiles = self.latency_tracer.percentiles() if self.latency_tracer else {}
+        if trace_percentiles:
+            summary_text += "Latency by stage (ms, " + "/".join(f"p{p}" for p in TRACE_PERCENTILES) + "):\n"
+            for stage_name, _, _ in TRACE_STAGES:
+                if stage_name in trace_percentiles:
+                    stage_percentiles = trace_percentiles[stage_name]
+                    summary_text += f"  {stage_name:<22} " + " / ".join(f"{stage_percentiles[p]:.1f}" for p in TRACE_PERCENTILES) + f"  (n={stage_percentiles['count']})\n"
         summary_text += "======================================================================\n"
 
         text_area.insert(tk.INSERT, summary_text); text_area.config(state=tk.DISABLED)
@@ -801,12 +1245,33 @@ class LaneCounterApp:
                 except: pass
             self.traffic_logic_timer_id = None
             self.plot_update_timer_id = None
-
-            if self.esp32_controller:
-                print("[GUI] Closing ESP32 connection...")
+            if self.queue_check_id:
+                try: self.root.after_cancel(self.queue_check_id)
+                except: pass
+                self.queue_check_id = None
+            if self.queue_wakeup is not None:
+                try: self.root.tk.deletefilehandler(self.queue_wakeup.fileno())
+                except Exception: pass
+                self.queue_wakeup.close()
+                self.queue_wakeup = None
+
+            if self.priority_listener:
+                try: self.priority_queue.put(None); self.priority_listener.join(timeout=1.0)
+                except Exception: pass
+                self.priority_listener = None
+
+            if self.metrics_server:
+                try: self.metrics_server.shutdown(); self.metrics_server.server_close()
+                except Exception: pass
+                self.metrics_server = None
+
+            if self.esp32_devices:
+                print("[GUI] Closing ESP32 connections...")
                 try:
-                    self.esp32_controller.close()
-                    print("[GUI] ESP32 connection closed.")
+                    for esp_port, esp_stats in self.esp32_devices.get_stats().items():
+                        print(f"[GUI] ESP32 link stats ({esp_port}): {esp_stats}")
+                    self.esp32_devices.close()
+                    print("[GUI] ESP32 connections closed.")
                 except Exception as e_esp_close:
                     print(f"[GUI Error] Error closing ESP32 connection: {e_esp_close}")
 
@@ -0,0 +1,102 @@
+import multiprocessing as mp
+from collections import defaultdict
+from queue import Empty, Full
+
+
+class LaneChannel:
+    """
+    Bounded worker -> GUI channel for one camera's lane_update messages. When the GUI falls behind, the worker drops
+    the oldest queued update instead of growing the queue; drops are counted per approach in sampled frames (a
+    coalesced update counts its 'repeat_count') and reported as 'channel_dropped' on that approach's next message. Control messages stay on the unbounded results queue.
+    """
+    def __init__(self, capacity):
+        self.capacity = max(1, int(capacity))
+        self._queue = mp.Queue(maxsize=self.capacity)
+        self._dropped = defaultdict(int)  # producer-side, per approach
+
+    def put(self, message):
+        approach_name = message.get('approach')
+        if self._dropped.get(approach_name):
+            message['channel_dropped'] = self._dropped.pop(approach_name)
+        try:
+            self._queue.put_nowait(message)
+            return
+        except Full:
+            pass
+        try:
+            # Waits briefly for the feeder thread if the queued items are still in flight to the pipe
+            oldest = self._queue.get(timeout=0.05)
+            self._dropped[oldest.get('approach')] += oldest.get('repeat_count', 1) + oldest.get('channel_dropped', 0)
+            self._queue.put_nowait(message)
+        except (Empty, Full):
+            self._dropped[approach_name] += message.get('repeat_count', 1) + message.pop('channel_dropped', 0)
+
+    def get_nowait(self):
+        return self._queue.get_nowait()
+
+    def qsize(self):
+        try:
+            return self._queue.qsize()
+        except NotImplementedError:  # macOS has no sem_getvalue
+            return -1
+
+
+class LaneUpdateFilter:
+    """
+    Worker-side delta suppression for lane_update messages. A zone's update is sent when its counts or ambulance flag
+    change, otherwise at most every `heartbeat_interval_s`. Nothing is lost: every sent message carries 'repeat_count'
+    (the sampled frames it stands for) and the per-update frame counters of the frames suppressed before it, and a
+    change first flushes the pending run of the previous content.
+    """
+    ADDITIVE_FIELDS = ('frames_read_since_update', 'frames_skipped_since_update', 'inferences_since_update')
+
+    def __init__(self, heartbeat_interval_s=1.0):
+        self.heartbeat_interval_s = heartbeat_interval_s
+        self._last_key = {}
+        self._last_sent_at = {}
+        self._pending = {}  # zone -> newest suppressed message, its repeat_count/counters covering the whole run
+        self.suppressed = defaultdict(int)
+
+    def filter(self, message, now):
+        """ Returns the messages to send now for this frame's update (possibly none). """
+        zone_name = message['approach']
+        key = (tuple(sorted(message['counts_by_type'].items())), message['ambulance_detected'])
+        pending = self._pending.pop(zone_name, None)
+        if key != self._last_key.get(zone_name):
+            self._last_key[zone_name] = key
+            self._last_sent_at[zone_name] = now
+            message['repeat_count'] = 1
+            return [pending, message] if pending is not None else [message]
+
+        message['repeat_count'] = 1
+        if pending is not None:
+            message['repeat_count'] += pending['repeat_count']
+            for field in self.ADDITIVE_FIELDS:
+                message[field] = message.get(field, 0) + pending.get(field, 0)
+        if now - self._last_sent_at[zone_name] < self.heartbeat_interval_s:
+            self._pending[zone_name] = message
+            self.suppressed[zone_name] += 1
+            return []
+        self._last_sent_at[zone_name] = now
+        message['heartbeat'] = True
+        return [message]
+
+    def flush(self):
+        """ Pending runs, to send before the worker's final summary. """
+        pending = list(self._pending.values())
+        self._pending.clear()
+        return pending
+
+
+def validate_heartbeat_interval(heartbeat_interval_s, traffic_light_config):
+    """
+    With suppression, an unchanged green approach is only reported every heartbeat, so a heartbeat at or above an
+    intersection's gap_time (or ambulance_request_timeout) would gap out / expire requests on a steady flow.
+    """
+    for intersection_name, intersection_config in traffic_light_config.items():
+        timings = intersection_config.get('timings', {})
+        for timing_key in ('gap_time', 'ambulance_request_timeout'):
+            limit = timings.get(timing_key)
+            if limit is not None and heartbeat_interval_s >= limit:
+                raise ValueError(f"WORKER_HEARTBEAT_INTERVAL_S ({heartbeat_interval_s}s) must be below {timing_key} "
+                                 f"({limit}s) of intersection '{intersection_name}' while LANE_UPDATE_SUPPRESS_UNCHANGED is on.")
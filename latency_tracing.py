@@ -0,0 +1,70 @@
+import threading
+import numpy as np
+from ring_buffer import RingBuffer
+
+# (stage name, start stamp, end stamp) measured from each lane_update's 'trace' dict
+TRACE_STAGES = (
+    ("capture_to_inference", "capture", "inference_start"),
+    ("inference", "inference_start", "inference_end"),
+    ("inference_to_enqueue", "inference_end", "enqueue"),
+    ("queue_transit", "enqueue", "drain"),
+    ("drain_to_decision", "drain", "decision"),
+    ("decision_to_serial", "decision", "serial_send"),
+    ("capture_to_decision", "capture", "decision"),
+    ("capture_to_serial", "capture", "serial_send"),
+)
+TRACE_PERCENTILES = (50, 90, 99)
+
+
+class LatencyTracer:
+    """ Collects per-stage latencies from trace stamps; drain/decision stamps come from the GUI thread, serial_send from ESP32 writer threads. """
+    def __init__(self, approach_to_intersection, window=2048, on_stage_latency=None):
+        self.approach_to_intersection = approach_to_intersection
+        self.on_stage_latency = on_stage_latency
+        self._lock = threading.Lock()
+        self._stage_samples = {stage_name: RingBuffer(window) for stage_name, _, _ in TRACE_STAGES}
+        self._awaiting_decision = {}
+
+    def _record_stages(self, trace, end_stamp):
+        for stage_name, start_key, end_key in TRACE_STAGES:
+            if end_key != end_stamp: continue
+            start_time, end_time = trace.get(start_key), trace.get(end_key)
+            if start_time is None or end_time is None: continue
+            latency_ms = max(0.0, (end_time - start_time) * 1000.0)
+            with self._lock:
+                self._stage_samples[stage_name].append(latency_ms)
+            if self.on_stage_latency: self.on_stage_latency(stage_name, latency_ms)
+
+    def mark_drain(self, approach_name, trace, drain_time):
+        trace = dict(trace, drain=drain_time)
+        for stamp in ("inference_start", "inference_end", "enqueue", "drain"):
+            self._record_stages(trace, stamp)
+        self._awaiting_decision[approach_name] = trace
+        return trace
+
+    def mark_decision(self, decision_time):
+        """ Stamps every trace drained since the previous controller tick; returns the newest trace per intersection. """
+        newest_by_intersection = {}
+        for approach_name, trace in self._awaiting_decision.items():
+            trace['decision'] = decision_time
+            self._record_stages(trace, "decision")
+            intersection_name = self.approach_to_intersection.get(approach_name)
+            newest = newest_by_intersection.get(intersection_name)
+            if newest is None or trace.get('capture', 0) > newest.get('capture', 0):
+                newest_by_intersection[intersection_name] = trace
+        self._awaiting_decision = {}
+        return newest_by_intersection
+
+    def mark_serial_send(self, trace, send_time):
+        trace = dict(trace, serial_send=send_time)
+        self._record_stages(trace, "serial_send")
+
+    def percentiles(self):
+        results = {}
+        with self._lock:
+            snapshots = {stage_name: samples.view()[:, 0].copy() for stage_name, samples in self._stage_samples.items()}
+        for stage_name, values in snapshots.items():
+            if values.size == 0: continue
+            results[stage_name] = {p: float(v) for p, v in zip(TRACE_PERCENTILES, np.percentile(values, TRACE_PERCENTILES))}
+            results[stage_name]['count'] = int(values.size)
+        return results
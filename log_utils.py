@@ -0,0 +1,132 @@
+import json
+import logging
+import logging.handlers
+import multiprocessing as mp
+import os
+import threading
+import time
+
+LOGGER_ROOT = "traffic"
+_STANDARD_RECORD_FIELDS = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+_log_queue = None
+_log_listener = None
+
+
+def get_logger(component):
+    return logging.getLogger(f"{LOGGER_ROOT}.{component}")
+
+
+class JsonFormatter(logging.Formatter):
+    """ One JSON object per line; fields passed via `extra=` become top-level keys. """
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 6),
+            'level': record.levelname,
+            'logger': record.name,
+            'pid': record.process,
+            'thread': record.threadName,
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_RECORD_FIELDS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class ConsoleFormatter(logging.Formatter):
+    context_fields = ('intersection', 'camera', 'port')
+
+    def format(self, record):
+        context = next((str(getattr(record, field)) for field in self.context_fields if hasattr(record, field)), None)
+        line = f"[{record.name.split('.')[-1]}{' | ' + context if context else ''}] {record.levelname}: {record.getMessage()}"
+        if getattr(record, 'suppressed', 0):
+            line += f" (+{record.suppressed} similar suppressed)"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        elif record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+class RateLimitFilter(logging.Filter):
+    """ Lets at most `burst` records per message template through every `interval_s`; the next one that passes carries a `suppressed` count. """
+    def __init__(self, interval_s=5.0, burst=5):
+        super().__init__()
+        self.interval_s = interval_s
+        self.burst = burst
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.interval_s <= 0 or record.levelno >= logging.ERROR:
+            return True
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval_s:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+            elif window[1] < self.burst:
+                window[1] += 1
+                suppressed, window[2] = window[2], 0
+            else:
+                window[2] += 1
+                return False
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+def _build_queue_handler(log_queue, level, rate_limit_interval_s, rate_limit_burst):
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(rate_limit_interval_s, rate_limit_burst))
+    logger = logging.getLogger(LOGGER_ROOT)
+    logger.handlers = [queue_handler]
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
+
+
+def start_logging(log_file, level="INFO", console_level="INFO", max_bytes=5_000_000, backup_count=5,
+                  rate_limit_interval_s=5.0, rate_limit_burst=5):
+    """ Main process: callers only enqueue records; a listener thread writes the rotating JSON file and the console. """
+    global _log_queue, _log_listener
+    if _log_listener is not None:
+        return _log_queue
+
+    log_dir = os.path.dirname(log_file)
+    if log_dir: os.makedirs(log_dir, exist_ok=True)
+    file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+    file_handler.setFormatter(JsonFormatter())
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(console_level)
+    console_handler.setFormatter(ConsoleFormatter())
+
+    _log_queue = mp.Queue(-1)
+    _log_listener = logging.handlers.QueueListener(_log_queue, file_handler, console_handler, respect_handler_level=True)
+    _log_listener.start()
+    _build_queue_handler(_log_queue, level, rate_limit_interval_s, rate_limit_burst)
+    return _log_queue
+
+
+def configure_worker_logging(log_queue, level="INFO", rate_limit_interval_s=5.0, rate_limit_burst=5):
+    """ Spawned workers: route records to the main process listener through the shared queue. """
+    if log_queue is not None:
+        _build_queue_handler(log_queue, level, rate_limit_interval_s, rate_limit_burst)
+
+
+def get_log_queue():
+    return _log_queue
+
+
+def stop_logging():
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
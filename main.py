@@ -1,28 +1,57 @@
+import time
+_STARTUP_T0 = time.perf_counter()
 import tkinter as tk
 import multiprocessing as mp
 import os
 import sys
-import cv2 
+import argparse
+import config
+import log_utils
 from gui import LaneCounterApp
+_STARTUP_IMPORTS_DONE = time.perf_counter()
+
+# Modules that should not be loaded in the GUI process before workers need them (see gui.py)
+HEAVY_MODULES = ("torch", "ultralytics", "matplotlib", "cv2")
+
+
+def startup_report(marks):
+    """ marks: ordered (phase, perf_counter) pairs after _STARTUP_T0. Prints per-phase time and heavy modules already loaded. """
+    previous, phases = _STARTUP_T0, []
+    for phase, stamp in marks:
+        phases.append(f"{phase} {(stamp - previous) * 1000:.0f} ms")
+        previous = stamp
+    loaded_heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+    print(f"[Main] Startup to window: {(previous - _STARTUP_T0) * 1000:.0f} ms ({', '.join(phases)}). "
+          f"Heavy modules loaded in GUI process: {loaded_heavy or 'none'}")
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Adaptive traffic light control from lane video feeds.")
+    parser.add_argument("--profile", action="store_true", help="Record per-stage worker timings to PROFILE_OUTPUT_DIR.")
+    parser.add_argument("--profile-sampling", action="store_true", help="With --profile, also sample worker Python stacks (folded output).")
+    parser.add_argument("--profile-dir", default=None, help="Directory for profile files (default: config.PROFILE_OUTPUT_DIR).")
+    parser.add_argument("--start-method", choices=("spawn", "forkserver"), default=None,
+                        help="Worker start method (default: config.WORKER_START_METHOD).")
+    args = parser.parse_args()
+    if args.profile or args.profile_sampling:
+        config.PROFILE_ENABLED = True
+        config.PROFILE_SAMPLING = config.PROFILE_SAMPLING or args.profile_sampling
+        if args.profile_dir: config.PROFILE_OUTPUT_DIR = args.profile_dir
+        print(f"[Main] Worker profiling enabled (sampling: {config.PROFILE_SAMPLING}) -> {config.PROFILE_OUTPUT_DIR}/")
     
+    start_method = args.start_method or config.WORKER_START_METHOD
+    if start_method not in mp.get_all_start_methods():
+        print(f"[Main] Start method '{start_method}' is not available on this platform. Falling back to 'spawn'.")
+        start_method = 'spawn'
     try:
-        
         current_method = mp.get_start_method(allow_none=True)
-        if current_method is None:
-             mp.set_start_method('spawn', force=True)
-             print("[Main] Set multiprocessing start method to 'spawn'.")
-        elif current_method != 'spawn':
-             
-             try:
-                 mp.set_start_method('spawn', force=True)
-                 print("[Main] Forcing multiprocessing start method to 'spawn'.")
-             except RuntimeError as re:
-                 print(f"[Main] Warning: Could not force 'spawn' ({re}). Using existing '{current_method}'.")
-        else:
-            print(f"[Main] Multiprocessing start method already set to 'spawn'.")
-    except Exception as e: 
+        if current_method != start_method:
+            mp.set_start_method(start_method, force=True)
+        print(f"[Main] Multiprocessing start method: '{start_method}'.")
+        if start_method == 'forkserver':
+            # The template imports torch/ultralytics (and loads weights with WORKER_PRELOAD_MODELS) once; workers fork from it.
+            mp.set_forkserver_preload(['worker_preload'])
+            print(f"[Main] Workers fork from a preloaded template (model preload: {config.WORKER_PRELOAD_MODELS}).")
+    except Exception as e:
         print(f"[Main] Warning: Issue setting start method ('{mp.get_start_method(allow_none=True)}'): {e}.")
 
 
@@ -41,9 +70,16 @@ if __name__ == '__main__':
             except Exception as e2:
                  print(f"[Main] Could not set DPI awareness: {e2}")
 
-    
+ 
+    log_utils.start_logging(config.LOG_FILE, level=config.LOG_LEVEL, console_level=config.LOG_CONSOLE_LEVEL,
+                            max_bytes=config.LOG_MAX_BYTES, backup_count=config.LOG_BACKUP_COUNT,
+                            rate_limit_interval_s=config.LOG_RATE_LIMIT_INTERVAL_S, rate_limit_burst=config.LOG_RATE_LIMIT_BURST)
+    print(f"[Main] Structured logs -> {config.LOG_FILE}")
+    logging_ready = time.perf_counter()
+
     root = tk.Tk()
     app = LaneCounterApp(root) 
+    startup_report([("imports", _STARTUP_IMPORTS_DONE), ("setup+logging", logging_ready), ("window", time.perf_counter())])
 
     
     
@@ -58,5 +94,7 @@ if __name__ == '__main__':
             root.destroy()
         except tk.TclError:
             pass 
-    cv2.destroyAllWindows()
+    if 'cv2' in sys.modules:  # only loaded if polygon definition ran
+        sys.modules['cv2'].destroyAllWindows()
+    log_utils.stop_logging()
     print("[Main] Script finished.")
\ No newline at end of file
@@ -0,0 +1,180 @@
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+PHASE_DURATION_BUCKETS_S = (1, 2, 3, 5, 8, 12, 20, 30, 45, 60, 90, 120)
+
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values))
+    if extra: pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value):
+    return repr(float(value)) if value != float('inf') else "+Inf"
+
+
+class _Metric:
+    metric_type = "untyped"
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label_name, "")) for label_name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_LATENCY_BUCKETS_MS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        bucket_index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bucket_index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+        with self._lock:
+            snapshot = sorted((label_values, (list(state[0]), state[1], state[2])) for label_values, state in self._values.items())
+        for label_values, (bucket_counts, total, count) in snapshot:
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets + (float('inf'),), bucket_counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(self.label_names, label_values, ("le", _format_value(upper_bound)))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            plain_labels = _format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{plain_labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{plain_labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class, name, help_text, label_names, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = metric_class(name, help_text, label_names, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name, help_text, label_names=()):
+        return self._register(Counter, name, help_text, label_names)
+
+    def gauge(self, name, help_text, label_names=()):
+        return self._register(Gauge, name, help_text, label_names)
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_LATENCY_BUCKETS_MS):
+        return self._register(Histogram, name, help_text, label_names, buckets=buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+FRAMES_READ = REGISTRY.counter("traffic_frames_read_total", "Frames decoded or grabbed from the approach's video source.", ("approach",))
+FRAMES_DROPPED = REGISTRY.counter("traffic_frames_dropped_total", "Frames not sent to inference, by reason.", ("approach", "reason"))
+INFERENCES = REGISTRY.counter("traffic_inference_total", "Frames that ran detection.", ("approach",))
+DECODE_LATENCY_MS = REGISTRY.histogram("traffic_decode_latency_ms", "Time to decode a sampled frame.", ("approach",))
+INFERENCE_LATENCY_MS = REGISTRY.histogram("traffic_inference_latency_ms", "Detection time per inferred frame.", ("approach",))
+MESSAGE_LAG_MS = REGISTRY.histogram("traffic_message_lag_ms", "Frame capture to GUI drain delay of lane updates.", ("approach",))
+QUEUE_DEPTH = REGISTRY.gauge("traffic_results_queue_depth", "Messages waiting in the results queue, sampled on the controller tick.")
+CONTROLLER_TICK_MS = REGISTRY.histogram("traffic_controller_tick_ms", "Duration of one TrafficLightController.update_state tick.",
+                                        buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100))
+PHASE_DURATION_S = REGISTRY.histogram("traffic_phase_duration_seconds", "Time spent in a signal state before it changed.",
+                                      ("intersection", "phase", "state"), buckets=PHASE_DURATION_BUCKETS_S)
+SERIAL_WRITE_LATENCY_MS = REGISTRY.histogram("traffic_serial_write_latency_ms", "ESP32 serial write+flush time.", ("port",),
+                                             buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000))
+SERIAL_ACK_RTT_MS = REGISTRY.histogram("traffic_serial_ack_rtt_ms", "ESP32 lamp frame to ACK round trip.", ("port",),
+                                       buckets=(0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500))
+TRACE_STAGE_LATENCY_MS = REGISTRY.histogram("traffic_trace_stage_latency_ms", "Capture-to-lamp trace latency per stage.", ("stage",))
+TRACE_STAGE_PERCENTILE_MS = REGISTRY.gauge("traffic_trace_stage_percentile_ms", "Recent-window percentile of each trace stage.", ("stage", "quantile"))
+SERIAL_COMMANDS_DROPPED = REGISTRY.counter("traffic_serial_commands_dropped_total", "ESP32 commands that failed to write.", ("port",))
+LANE_UPDATES_SHED = REGISTRY.counter("traffic_lane_updates_shed_total", "Sampled frames whose lane updates were discarded before reaching the controller, by reason.", ("approach", "reason"))
+LANE_UPDATES_SUPPRESSED = REGISTRY.counter("traffic_lane_updates_suppressed_total", "Sampled frames whose unchanged lane update was folded into a later message (repeat_count).", ("approach",))
+LANE_CHANNEL_DEPTH = REGISTRY.gauge("traffic_lane_channel_depth", "Lane updates waiting in a camera's bounded channel.", ("camera",))
+EMERGENCY_ALERT_LATENCY_MS = REGISTRY.histogram("traffic_emergency_alert_latency_ms", "Ambulance frame capture to preemption decision via the priority channel.", ("approach",))
+WORKER_RESTARTS = REGISTRY.counter("traffic_worker_restarts_total", "Camera workers restarted by the supervisor.", ("camera",))
+STALE_APPROACHES = REGISTRY.gauge("traffic_stale_approaches", "Approaches currently fed on recall because their worker is down.")
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(host, port, registry=REGISTRY):
+    """ Serves the registry in Prometheus text format at http://host:port/metrics from a daemon thread. """
+    handler_class = type("MetricsRequestHandler", (_MetricsRequestHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler_class)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="MetricsServer", daemon=True).start()
+    return server
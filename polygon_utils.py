@@ -147,4 +147,33 @@ def define_polygon_interactive(approach_name, video_path):
     _frame_display = None
     _original_frame = None
     _window_name_global = ""
-    return None
\ No newline at end of file
+    return None
+
+def build_zone_label_map(zone_polygons, frame_shape):
+    # One bit per zone so overlapping zones (e.g. a shared stop line) can both claim a detection.
+    frame_h, frame_w = frame_shape[:2]
+    num_zones = len(zone_polygons)
+    if num_zones > 32:
+        raise ValueError(f"At most 32 zones per camera are supported. Got {num_zones}.")
+    label_dtype = np.uint8 if num_zones <= 8 else (np.uint16 if num_zones <= 16 else np.uint32)
+
+    label_map = np.zeros((frame_h, frame_w), dtype=label_dtype)
+    zone_mask = np.zeros((frame_h, frame_w), dtype=np.uint8)
+    for zone_bit, polygon in enumerate(zone_polygons):
+        zone_mask.fill(0)
+        cv2.fillPoly(zone_mask, [np.asarray(polygon, dtype=np.int32).reshape(-1, 1, 2)], 1)
+        label_map[zone_mask.astype(bool)] |= label_dtype(1 << zone_bit)
+    return label_map
+
+
+def lookup_zone_bits(label_map, ref_points):
+    ref_points = np.asarray(ref_points, dtype=np.int64).reshape(-1, 2)
+    zone_bits = np.zeros(len(ref_points), dtype=label_map.dtype)
+    if len(ref_points) == 0:
+        return zone_bits
+
+    frame_h, frame_w = label_map.shape[:2]
+    xs = ref_points[:, 0]; ys = ref_points[:, 1]
+    inside_frame = (xs >= 0) & (xs < frame_w) & (ys >= 0) & (ys < frame_h)
+    zone_bits[inside_frame] = label_map[ys[inside_frame], xs[inside_frame]]
+    return zone_bits
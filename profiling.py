@@ -0,0 +1,121 @@
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+_NULL_STAGE = contextlib.nullcontext()
+
+
+class _StageTimer:
+    __slots__ = ('profiler', 'name', 'start', 'nested_ms')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.nested_ms = 0.0
+        self.profiler._active.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed_ms = (time.perf_counter() - self.start) * 1000.0
+        self.profiler._active.pop()
+        if self.profiler._active:
+            self.profiler._active[-1].nested_ms += elapsed_ms
+        self.profiler.add(self.name, elapsed_ms - self.nested_ms)
+        return False
+
+
+class StageProfiler:
+    """
+    Wall time per named stage; when disabled, stage() returns a shared no-op context. A stage opened inside another is
+    charged only to itself, so the stages never count the same time twice.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._stages = defaultdict(lambda: [0, 0.0, 0.0])
+        self._active = []
+        self._started_at = time.perf_counter()
+
+    def stage(self, name):
+        return _StageTimer(self, name) if self.enabled else _NULL_STAGE
+
+    def add(self, name, elapsed_ms):
+        if not self.enabled: return
+        stage_stats = self._stages[name]
+        stage_stats[0] += 1
+        stage_stats[1] += elapsed_ms
+        if elapsed_ms > stage_stats[2]: stage_stats[2] = elapsed_ms
+
+    def summary(self):
+        wall_ms = (time.perf_counter() - self._started_at) * 1000.0
+        stages = {}
+        for name, (count, total_ms, max_ms) in sorted(self._stages.items(), key=lambda item: -item[1][1]):
+            stages[name] = {'count': count, 'total_ms': round(total_ms, 3), 'avg_ms': round(total_ms / count, 3) if count else 0.0,
+                            'max_ms': round(max_ms, 3), 'share_of_wall': round(total_ms / wall_ms, 4) if wall_ms > 0 else 0.0}
+        return {'wall_ms': round(wall_ms, 3), 'stages': stages}
+
+
+class SamplingProfiler:
+    """ Samples one thread's Python stack every `interval_s` via sys._current_frames; output is folded stacks (flamegraph.pl / speedscope compatible). """
+    def __init__(self, interval_s=0.005, thread_ident=None, max_depth=48):
+        self.interval_s = interval_s
+        self.thread_ident = thread_ident if thread_ident is not None else threading.get_ident()
+        self.max_depth = max_depth
+        self.stack_counts = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_ident)
+            if frame is None: continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stack_counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread: self._thread.join(timeout=1.0)
+
+    def top_functions(self, limit=15):
+        self_counts = Counter()
+        for stack, count in self.stack_counts.items():
+            self_counts[stack.rsplit(";", 1)[-1]] += count
+        return [{'function': name, 'samples': count, 'share': round(count / self.samples, 4) if self.samples else 0.0}
+                for name, count in self_counts.most_common(limit)]
+
+    def write_folded(self, path):
+        with open(path, 'w', encoding='utf-8') as folded_file:
+            for stack, count in self.stack_counts.most_common():
+                folded_file.write(f"{stack} {count}\n")
+
+
+def dump_profile(output_dir, camera_name, stage_profiler, sampling_profiler=None, extra=None):
+    """ Writes <output_dir>/<camera>_<pid>.json (and .folded when sampling); returns (report, json_path). """
+    os.makedirs(output_dir, exist_ok=True)
+    safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in camera_name)
+    base_path = os.path.join(output_dir, f"{safe_name}_{os.getpid()}")
+    report = {'camera': camera_name, 'pid': os.getpid(), **stage_profiler.summary(), **(extra or {})}
+    if sampling_profiler is not None:
+        sampling_profiler.write_folded(base_path + ".folded")
+        report['sampling'] = {'interval_s': sampling_profiler.interval_s, 'samples': sampling_profiler.samples,
+                              'top_functions': sampling_profiler.top_functions(), 'folded_stacks': base_path + ".folded"}
+    with open(base_path + ".json", 'w', encoding='utf-8') as report_file:
+        json.dump(report, report_file, indent=2)
+    return report, base_path + ".json"
@@ -0,0 +1,60 @@
+import multiprocessing as mp
+import os
+
+
+class QueueWakeup:
+    """
+    Self-pipe shared by all workers: a worker writes one byte after every message it queues, and the GUI watches the
+    read end with Tk's file handler, so queues are drained when data arrives instead of on a fixed poll.
+    Only the write end is sent to workers. POSIX only (Tk has no file handlers on Windows).
+    """
+    def __init__(self):
+        self._reader, self._writer = mp.Pipe(duplex=False)
+        os.set_blocking(self._reader.fileno(), False)
+        self._writer_nonblocking = False
+
+    def __getstate__(self):
+        return {'_reader': None, '_writer': self._writer, '_writer_nonblocking': False}
+
+    @staticmethod
+    def supported(tk_app):
+        return os.name == 'posix' and hasattr(tk_app, 'createfilehandler')
+
+    def fileno(self):
+        return self._reader.fileno()
+
+    def notify(self):
+        fd = self._writer.fileno()
+        if not self._writer_nonblocking:
+            os.set_blocking(fd, False)
+            self._writer_nonblocking = True
+        try:
+            os.write(fd, b'\0')
+        except BlockingIOError:
+            pass  # pipe full: the GUI has plenty of wakeups pending already
+        except OSError:
+            pass  # GUI gone; the worker is about to be terminated
+
+    def clear(self):
+        try:
+            while os.read(self._reader.fileno(), 4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+    def close(self):
+        for conn in (self._reader, self._writer):
+            if conn is not None:
+                try: conn.close()
+                except OSError: pass
+
+
+class NotifyingQueue:
+    """ Worker-side wrapper: forwards put() to `queue`, then signals the GUI through `wakeup`. """
+    def __init__(self, queue, wakeup):
+        self._queue = queue
+        self._wakeup = wakeup
+
+    def put(self, message):
+        self._queue.put(message)
+        self._wakeup.notify()
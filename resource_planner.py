@@ -0,0 +1,87 @@
+import os
+from log_utils import get_logger
+
+logger = get_logger("resources")
+
+
+def available_cpus():
+    """ CPUs this process may run on (respects an inherited affinity mask / container limit where the OS exposes it). """
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    try:
+        import psutil
+        return sorted(psutil.Process().cpu_affinity())
+    except (ImportError, AttributeError, OSError):
+        return list(range(os.cpu_count() or 1))
+
+
+def plan_worker_resources(camera_names, cpus=None, reserved_cores=1, max_threads_per_worker=None, pin_cpus=True):
+    """
+    Splits the CPU set into one contiguous block per worker, after leaving `reserved_cores` to the GUI process.
+    Each worker's intra-op (torch) and OpenCV thread counts equal its block size, so workers never oversubscribe.
+    With more workers than cores, cores are shared round-robin and every worker runs single-threaded.
+    """
+    cpus = sorted(cpus if cpus is not None else available_cpus())
+    camera_names = list(camera_names)
+    reserved = min(max(0, reserved_cores), max(0, len(cpus) - len(camera_names)), max(0, len(cpus) - 1))
+    pool = cpus[reserved:] or cpus
+    plan = {}
+    if not camera_names:
+        return plan
+    if len(camera_names) > len(pool):
+        for worker_index, camera_name in enumerate(camera_names):
+            plan[camera_name] = {'cpus': (pool[worker_index % len(pool)],) if pin_cpus else None,
+                                 'intra_op_threads': 1, 'cv2_threads': 1}
+        return plan
+
+    share, extra = divmod(len(pool), len(camera_names))
+    start = 0
+    for worker_index, camera_name in enumerate(camera_names):
+        size = share + (1 if worker_index < extra else 0)
+        block = tuple(pool[start:start + size])
+        start += size
+        threads = len(block) if not max_threads_per_worker else min(len(block), max_threads_per_worker)
+        plan[camera_name] = {'cpus': block if pin_cpus else None, 'intra_op_threads': threads, 'cv2_threads': threads}
+    return plan
+
+
+def log_plan(plan, log=logger):
+    log.info("Resource plan over CPUs %s for %s worker(s).", available_cpus(), len(plan))
+    for camera_name, entry in plan.items():
+        cpus = list(entry['cpus']) if entry['cpus'] is not None else None
+        log.info("Planned cpus=%s torch_threads=%s cv2_threads=%s", cpus if cpus is not None else 'any',
+                 entry['intra_op_threads'], entry['cv2_threads'],
+                 extra={'camera': camera_name, 'cpus': cpus, 'intra_op_threads': entry['intra_op_threads'],
+                        'cv2_threads': entry['cv2_threads']})
+
+
+def apply_worker_resources(entry, log=logger):
+    """ Applies one plan entry inside the worker process, before any model is loaded. """
+    if not entry:
+        return
+    cpus = entry.get('cpus')
+    if cpus:
+        try:
+            if hasattr(os, 'sched_setaffinity'):
+                os.sched_setaffinity(0, cpus)
+            else:
+                import psutil
+                psutil.Process().cpu_affinity(list(cpus))
+        except ImportError:
+            log.warning("CPU pinning skipped: psutil is required on this platform.")
+        except (OSError, ValueError) as e:
+            log.warning("CPU pinning to %s failed: %s", list(cpus), e)
+
+    import cv2
+    import torch
+    intra_op_threads = entry.get('intra_op_threads')
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # already fixed once parallel work has run in this process
+    if entry.get('cv2_threads'):
+        cv2.setNumThreads(entry['cv2_threads'])
+    log.info("Resources applied: cpus=%s torch_threads=%s cv2_threads=%s",
+             list(cpus) if cpus else 'any', torch.get_num_threads(), cv2.getNumThreads())
@@ -0,0 +1,27 @@
+import numpy as np
+
+
+class RingBuffer:
+    def __init__(self, capacity, columns=1, dtype=np.float64):
+        self.capacity = max(1, int(capacity))
+        self._data = np.zeros((self.capacity, columns), dtype=dtype)
+        self._next_index = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, *values):
+        self._data[self._next_index] = values
+        self._next_index = (self._next_index + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def view(self):
+        if self._size < self.capacity:
+            return self._data[:self._size]
+        return np.concatenate((self._data[self._next_index:], self._data[:self._next_index]))
+
+    def clear(self):
+        self._next_index = 0
+        self._size = 0
@@ -0,0 +1,16 @@
+import os
+import sys
+import time
+
+# The project modules live flat in the repository root
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path: sys.path.insert(0, REPO_ROOT)
+
+
+def wait_until(predicate, timeout_s=5.0):
+    """ Polls `predicate` until it is true or `timeout_s` passes; returns its last value. """
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if predicate(): return True
+        time.sleep(0.01)
+    return predicate()
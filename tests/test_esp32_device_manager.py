@@ -0,0 +1,56 @@
+import sys
+import time
+import pytest
+from conftest import wait_until
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason="LoopbackESP32 needs a pseudo-terminal")
+
+
+@pytest.fixture
+def two_devices():
+    from esp32_loopback import LoopbackESP32
+    from esp32_controller import ESP32DeviceManager
+    slow_device = LoopbackESP32(ack_delay_s=1.0).start()
+    healthy_device = LoopbackESP32().start()
+    manager = ESP32DeviceManager({
+        'I0': {'port': slow_device.port, 'approach_mapping': {'I0-North': 'N', 'I0-East': 'E'}},
+        'I1': {'port': healthy_device.port, 'approach_mapping': {'I1-North': 'N', 'I1-East': 'E'}},
+    }, 115200, ack_timeout=0.5)
+    assert wait_until(lambda: all(controller.is_connected for controller in manager.controllers.values()))
+    yield manager, slow_device, healthy_device
+    manager.close()
+    slow_device.stop()
+    healthy_device.stop()
+
+
+def _cycle_healthy_intersection(manager, healthy_device, cycles=5):
+    """ Returns the worst time from update_lights() to the healthy device showing the new lamps. """
+    worst_s = 0.0
+    for cycle in range(cycles):
+        north_state = 'GREEN' if cycle % 2 == 0 else 'RED'
+        manager.update_lights('I0', {'I0-North': {'state': north_state}})  # the slow/closed device gets traffic too
+        start = time.perf_counter()
+        manager.update_lights('I1', {'I1-North': {'state': north_state}})
+        assert wait_until(lambda: healthy_device.lamps['N'] == north_state[0], 2.0)
+        worst_s = max(worst_s, time.perf_counter() - start)
+    return worst_s
+
+
+def test_updates_route_to_each_intersection_device(two_devices):
+    manager, slow_device, healthy_device = two_devices
+    manager.update_lights('I0', {'I0-North': {'state': 'GREEN'}})
+    manager.update_lights('I1', {'I1-East': {'state': 'YELLOW'}})
+    assert wait_until(lambda: slow_device.lamps['N'] == 'G' and healthy_device.lamps['E'] == 'Y')
+    assert healthy_device.lamps['N'] == 'R' and slow_device.lamps['E'] == 'R'
+
+
+def test_stalled_device_does_not_delay_the_other(two_devices):
+    manager, slow_device, healthy_device = two_devices
+    # Each slow ACK holds the stalled device for 1 s and forces timeouts/resends on its controller
+    assert _cycle_healthy_intersection(manager, healthy_device) < 0.3
+
+
+def test_closed_device_does_not_delay_the_other(two_devices):
+    manager, slow_device, healthy_device = two_devices
+    slow_device.stop()
+    assert _cycle_healthy_intersection(manager, healthy_device) < 0.3
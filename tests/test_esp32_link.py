@@ -0,0 +1,99 @@
+import sys
+import pytest
+from conftest import wait_until
+from esp32_protocol import (AckParser, LampFrameParser, ACK_STATUS_BAD_PAYLOAD, ACK_STATUS_OK, decode_lamp_payload,
+                            encode_ack, encode_lamp_frame)
+
+posix_only = pytest.mark.skipif(sys.platform == 'win32', reason="LoopbackESP32 needs a pseudo-terminal")
+
+
+def test_lamp_frame_round_trip():
+    lamp_states = {'N': 'G', 'E': 'R', 'S': 'Y', 'W': 'O'}
+    frames = LampFrameParser().feed(encode_lamp_frame(7, lamp_states))
+    assert len(frames) == 1
+    seq, payload = frames[0]
+    assert seq == 7
+    assert decode_lamp_payload(payload) == lamp_states
+
+
+def test_lamp_frames_split_across_reads():
+    data = encode_lamp_frame(1, {'N': 'G'}) + encode_lamp_frame(2, {'E': 'Y'})
+    parser = LampFrameParser()
+    frames = []
+    for i in range(len(data)):
+        frames += parser.feed(data[i:i + 1])
+    assert [seq for seq, _ in frames] == [1, 2]
+
+
+def test_corrupted_frame_is_dropped_and_parser_recovers():
+    corrupted = bytearray(encode_lamp_frame(3, {'N': 'G', 'E': 'R'}))
+    corrupted[-1] ^= 0xFF  # bad CRC
+    frames = LampFrameParser().feed(bytes(corrupted) + encode_lamp_frame(4, {'S': 'Y'}))
+    assert [(seq, decode_lamp_payload(payload)) for seq, payload in frames] == [(4, {'S': 'Y'})]
+
+
+def test_garbage_between_frames_is_skipped():
+    data = b"boot\r\n\x00\xff" + encode_lamp_frame(5, {'N': 'R'}) + b"\xa5\x40junk" + encode_lamp_frame(6, {'W': 'G'})
+    frames = LampFrameParser().feed(data)
+    assert [seq for seq, _ in frames] == [5, 6]
+
+
+def test_ack_parser_skips_text_lines():
+    data = b"ESP32 ready\r\n" + encode_ack(9) + b"debug: lamp N=G\r\n" + encode_ack(10, ACK_STATUS_BAD_PAYLOAD)
+    assert AckParser().feed(data) == [(9, ACK_STATUS_OK), (10, ACK_STATUS_BAD_PAYLOAD)]
+
+
+def test_ack_parser_drops_bad_crc():
+    bad_ack = bytearray(encode_ack(11)); bad_ack[-1] ^= 0x01
+    assert AckParser().feed(bytes(bad_ack) + encode_ack(12)) == [(12, ACK_STATUS_OK)]
+
+
+@pytest.fixture
+def loopback_link():
+    from esp32_loopback import LoopbackESP32
+    from esp32_controller import ESP32SerialController
+    created = []
+
+    def make(ack_timeout=0.5, **device_kwargs):
+        device = LoopbackESP32(**device_kwargs).start()
+        controller = ESP32SerialController(device.port, 115200, {'North': 'N', 'East': 'E'}, ack_timeout=ack_timeout)
+        created.append((device, controller))
+        assert wait_until(lambda: controller.is_connected, 5.0)
+        return device, controller
+
+    yield make
+    for device, controller in created:
+        controller.close()
+        device.stop()
+
+
+@posix_only
+def test_controller_applies_lamps_and_records_ack_rtt(loopback_link):
+    device, controller = loopback_link()
+    controller.update_lights({'North': {'state': 'GREEN'}, 'East': {'state': 'RED'}})
+    assert wait_until(controller.lamps_confirmed)
+    assert device.lamps['N'] == 'G' and device.lamps['E'] == 'R'
+    stats = controller.get_stats()
+    assert stats['acks_received'] >= 1
+    assert stats['last_rtt_ms'] > 0.0
+    assert stats['ack_timeouts'] == 0
+
+
+@posix_only
+def test_dropped_frame_is_resent_after_ack_timeout(loopback_link):
+    device, controller = loopback_link(ack_timeout=0.2, drop_every_n=1)
+    controller.update_lights({'North': {'state': 'GREEN'}})
+    assert wait_until(lambda: controller.get_stats()['ack_timeouts'] >= 1)
+    device.drop_every_n = 0
+    assert wait_until(controller.lamps_confirmed)
+    assert device.lamps['N'] == 'G'
+    assert controller.get_stats()['commands_sent'] >= 2
+
+
+@posix_only
+def test_slow_ack_triggers_resend(loopback_link):
+    device, controller = loopback_link(ack_timeout=0.1, ack_delay_s=0.3)
+    controller.update_lights({'East': {'state': 'YELLOW'}})
+    assert wait_until(lambda: controller.get_stats()['ack_timeouts'] >= 1)
+    assert wait_until(lambda: controller.get_stats()['commands_sent'] >= 2)
+    assert wait_until(lambda: device.lamps['E'] == 'Y')
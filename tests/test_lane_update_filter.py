@@ -0,0 +1,144 @@
+import pytest
+from lane_channel import LaneChannel, LaneUpdateFilter, validate_heartbeat_interval
+from traffic_logic import TrafficLightController
+
+TIMINGS = {
+    "min_green": 5, "yellow": 3, "all_red": 1, "gap_time": 3.5, "skip_threshold": 2.0,
+    "emergency_green": 12, "ambulance_request_timeout": 8.0, "base_max_green": 20,
+    "queued_weighted_demand_extension_factor": 0.5, "absolute_max_green": 45,
+    "realtime_flow_extension_increment": 1.5, "realtime_flow_min_weighted_demand": 2.5,
+}
+TRAFFIC_CONFIG = {"I0": {"phases": {"Green0": ["North"], "Green1": ["East"]}, "timings": TIMINGS, "demand_threshold": 3.0}}
+
+
+def lane_message(count, ambulance=False, zone_name="North", frame_index=0):
+    return {'approach': zone_name, 'frame_index': frame_index, 'counts_by_type': {'car': count} if count else {},
+            'ambulance_detected': ambulance, 'frames_read_since_update': 5, 'frames_skipped_since_update': 4,
+            'inferences_since_update': 1}
+
+
+def test_first_update_is_sent():
+    sent = LaneUpdateFilter(1.0).filter(lane_message(2), now=0.0)
+    assert len(sent) == 1 and sent[0]['repeat_count'] == 1
+
+
+def test_unchanged_updates_are_suppressed_within_the_heartbeat():
+    lane_filter = LaneUpdateFilter(1.0)
+    lane_filter.filter(lane_message(2), now=0.0)
+    for step in range(1, 10):
+        assert lane_filter.filter(lane_message(2, frame_index=step), now=step * 0.1) == []
+    assert lane_filter.suppressed['North'] == 9
+
+
+def test_heartbeat_sends_the_run_with_summed_counters():
+    lane_filter = LaneUpdateFilter(1.0)
+    lane_filter.filter(lane_message(2), now=0.0)
+    for step in range(1, 10):
+        lane_filter.filter(lane_message(2, frame_index=step), now=step * 0.1)
+    sent = lane_filter.filter(lane_message(2, frame_index=10), now=1.0)
+    assert len(sent) == 1
+    heartbeat = sent[0]
+    assert heartbeat['heartbeat'] is True
+    assert heartbeat['repeat_count'] == 10
+    assert heartbeat['frame_index'] == 10
+    assert heartbeat['frames_read_since_update'] == 50
+    assert heartbeat['frames_skipped_since_update'] == 40
+    assert heartbeat['inferences_since_update'] == 10
+    # The heartbeat starts a new interval
+    assert lane_filter.filter(lane_message(2, frame_index=11), now=1.1) == []
+
+
+def test_change_flushes_the_pending_run_first():
+    lane_filter = LaneUpdateFilter(1.0)
+    lane_filter.filter(lane_message(2), now=0.0)
+    lane_filter.filter(lane_message(2, frame_index=1), now=0.1)
+    lane_filter.filter(lane_message(2, frame_index=2), now=0.2)
+    sent = lane_filter.filter(lane_message(3, frame_index=3), now=0.3)
+    assert [(message['counts_by_type'], message['repeat_count'], message['frame_index']) for message in sent] == \
+           [({'car': 2}, 2, 2), ({'car': 3}, 1, 3)]
+    assert sent[0]['frames_read_since_update'] == 10
+
+
+def test_ambulance_flag_change_is_sent_immediately():
+    lane_filter = LaneUpdateFilter(1.0)
+    lane_filter.filter(lane_message(2), now=0.0)
+    sent = lane_filter.filter(lane_message(2, ambulance=True, frame_index=1), now=0.1)
+    assert [message['ambulance_detected'] for message in sent] == [True]
+
+
+def test_zones_are_tracked_independently():
+    lane_filter = LaneUpdateFilter(1.0)
+    lane_filter.filter(lane_message(2, zone_name="North"), now=0.0)
+    assert len(lane_filter.filter(lane_message(2, zone_name="East"), now=0.1)) == 1
+    assert lane_filter.filter(lane_message(2, zone_name="North"), now=0.2) == []
+
+
+def test_flush_returns_and_clears_pending_runs():
+    lane_filter = LaneUpdateFilter(1.0)
+    lane_filter.filter(lane_message(2, zone_name="North"), now=0.0)
+    lane_filter.filter(lane_message(2, zone_name="North", frame_index=1), now=0.1)
+    lane_filter.filter(lane_message(1, zone_name="East"), now=0.0)
+    pending = lane_filter.flush()
+    assert [(message['approach'], message['repeat_count']) for message in pending] == [("North", 1)]
+    assert lane_filter.flush() == []
+
+
+def test_shedding_a_coalesced_update_counts_its_frames():
+    lane_channel = LaneChannel(1)
+    coalesced = dict(lane_message(2, frame_index=4), repeat_count=5)
+    lane_channel.put(coalesced)
+    lane_channel.put(dict(lane_message(3, frame_index=5), repeat_count=1))  # full: the coalesced update is shed
+    assert lane_channel._queue.get(timeout=1.0)['frame_index'] == 5
+    lane_channel.put(dict(lane_message(3, frame_index=6), repeat_count=1))
+    assert lane_channel._queue.get(timeout=1.0)['channel_dropped'] == 5
+
+
+def _run_scenario(heartbeat_interval_s=None, duration_s=90.0, frame_interval_s=0.1, tick_interval_s=0.5):
+    """ Feeds one frame stream to a controller, optionally through the filter; returns its (time, phase, state) changes and final demand. """
+    controller = TrafficLightController(TRAFFIC_CONFIG, {'car': 1.0}, 1.0)
+    lane_filter = LaneUpdateFilter(heartbeat_interval_s) if heartbeat_interval_s else None
+    timeline, last_state = [], None
+    start = 1000.0
+    for step in range(int(duration_s / frame_interval_s)):
+        now = start + step * frame_interval_s
+        # Steady flow on both approaches, with a short lull on North every 30 s
+        counts = {'North': 0 if 20.0 <= (step * frame_interval_s) % 30.0 < 20.5 else 2, 'East': 3}
+        for zone_name, count in counts.items():
+            message = lane_message(count, zone_name=zone_name, frame_index=step)
+            for outgoing in (lane_filter.filter(message, now) if lane_filter else [dict(message, repeat_count=1)]):
+                aggregate_count = sum(outgoing['counts_by_type'].values())
+                controller.update_demand(zone_name, aggregate_count, now, outgoing['ambulance_detected'], outgoing['repeat_count'])
+                controller.update_weighted_demand(zone_name, outgoing['counts_by_type'], now, outgoing['repeat_count'])
+        if step % int(tick_interval_s / frame_interval_s) == 0:
+            controller.update_state(now)
+            status = controller.get_intersection_status("I0")
+            state = (status['phase'], status['state'])
+            if state != last_state:
+                timeline.append((round(now - start, 1),) + state)
+                last_state = state
+    for outgoing in (lane_filter.flush() if lane_filter else []):  # as the worker does before its final summary
+        controller.update_demand(outgoing['approach'], sum(outgoing['counts_by_type'].values()), now,
+                                 outgoing['ambulance_detected'], outgoing['repeat_count'])
+        controller.update_weighted_demand(outgoing['approach'], outgoing['counts_by_type'], now, outgoing['repeat_count'])
+    demand = {approach_name: (status['demand'], status['weighted_demand'])
+              for approach_name, status in controller.get_all_approach_statuses().items()}
+    return timeline, demand
+
+
+def test_heartbeat_below_gap_time_keeps_controller_decisions():
+    unfiltered_timeline, unfiltered_demand = _run_scenario()
+    assert len(unfiltered_timeline) > 4
+    filtered_timeline, filtered_demand = _run_scenario(heartbeat_interval_s=1.0)
+    assert filtered_timeline == unfiltered_timeline
+    assert filtered_demand == unfiltered_demand
+
+
+def test_heartbeat_above_gap_time_would_gap_out_early():
+    # Negative control: with silence longer than gap_time a steady green flow looks like a gap
+    assert _run_scenario(heartbeat_interval_s=5.0)[0] != _run_scenario()[0]
+
+
+def test_validate_heartbeat_interval():
+    validate_heartbeat_interval(1.0, TRAFFIC_CONFIG)
+    with pytest.raises(ValueError, match="gap_time"):
+        validate_heartbeat_interval(3.5, TRAFFIC_CONFIG)
@@ -0,0 +1,21 @@
+import time
+from profiling import StageProfiler
+
+
+def test_nested_stage_time_is_not_counted_twice():
+    profiler = StageProfiler()
+    with profiler.stage("outer"):
+        time.sleep(0.02)
+        with profiler.stage("inner"):
+            time.sleep(0.05)
+    stages = profiler.summary()['stages']
+    assert stages["inner"]['total_ms'] >= 50.0
+    assert 20.0 <= stages["outer"]['total_ms'] < 45.0
+    assert stages["outer"]['count'] == 1 and stages["inner"]['count'] == 1
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = StageProfiler(enabled=False)
+    with profiler.stage("outer"):
+        pass
+    assert profiler.summary()['stages'] == {}
@@ -1,7 +1,21 @@
 import time
-from collections import defaultdict
+import threading
+import functools
+from collections import defaultdict, deque
 import math
-import traceback
+from log_utils import get_logger
+
+logger = get_logger("traffic_logic")
+
+
+def _synchronized(method):
+    # Public controller methods run under one RLock: the GUI thread ticks the controller while the
+    # emergency listener thread may call handle_emergency_alert at any moment.
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return locked
 
 class TrafficLightController:
     def __init__(self, config_data, vehicle_type_weights=None, default_vehicle_weight=1.0):
@@ -10,26 +24,29 @@ class TrafficLightController:
         self.all_approach_names = set()
         self.vehicle_type_weights = vehicle_type_weights if vehicle_type_weights is not None else {}
         self.default_vehicle_weight = default_vehicle_weight
+        self.state_events = deque()
+        self.published_lamp_states = {}
+        self._lock = threading.RLock()
 
         if not config_data:
-            print("[TrafficLogic Error] No configuration data provided.")
+            logger.error("No configuration data provided.")
             raise ValueError("Traffic light configuration cannot be empty.")
 
-        print("[TrafficLogic] Initializing intersections...")
+        logger.info("Initializing intersections...")
         for name, int_config in config_data.items():
             try:
                 self._initialize_intersection_state(name, int_config)
             except ValueError as e:
-                 print(f"[TrafficLogic Error] Failed to initialize intersection '{name}': {e}")
+                 logger.error("Failed to initialize intersection '%s': %s", name, e)
                  raise
 
         if not self.intersections:
-             print("[TrafficLogic Error] No intersections were successfully initialized. Check config.")
+             logger.error("No intersections were successfully initialized. Check config.")
              raise ValueError("No valid intersections configured.")
 
-        print(f"[TrafficLogic] Controller initialized for intersections: {list(self.intersections.keys())}")
-        print(f"[TrafficLogic] Managing approaches: {sorted(list(self.all_approach_names))}")
-        print(f"[TrafficLogic] Using vehicle weights: {self.vehicle_type_weights} (Default: {self.default_vehicle_weight})")
+        logger.info("Controller initialized for intersections: %s", list(self.intersections.keys()))
+        logger.info("Managing approaches: %s", sorted(list(self.all_approach_names)))
+        logger.info("Using vehicle weights: %s (Default: %s)", self.vehicle_type_weights, self.default_vehicle_weight)
 
 
     def _validate_phase_config(self, name, phases_config):
@@ -68,7 +85,7 @@ class TrafficLightController:
 
         demand_threshold = config.get('demand_threshold', 1)
         if not isinstance(demand_threshold, (int, float)) or demand_threshold < 0:
-             print(f"[TrafficLogic Warning] Invalid 'demand_threshold' for '{name}'. Using default 1.")
+             logger.warning("Invalid 'demand_threshold' for '%s'. Using default 1.", name)
              demand_threshold = 1
 
         self.intersections[name] = {
@@ -93,84 +110,164 @@ class TrafficLightController:
             "target_emergency_phase_key": None,
             "is_current_phase_emergency": False,
             "manual_override_red": defaultdict(bool), 
+            "stale_data": defaultdict(bool),
+            "lamps_dirty": True,
         }
-        print(f"[TrafficLogic]   - Initialized '{name}': Starting ALL_RED, first phase '{phase_names_list[0]}'. Managed approaches: {sorted(list(intersection_approaches))}")
+        logger.info("Initialized '%s': Starting ALL_RED, first phase '%s'. Managed approaches: %s", name, phase_names_list[0], sorted(list(intersection_approaches)))
 
     
+    @_synchronized
     def set_manual_override(self, intersection_name, approach_name, is_forced_red):
         if intersection_name in self.intersections:
             state = self.intersections[intersection_name]
             if approach_name in state["managed_approaches"]:
                 state["manual_override_red"][approach_name] = is_forced_red
                 action = "FORCED RED" if is_forced_red else "RELEASED from manual red"
-                print(f"[{state['name']}] Manual override for approach '{approach_name}' set to: {action}")
-
-                
-                
+                logger.info("Manual override for approach '%s' set to: %s", approach_name, action, extra={'intersection': state['name']})
+                self._publish_state_event(state, time.time())
                 return True
-        print(f"[TrafficLogic Warning] Could not set manual override for '{approach_name}' in '{intersection_name}' (Intersection or approach not found).")
+        logger.warning("Could not set manual override for '%s' in '%s' (Intersection or approach not found).", approach_name, intersection_name)
         return False
     
 
-    def update_demand(self, approach_name, count, current_time, ambulance_detected=False):
+    @_synchronized
+    def set_stale(self, approach_name, is_stale):
+        """ Marks an approach whose detector (worker) is down: its phase is served on recall and never gaps out. """
         for int_state in self.intersections.values():
             if approach_name in int_state["managed_approaches"]:
-                current_phase_key = int_state['phases'][int_state['current_phase_index']]
-                current_phase_approaches = int_state['config']['phases'].get(current_phase_key, [])
-                is_in_active_phase = (approach_name in current_phase_approaches)
-                is_green_or_yellow = is_in_active_phase and (int_state['current_state'] in ["GREEN", "YELLOW"])
-
-                if count > 0: 
-                    if is_green_or_yellow:
-                        int_state['last_detection_time_green'][approach_name] = current_time
-                    else: 
-                        int_state['approach_demand'][approach_name] += count 
+                if int_state["stale_data"][approach_name] != is_stale:
+                    int_state["stale_data"][approach_name] = is_stale
+                    if is_stale:
+                        logger.warning("Approach '%s' detection data is STALE. Serving it on recall until the worker recovers.", approach_name, extra={'intersection': int_state['name']})
+                    else:
+                        logger.info("Approach '%s' detection data is fresh again.", approach_name, extra={'intersection': int_state['name']})
+                return True
+        return False
+
+    def update_demand(self, approach_name, count, current_time, ambulance_detected=False, repeat_count=1):
+        """ `repeat_count` > 1 when one (delta-suppressed) update stands for several identical sampled frames. """
+        with self._lock:
+            for int_state in self.intersections.values():
+                if approach_name in int_state["managed_approaches"]:
+                    current_phase_key = int_state['phases'][int_state['current_phase_index']]
+                    current_phase_approaches = int_state['config']['phases'].get(current_phase_key, [])
+                    is_in_active_phase = (approach_name in current_phase_approaches)
+                    is_green_or_yellow = is_in_active_phase and (int_state['current_state'] in ["GREEN", "YELLOW"])
+
+                    if count > 0: 
+                        if is_green_or_yellow:
+                            int_state['last_detection_time_green'][approach_name] = current_time
+                        else: 
+                            int_state['approach_demand'][approach_name] += count * repeat_count
                 
-                if ambulance_detected:
-                    int_state['ambulance_request_active'][approach_name] = True
-                    int_state['last_ambulance_detection_time'][approach_name] = current_time
-                return
-
-    def update_weighted_demand(self, approach_name, counts_by_type, current_time):
-        current_weighted_value_this_update = 0
-        for vehicle_type, count in counts_by_type.items():
-            weight = self.vehicle_type_weights.get(vehicle_type, self.default_vehicle_weight)
-            current_weighted_value_this_update += count * weight
+                    if ambulance_detected:
+                        int_state['ambulance_request_active'][approach_name] = True
+                        int_state['last_ambulance_detection_time'][approach_name] = current_time
+                    return
+
+    def update_weighted_demand(self, approach_name, counts_by_type, current_time, repeat_count=1):
+        with self._lock:
+            current_weighted_value_this_update = 0
+            for vehicle_type, count in counts_by_type.items():
+                weight = self.vehicle_type_weights.get(vehicle_type, self.default_vehicle_weight)
+                current_weighted_value_this_update += count * weight
         
+            for int_state in self.intersections.values():
+                if approach_name in int_state["managed_approaches"]:
+                    current_phase_key = int_state['phases'][int_state['current_phase_index']]
+                    current_phase_approaches = int_state['config']['phases'].get(current_phase_key, [])
+                    is_in_active_phase = (approach_name in current_phase_approaches)
+                    is_green = is_in_active_phase and (int_state['current_state'] == "GREEN")
+
+                    if is_green:
+                        int_state['last_weighted_flow_green'][approach_name] = max(
+                            int_state['last_weighted_flow_green'].get(approach_name, 0.0),
+                            current_weighted_value_this_update
+                        )
+                    elif not (is_in_active_phase and int_state['current_state'] == "YELLOW"):
+                        int_state['approach_weighted_demand'][approach_name] += current_weighted_value_this_update * repeat_count
+                    return
+
+    @_synchronized
+    def handle_emergency_alert(self, approach_name, current_time):
+        """
+        Fast path for an ambulance detection: records the request and evaluates preemption for its intersection
+        immediately instead of on the next tick. Returns the state events this published, marked 'dispatched'
+        so the caller can push their lamps at once and the regular drain does not send them again.
+        """
         for int_state in self.intersections.values():
-            if approach_name in int_state["managed_approaches"]:
-                current_phase_key = int_state['phases'][int_state['current_phase_index']]
-                current_phase_approaches = int_state['config']['phases'].get(current_phase_key, [])
-                is_in_active_phase = (approach_name in current_phase_approaches)
-                is_green = is_in_active_phase and (int_state['current_state'] == "GREEN")
-
-                if is_green:
-                    int_state['last_weighted_flow_green'][approach_name] = max(
-                        int_state['last_weighted_flow_green'].get(approach_name, 0.0),
-                        current_weighted_value_this_update
-                    )
-                elif not (is_in_active_phase and int_state['current_state'] == "YELLOW"):
-                    int_state['approach_weighted_demand'][approach_name] += current_weighted_value_this_update
-                return
-
+            if approach_name not in int_state["managed_approaches"]:
+                continue
+            int_state['ambulance_request_active'][approach_name] = True
+            int_state['last_ambulance_detection_time'][approach_name] = current_time
+            if int_state['emergency_preemption_active'] or self._check_for_emergency_preemption_need(int_state) is None:
+                return []
+            events_before = len(self.state_events)
+            if self._update_single_intersection_state(int_state, current_time):
+                int_state['lamps_dirty'] = True
+            if int_state['lamps_dirty']:
+                self._publish_state_event(int_state, current_time)
+            new_events = list(self.state_events)[events_before:]
+            for event in new_events: event['dispatched'] = True
+            return new_events
+        return []
+
+    @_synchronized
     def update_state(self, current_time):
         any_state_changed = False
         for name, state in self.intersections.items():
             try:
                 if self._update_single_intersection_state(state, current_time):
                     any_state_changed = True
+                    state['lamps_dirty'] = True
+                if state['lamps_dirty']:
+                    self._publish_state_event(state, current_time)
             except Exception as e:
-                 print(f"[TrafficLogic Error] Unhandled exception updating state for intersection '{name}': {e}")
-                 traceback.print_exc()
+                 logger.exception("Unhandled exception updating state for intersection '%s': %s", name, e)
         return any_state_changed
 
+    def _compute_lamp_states(self, int_state):
+        current_phase_key = int_state['phases'][int_state['current_phase_index']]
+        current_green_approach_list = int_state['config']['phases'].get(current_phase_key, [])
+        current_intersection_actual_state = int_state['current_state']
+        lamp_states = {}
+        for approach_name in int_state["managed_approaches"]:
+            light_state_for_approach = 'RED'
+            if not int_state["manual_override_red"].get(approach_name, False) and \
+               current_intersection_actual_state in ['GREEN', 'YELLOW'] and \
+               current_green_approach_list and approach_name == current_green_approach_list[0]:
+                light_state_for_approach = current_intersection_actual_state
+            lamp_states[approach_name] = light_state_for_approach
+        return lamp_states
+
+    def _publish_state_event(self, int_state, current_time):
+        int_state['lamps_dirty'] = False
+        lamp_changes = {}
+        for approach_name, lamp_state in self._compute_lamp_states(int_state).items():
+            if self.published_lamp_states.get(approach_name) != lamp_state:
+                lamp_changes[approach_name] = lamp_state
+                self.published_lamp_states[approach_name] = lamp_state
+        self.state_events.append({
+            'intersection': int_state['name'],
+            'state': int_state['current_state'],
+            'phase': int_state['phases'][int_state['current_phase_index']],
+            'lamp_changes': lamp_changes,
+            'timestamp': current_time,
+        })
+
+    @_synchronized
+    def drain_state_events(self):
+        events = list(self.state_events)
+        self.state_events.clear()
+        return events
+
     def _update_ambulance_request_timeouts(self, state, current_time):
         timeout_duration = state['config']['timings']['ambulance_request_timeout']
         for approach_name in list(state['ambulance_request_active'].keys()):
             if state['ambulance_request_active'][approach_name]:
                 last_det_time = state['last_ambulance_detection_time'].get(approach_name, 0)
                 if current_time - last_det_time > timeout_duration:
-                    print(f"[{state['name']}] Ambulance request for {approach_name} timed out.")
+                    logger.info("Ambulance request for %s timed out.", approach_name, extra={'intersection': state['name']})
                     state['ambulance_request_active'][approach_name] = False
 
     def _check_for_emergency_preemption_need(self, state):
@@ -208,7 +305,7 @@ class TrafficLightController:
         max_delta = 5.0
         if delta_time < 0: delta_time = 0 
         if delta_time > max_delta:
-            print(f"[{state['name']}] Warning: Large time delta ({delta_time:.1f}s). Clamping to {max_delta}s.")
+            logger.warning("Large time delta (%.1fs). Clamping to %ss.", delta_time, max_delta, extra={'intersection': state['name']})
             delta_time = max_delta
             
         state['state_timer'] += delta_time
@@ -227,7 +324,7 @@ class TrafficLightController:
                 state['emergency_preemption_active'] = True
                 state['target_emergency_phase_key'] = emergency_phase_needed
                 state['is_current_phase_emergency'] = False 
-                print(f"[{state['name']}] EMERGENCY PREEMPTION ACTIVATED for phase '{emergency_phase_needed}'.")
+                logger.info("EMERGENCY PREEMPTION ACTIVATED for phase '%s'.", emergency_phase_needed, extra={'intersection': state['name']})
                 if state['current_state'] == "GREEN" and phase_keys_list[state['current_phase_index']] != emergency_phase_needed:
                     next_state = "YELLOW"
                     switch_reason = f"Emergency Preemption for '{emergency_phase_needed}'"
@@ -256,7 +353,7 @@ class TrafficLightController:
                         
                         new_max_green = min(state['current_cycle_max_green'] + timings['realtime_flow_extension_increment'], timings['absolute_max_green'])
                         if new_max_green > state['current_cycle_max_green']:
-                            print(f"[{state['name']}] Approach '{the_current_green_approach_on_entry}' real-time flow (W.Flow: {state['last_weighted_flow_green'].get(the_current_green_approach_on_entry, 0.0):.1f}) extending max green to {new_max_green:.1f}s.")
+                            logger.info("Approach '%s' real-time flow (W.Flow: %.1f) extending max green to %.1fs.", the_current_green_approach_on_entry, state['last_weighted_flow_green'].get(the_current_green_approach_on_entry, 0.0), new_max_green, extra={'intersection': state['name']})
                             state['current_cycle_max_green'] = new_max_green
                         state['last_weighted_flow_green'][the_current_green_approach_on_entry] = 0.0 
 
@@ -275,6 +372,8 @@ class TrafficLightController:
                                 if state["manual_override_red"].get(the_other_approach, False):
                                     continue
                                 demand_on_other_approach = state['approach_weighted_demand'].get(the_other_approach, 0.0)
+                                if state['stale_data'].get(the_other_approach, False):
+                                    demand_on_other_approach = max(demand_on_other_approach, state['demand_threshold'])
                                 if demand_on_other_approach > max_conflicting_weighted_demand:
                                      max_conflicting_weighted_demand = demand_on_other_approach
                                      conflicting_approach_display_name = the_other_approach
@@ -283,7 +382,8 @@ class TrafficLightController:
                         last_green_det_time_for_current = state['last_detection_time_green'].get(the_current_green_approach_on_entry, 0.0)
                         time_since_last_green = current_time - last_green_det_time_for_current if last_green_det_time_for_current > 0 else timings['gap_time'] + 1
                         
-                        if conflicting_demand_met and time_since_last_green > timings['gap_time']:
+                        current_is_stale = state['stale_data'].get(the_current_green_approach_on_entry, False)
+                        if conflicting_demand_met and time_since_last_green > timings['gap_time'] and not current_is_stale:
                             next_state = "YELLOW"
                             switch_reason = (f"Gap-Out on '{the_current_green_approach_on_entry}' (Gap: {time_since_last_green:.1f}s > {timings['gap_time']}s | "
                                              f"Conflict: Approach '{conflicting_approach_display_name}' W.Demand={max_conflicting_weighted_demand:.1f})")
@@ -301,7 +401,7 @@ class TrafficLightController:
                             target_emergency_approach_name = phases_config.get(state['target_emergency_phase_key'], ["Unknown"])[0]
                             
                             if state["manual_override_red"].get(target_emergency_approach_name, False):
-                                print(f"[{state['name']}] Emergency target '{target_emergency_approach_name}' (Phase '{state['target_emergency_phase_key']}') is MANUALLY FORCED RED. Cannot service emergency.")
+                                logger.info("Emergency target '%s' (Phase '%s') is MANUALLY FORCED RED. Cannot service emergency.", target_emergency_approach_name, state['target_emergency_phase_key'], extra={'intersection': state['name']})
                                 
                                 
                                 state['emergency_preemption_active'] = False 
@@ -324,10 +424,10 @@ class TrafficLightController:
                                 if emergency_approaches_served:
                                     served_approach_name = emergency_approaches_served[0]
                                     if state['ambulance_request_active'].get(served_approach_name, False):
-                                        print(f"[{state['name']}] Servicing ambulance for {served_approach_name} on phase '{state['target_emergency_phase_key']}'. Clearing request.")
+                                        logger.info("Servicing ambulance for %s on phase '%s'. Clearing request.", served_approach_name, state['target_emergency_phase_key'], extra={'intersection': state['name']})
                                         state['ambulance_request_active'][served_approach_name] = False
                         except ValueError:
-                            print(f"[{state['name']}] ERROR: Target emergency phase '{state['target_emergency_phase_key']}' not found. Reverting.")
+                            logger.error("Target emergency phase '%s' not found. Reverting.", state['target_emergency_phase_key'], extra={'intersection': state['name']})
                             state['emergency_preemption_active'] = False; state['target_emergency_phase_key'] = None; state['is_current_phase_emergency'] = False
                     
                     if not next_state: 
@@ -346,7 +446,7 @@ class TrafficLightController:
                             
                             
                             if state["manual_override_red"].get(the_single_approach_to_check_candidate, False):
-                                print(f"[{state['name']}] Phase '{next_p_key_to_check_candidate}' for approach '{the_single_approach_to_check_candidate}' is MANUALLY FORCED RED. Skipping.")
+                                logger.info("Phase '%s' for approach '%s' is MANUALLY FORCED RED. Skipping.", next_p_key_to_check_candidate, the_single_approach_to_check_candidate, extra={'intersection': state['name']})
                                 skipped_phases_count += 1
                                 
                                 state['approach_demand'][the_single_approach_to_check_candidate] = 0 
@@ -355,15 +455,21 @@ class TrafficLightController:
 
                             
                             if state['ambulance_request_active'].get(the_single_approach_to_check_candidate, False):
-                                print(f"[{state['name']}] Approach '{the_single_approach_to_check_candidate}' (Phase '{next_p_key_to_check_candidate}') has ambulance and is NOT overridden. Selecting.")
+                                logger.info("Approach '%s' (Phase '%s') has ambulance and is NOT overridden. Selecting.", the_single_approach_to_check_candidate, next_p_key_to_check_candidate, extra={'intersection': state['name']})
                                 selected_approach_for_green_candidate = the_single_approach_to_check_candidate
                                 found_eligible_phase = True
                                 break 
                             
                             
+                            if state['stale_data'].get(the_single_approach_to_check_candidate, False):
+                                logger.info("Approach '%s' (Phase '%s') has stale detection data. Serving on recall.", the_single_approach_to_check_candidate, next_p_key_to_check_candidate, extra={'intersection': state['name']})
+                                selected_approach_for_green_candidate = the_single_approach_to_check_candidate
+                                found_eligible_phase = True
+                                break
+
                             weighted_demand_for_next_approach_candidate = state['approach_weighted_demand'].get(the_single_approach_to_check_candidate, 0.0)
                             if weighted_demand_for_next_approach_candidate <= timings['skip_threshold']:
-                                print(f"[{state['name']}] Skipping phase '{next_p_key_to_check_candidate}' for approach '{the_single_approach_to_check_candidate}' (W.Demand: {weighted_demand_for_next_approach_candidate:.1f} <= {timings['skip_threshold']})")
+                                logger.info("Skipping phase '%s' for approach '%s' (W.Demand: %.1f <= %s)", next_p_key_to_check_candidate, the_single_approach_to_check_candidate, weighted_demand_for_next_approach_candidate, timings['skip_threshold'], extra={'intersection': state['name']})
                                 skipped_phases_count += 1
                                 state['approach_demand'][the_single_approach_to_check_candidate] = 0 
                                 state['approach_weighted_demand'][the_single_approach_to_check_candidate] = 0.0
@@ -376,7 +482,7 @@ class TrafficLightController:
                             
                             
                             
-                            print(f"[{state['name']}] Warning: All non-overridden phases met skip criteria or no eligible phase. Advancing to phase after original or staying ALL_RED if all overridden.")
+                            logger.warning("All non-overridden phases met skip criteria or no eligible phase. Advancing to phase after original or staying ALL_RED if all overridden.", extra={'intersection': state['name']})
                             
                             
                             
@@ -397,14 +503,14 @@ class TrafficLightController:
                         state['is_current_phase_emergency'] = False 
 
                         if state['emergency_preemption_active'] and phase_keys_list[state['current_phase_index']] != state['target_emergency_phase_key']:
-                             print(f"[{state['name']}] Emergency preemption for '{state['target_emergency_phase_key']}' concluded as normal phase '{phase_keys_list[state['current_phase_index']]}' starts.")
+                             logger.info("Emergency preemption for '%s' concluded as normal phase '%s' starts.", state['target_emergency_phase_key'], phase_keys_list[state['current_phase_index']], extra={'intersection': state['name']})
                              state['emergency_preemption_active'] = False
                              state['target_emergency_phase_key'] = None
 
         if next_state and next_state != state['current_state']:
             current_phase_key_display = phase_keys_list[state['current_phase_index']]
             current_approach_display = phases_config.get(current_phase_key_display, ["Unknown"])[0]
-            print(f"[{state['name']}] State Change: {state['current_state']} -> {next_state}. (Phase: {current_phase_key_display} for Appr: {current_approach_display}, Reason: {switch_reason})")
+            logger.info("State Change: %s -> %s. (Phase: %s for Appr: %s, Reason: %s)", state['current_state'], next_state, current_phase_key_display, current_approach_display, switch_reason, extra={'intersection': state['name']})
             state_did_change = True
 
             if state['current_state'] == "YELLOW" and next_state == "ALL_RED":
@@ -421,16 +527,16 @@ class TrafficLightController:
                          del state['last_weighted_flow_green'][the_finished_approach]
                  
                  if state['is_current_phase_emergency']:
-                     print(f"[{state['name']}] Emergency phase '{current_phase_key_on_entry}' for approach '{current_approach_display}' cycle completed.")
+                     logger.info("Emergency phase '%s' for approach '%s' cycle completed.", current_phase_key_on_entry, current_approach_display, extra={'intersection': state['name']})
                      state['is_current_phase_emergency'] = False 
                      if state['emergency_preemption_active'] and state['target_emergency_phase_key'] == current_phase_key_on_entry:
                          another_emergency = self._check_for_emergency_preemption_need(state)
                          if not another_emergency:
-                             print(f"[{state['name']}] No further pending emergencies. Deactivating preemption mode.")
+                             logger.info("No further pending emergencies. Deactivating preemption mode.", extra={'intersection': state['name']})
                              state['emergency_preemption_active'] = False
                              state['target_emergency_phase_key'] = None
                          else:
-                             print(f"[{state['name']}] Another emergency for '{another_emergency}' detected. Preemption remains active.")
+                             logger.info("Another emergency for '%s' detected. Preemption remains active.", another_emergency, extra={'intersection': state['name']})
                              state['target_emergency_phase_key'] = another_emergency 
 
             state['current_state'] = next_state
@@ -456,6 +562,7 @@ class TrafficLightController:
     def get_all_approach_names(self):
         return sorted(list(self.all_approach_names))
 
+    @_synchronized
     def get_intersection_status(self, intersection_name):
         state = self.intersections.get(intersection_name)
         if not state: return {}
@@ -494,31 +601,20 @@ class TrafficLightController:
             'is_emergency': state['is_current_phase_emergency'] or state['emergency_preemption_active']
         }
 
+    @_synchronized
     def get_all_approach_statuses(self):
         statuses = {}
         for int_name, int_state in self.intersections.items():
-            current_phase_key = int_state['phases'][int_state['current_phase_index']]
-            current_green_approach_list = int_state['config']['phases'].get(current_phase_key, [])
-            current_intersection_actual_state = int_state['current_state']
+            lamp_states = self._compute_lamp_states(int_state)
 
             for approach_name in int_state["managed_approaches"]:
-                light_state_for_approach = 'RED' 
-                
-                
                 is_manually_forced_red = int_state["manual_override_red"].get(approach_name, False)
-                if is_manually_forced_red:
-                    light_state_for_approach = 'RED'
-                elif current_intersection_actual_state in ['GREEN', 'YELLOW']:
-                    
-                    if current_green_approach_list and approach_name == current_green_approach_list[0]:
-                        light_state_for_approach = current_intersection_actual_state
-                
-                
                 statuses[approach_name] = {
-                    'state': light_state_for_approach,
+                    'state': lamp_states[approach_name],
                     'demand': int_state['approach_demand'].get(approach_name, 0),
                     'weighted_demand': int_state['approach_weighted_demand'].get(approach_name, 0.0),
                     'ambulance_request_active': int_state['ambulance_request_active'].get(approach_name, False),
-                    'is_manually_red': is_manually_forced_red 
+                    'is_manually_red': is_manually_forced_red,
+                    'stale': int_state['stale_data'].get(approach_name, False)
                 }
         return statuses
\ No newline at end of file
@@ -1,12 +1,228 @@
 import os
 import time
-import traceback
 import sys
+import logging
 import numpy as np
 import cv2
-import torch
-from ultralytics import YOLOE 
 from collections import defaultdict
+from polygon_utils import build_zone_label_map, lookup_zone_bits
+from frame_sampling import AdaptiveFrameSampler, MotionGate, MOTION_CHECK, SKIP
+from log_utils import get_logger, configure_worker_logging
+from profiling import StageProfiler, SamplingProfiler, dump_profile
+from resource_planner import apply_worker_resources
+from queue_wakeup import NotifyingQueue
+from lane_channel import LaneUpdateFilter
+
+logger = get_logger("worker")
+_DISABLED_PROFILER = StageProfiler(enabled=False)
+
+
+def _put_for_zones(results_queue, zone_names, message):
+    for zone_name in zone_names:
+        zone_message = dict(message)
+        zone_message['approach'] = zone_name
+        results_queue.put(zone_message)
+
+def _put_lane_update(lane_sink, lane_message):
+    # Stamped on the message actually sent: a run held back by the LaneUpdateFilter must not count its hold as queue transit
+    lane_message['trace'] = dict(lane_message['trace'], enqueue=time.time())
+    lane_sink.put(lane_message)
+
+def _record_predict_speed(profiler, prefix, result):
+    # Ultralytics reports its own split in ms: preprocess, inference, postprocess (NMS)
+    for speed_key, speed_ms in (getattr(result, 'speed', None) or {}).items():
+        if speed_ms is not None: profiler.add(f"{prefix}_{speed_key}", speed_ms)
+
+def _box_reference_points(boxes):
+    ref_xs = ((boxes[:, 0] + boxes[:, 2]) / 2).astype(np.int64)
+    ref_ys = boxes[:, 3].astype(np.int64)
+    return np.stack([ref_xs, ref_ys], axis=1)
+
+def general_prompt_classes(target_classes_list, ambulance_prompt_classes=()):
+    """ The general model's YOLOE prompt set: the counted vehicle classes plus, in "prompt" mode, the emergency classes. """
+    return list(target_classes_list) + [name for name in ambulance_prompt_classes if name not in target_classes_list]
+
+def _crop_with_padding(frame, box, padding):
+    x1, y1, x2, y2 = box
+    pad_x, pad_y = (x2 - x1) * padding, (y2 - y1) * padding
+    height, width = frame.shape[:2]
+    return frame[max(0, int(y1 - pad_y)):min(height, int(y2 + pad_y) + 1), max(0, int(x1 - pad_x)):min(width, int(x2 + pad_x) + 1)]
+
+def _verify_ambulance_crops(ambulance_model, frame, boxes, conf_threshold, device_str, ambulance_classes_set, crop_padding):
+    """ Runs the ambulance model on crops of the candidate boxes (one batch); returns a bool per box. """
+    crops = [_crop_with_padding(frame, box, crop_padding) for box in boxes]
+    confirmed = np.zeros(len(boxes), dtype=bool)
+    valid = [i for i, crop in enumerate(crops) if crop.size]
+    if not valid: return confirmed
+    crop_results = ambulance_model.predict([crops[i] for i in valid], conf=conf_threshold, device=device_str, verbose=False)
+    for i, crop_result in zip(valid, crop_results):
+        if crop_result.boxes is None: continue
+        crop_class_names = [crop_result.names.get(class_idx) for class_idx in crop_result.boxes.cls.cpu().numpy().astype(int)]
+        confirmed[i] = any(name in ambulance_classes_set for name in crop_class_names)
+    return confirmed
+
+def _detect_in_zones(general_model, ambulance_model, frame, conf_threshold, device_str,
+                     zone_names, zone_label_map, target_classes_set, ambulance_classes_set, profiler=None,
+                     prompt_ambulance_classes_set=None, verify_crop_padding=0.15):
+    """
+    With `prompt_ambulance_classes_set` the emergency classes come from the general model's own prompts (one inference);
+    `ambulance_model`, if given, then only confirms those candidate boxes on crops instead of scanning the whole frame.
+    """
+    profiler = profiler or _DISABLED_PROFILER
+    detected_counts_by_zone = {zone_name: defaultdict(int) for zone_name in zone_names}
+    ambulance_detected_by_zone = {zone_name: False for zone_name in zone_names}
+    general_outside = 0
+    ambulance_outside = 0
+
+    with profiler.stage("general_predict"):
+        general_results_for_frame = general_model.predict(frame, conf=conf_threshold, device=device_str, verbose=False)[0]
+    if profiler.enabled: _record_predict_speed(profiler, "general", general_results_for_frame)
+    with profiler.stage("polygon_test"):
+        if general_results_for_frame.boxes is not None and hasattr(general_results_for_frame, 'names'):
+            gen_model_class_map = general_results_for_frame.names
+            boxes = general_results_for_frame.boxes.xyxy.cpu().numpy()
+            class_indices = general_results_for_frame.boxes.cls.cpu().numpy().astype(int)
+            class_names_detected = [gen_model_class_map.get(class_idx, None) for class_idx in class_indices]
+            is_target = np.array([name in target_classes_set for name in class_names_detected], dtype=bool)
+            is_ambulance = np.array([name in prompt_ambulance_classes_set for name in class_names_detected], dtype=bool) \
+                if prompt_ambulance_classes_set else np.zeros(len(class_names_detected), dtype=bool)
+            # Prompted ambulances still occupy the lane: count them as vehicles under their own class name
+            is_vehicle = is_target | is_ambulance
+            if is_vehicle.any():
+                zone_bits = lookup_zone_bits(zone_label_map, _box_reference_points(boxes))
+                general_outside = int(np.count_nonzero(is_target & (zone_bits == 0)))
+                for zone_bit, zone_name in enumerate(zone_names):
+                    in_zone = is_vehicle & ((zone_bits >> zone_bit) & 1).astype(bool)
+                    for i in np.flatnonzero(in_zone):
+                        detected_counts_by_zone[zone_name][class_names_detected[i]] += 1
+            if is_ambulance.any():
+                if ambulance_model is not None and ambulance_classes_set:
+                    with profiler.stage("ambulance_verify"):
+                        candidates = np.flatnonzero(is_ambulance)
+                        is_ambulance[candidates] = _verify_ambulance_crops(ambulance_model, frame, boxes[candidates], conf_threshold,
+                                                                           device_str, ambulance_classes_set, verify_crop_padding)
+                ambulance_outside = int(np.count_nonzero(is_ambulance & (zone_bits == 0)))
+                for zone_bit, zone_name in enumerate(zone_names):
+                    if np.any(is_ambulance & ((zone_bits >> zone_bit) & 1).astype(bool)):
+                        ambulance_detected_by_zone[zone_name] = True
+
+    if ambulance_model and ambulance_classes_set and not prompt_ambulance_classes_set:
+        with profiler.stage("ambulance_predict"):
+            ambulance_model_results_list = ambulance_model.predict(frame, conf=conf_threshold, device=device_str, verbose=False)
+        if ambulance_model_results_list and isinstance(ambulance_model_results_list, list):
+            ambulance_results_for_frame = ambulance_model_results_list[0]
+            if profiler.enabled: _record_predict_speed(profiler, "ambulance", ambulance_results_for_frame)
+            with profiler.stage("polygon_test"):
+                if ambulance_results_for_frame.boxes is not None and hasattr(ambulance_results_for_frame, 'names'):
+                    amb_model_class_map = ambulance_results_for_frame.names
+                    amb_boxes = ambulance_results_for_frame.boxes.xyxy.cpu().numpy()
+                    amb_class_indices = ambulance_results_for_frame.boxes.cls.cpu().numpy().astype(int)
+                    is_ambulance = np.array([amb_model_class_map.get(amb_class_idx, None) in ambulance_classes_set
+                                             for amb_class_idx in amb_class_indices], dtype=bool)
+                    if is_ambulance.any():
+                        amb_zone_bits = lookup_zone_bits(zone_label_map, _box_reference_points(amb_boxes))
+                        ambulance_outside = int(np.count_nonzero(is_ambulance & (amb_zone_bits == 0)))
+                        for zone_bit, zone_name in enumerate(zone_names):
+                            if np.any(is_ambulance & ((amb_zone_bits >> zone_bit) & 1).astype(bool)):
+                                ambulance_detected_by_zone[zone_name] = True
+
+    return detected_counts_by_zone, ambulance_detected_by_zone, general_outside, ambulance_outside
+
+def detect_only_config(model_name):
+    """ 'yoloe-11m-seg.pt' -> 'yoloe-11m.yaml': the box-only architecture whose layers the seg checkpoint also holds. """
+    stem, extension = os.path.splitext(os.path.basename(model_name.replace('\\', '/')))
+    if extension != '.pt' or not stem.endswith('-seg'):
+        return None
+    return stem[:-len('-seg')] + '.yaml'
+
+def _untransferred_weights(detect_model, seg_model):
+    """
+    Keys of the detection model that did not receive the seg checkpoint's tensor. Model.load() intersects the state
+    dicts and loads with strict=False, so anything it skipped stays randomly initialised without an error.
+    """
+    import torch
+    seg_state = seg_model.model.state_dict()
+    missing = []
+    for key, tensor in detect_model.model.state_dict().items():
+        source = seg_state.get(key)
+        if source is None or source.shape != tensor.shape or not torch.equal(source.to(tensor.dtype), tensor):
+            missing.append(key)
+    return missing
+
+def load_general_model(model_name, inference_mode="seg", log=logger):
+    """
+    YOLOE for the vehicle counts. Only boxes are ever read, so in "detect" mode a seg checkpoint is loaded into the
+    matching detection architecture and mask prototypes/upsampling never run. The transfer is verified tensor by
+    tensor; if anything is missing or the load fails, the seg model is used instead.
+    """
+    from ultralytics import YOLOE
+    seg_model = YOLOE(model_name)
+    detect_config = detect_only_config(model_name) if inference_mode == "detect" else None
+    if detect_config:
+        try:
+            model = YOLOE(detect_config).load(model_name)
+            missing = _untransferred_weights(model, seg_model)
+            if not missing:
+                log.info("Detection-only inference: '%s' weights in the '%s' architecture (no mask head).", model_name, detect_config)
+                return model
+            total = len(model.model.state_dict())
+            log.warning("Detection-only model '%s' received %d/%d tensors from '%s' (first missing: %s); using the segmentation model.",
+                        detect_config, total - len(missing), total, model_name, missing[0])
+        except Exception as e_detect:
+            log.warning("Detection-only model '%s' from '%s' failed (%s); using the segmentation model.", detect_config, model_name, e_detect)
+    elif inference_mode == "detect":
+        log.info("'%s' is not a -seg.pt checkpoint; using it as is.", model_name)
+    return seg_model
+
+def _load_models(general_model_name, ambulance_model_name, target_classes_list, ambulance_classes_list, device_str, log,
+                 inference_mode="seg"):
+    from ultralytics import YOLOE
+    preload = sys.modules.get('worker_preload')  # present only in workers forked from the forkserver template
+    general_model = preload.take_model(general_model_name, target_classes_list, inference_mode) if preload else None
+    if general_model is not None:
+        log.info("Using preloaded general model '%s' (classes already set), moving to '%s'...", general_model_name, device_str)
+        general_model.to(device_str)
+    else:
+        log.info("Loading general model '%s' onto '%s'...", general_model_name, device_str)
+        general_model = load_general_model(general_model_name, inference_mode, log)
+        general_model.to(device_str)
+        if target_classes_list:
+            log.info("Setting general model classes using text embeddings for: %s", target_classes_list)
+            general_text_embeddings = general_model.get_text_pe(target_classes_list)
+            general_model.set_classes(target_classes_list, general_text_embeddings)
+        else:
+             log.info("No target classes specified for general model.")
+
+    if ambulance_model_name and ambulance_classes_list:
+        ambulance_model = preload.take_model(ambulance_model_name) if preload else None
+        if ambulance_model is not None:
+            log.info("Using preloaded ambulance model '%s', moving to '%s'...", ambulance_model_name, device_str)
+        else:
+            log.info("Loading ambulance model '%s' onto '%s'...", ambulance_model_name, device_str)
+            ambulance_model = YOLOE(ambulance_model_name)
+        ambulance_model.to(device_str)
+        log.info("Ambulance model loaded. Predictions will be filtered for classes: %s", ambulance_classes_list)
+    elif not ambulance_model_name and ambulance_classes_list:
+        log.info("Ambulance classes defined but no model name provided. Skipping.")
+        ambulance_model = None
+    else:
+        log.info("No ambulance classes specified. Skipping ambulance model load.")
+        ambulance_model = None
+
+    return general_model, ambulance_model
+
+def _warm_up_models(video_path, general_model, ambulance_model, conf_threshold, device_str):
+    """ One prediction on the clip's first frame so predictor setup, layer fusion and device kernels happen before real frames. """
+    capture = cv2.VideoCapture(video_path)
+    try:
+        ok, frame = capture.read()
+    finally:
+        capture.release()
+    if not ok or frame is None:
+        frame = np.zeros((640, 640, 3), dtype=np.uint8)
+    general_model.predict(frame, conf=conf_threshold, device=device_str, verbose=False)
+    if ambulance_model is not None:
+        ambulance_model.predict(frame, conf=conf_threshold, device=device_str, verbose=False)
 
 def process_video_worker(
     approach_name,
@@ -19,14 +235,38 @@ def process_video_worker(
     process_every_n,
     device_str,
     results_queue,
-    lane_polygon
-    
+    lane_polygons,
+    sampling_control=None,
+    motion_options=None,
+    motion_gate_options=None,
+    log_queue=None,
+    log_options=None,
+    profile_options=None,
+    resource_plan=None,
+    polygon_inbox=None,
+    start_frame=0,
+    lane_channel=None,
+    priority_queue=None,
+    alert_repeat_s=1.0,
+    queue_wakeup=None,
+    delta_options=None,
+    ambulance_options=None,
+    inference_mode="seg"
 ):
-    process_id = os.getpid()
+    configure_worker_logging(log_queue, **(log_options or {}))
+    if queue_wakeup is not None:
+        results_queue = NotifyingQueue(results_queue, queue_wakeup)
+        if lane_channel is not None: lane_channel = NotifyingQueue(lane_channel, queue_wakeup)
+    log = logging.LoggerAdapter(logger, {'camera': approach_name})
+    apply_worker_resources(resource_plan, log)
+    # Imported here rather than at module level so the GUI process can import this module without torch/ultralytics
+    import torch
+    if device_str in (None, 'auto'):
+        device_str = 'cuda' if torch.cuda.is_available() else 'cpu'
     video_filename = os.path.basename(video_path)
     general_model = None
     ambulance_model = None
-    print(f"[Worker {process_id} | {approach_name}] Starting for video: {video_filename}")
+    log.info("Starting for video: %s", video_filename)
 
     
     if isinstance(target_classes, str):
@@ -41,169 +281,277 @@ def process_video_worker(
     else:
         ambulance_classes_list = list(ambulance_class_names)
 
-    
-    if not isinstance(lane_polygon, np.ndarray) or lane_polygon.ndim != 2 or lane_polygon.shape[1] != 2:
-         error_msg = f"Invalid lane polygon format for {approach_name}. Expected Nx2 numpy array."
-         print(f"[Worker {process_id} | {approach_name}] Error: {error_msg}")
-         results_queue.put({'type': 'error','approach': approach_name, 'filename': video_filename,'message': error_msg})
-         return 
+    ambulance_options = ambulance_options or {'mode': 'separate_model'}
+    prompt_ambulance_classes_set = None
+    verify_crop_padding = ambulance_options.get('crop_padding', 0.15)
+    if ambulance_options.get('mode') == 'prompt' and ambulance_options.get('prompt_classes'):
+        prompt_ambulance_classes_set = set(ambulance_options['prompt_classes'])
+        target_classes_list = general_prompt_classes(target_classes_list, ambulance_options['prompt_classes'])
+        if not ambulance_options.get('verify'):
+            ambulance_model_name = None  # one network per frame; no verification pass
+        log.info("Ambulance detection via general-model prompts %s (crop verification: %s).",
+                 sorted(prompt_ambulance_classes_set), bool(ambulance_model_name and ambulance_classes_list))
 
-    
-    try:
-        print(f"[Worker {process_id} | {approach_name}] Loading general model '{general_model_name}' onto '{device_str}'...")
-        general_model = YOLOE(general_model_name)
-        general_model.to(device_str)
-        if target_classes_list:
-            print(f"[Worker {process_id} | {approach_name}] Setting general model classes using text embeddings for: {target_classes_list}")
-            general_text_embeddings = general_model.get_text_pe(target_classes_list)
-            general_model.set_classes(target_classes_list, general_text_embeddings)
-        else:
-             print(f"[Worker {process_id} | {approach_name}] No target classes specified for general model.")
 
-        if ambulance_model_name and ambulance_classes_list:
-            print(f"[Worker {process_id} | {approach_name}] Loading ambulance model '{ambulance_model_name}' onto '{device_str}'...")
-            
-            ambulance_model = YOLOE(ambulance_model_name)
-            ambulance_model.to(device_str)
-            print(f"[Worker {process_id} | {approach_name}] Ambulance model loaded. Predictions will be filtered for classes: {ambulance_classes_list}")
-        elif not ambulance_model_name and ambulance_classes_list:
-            print(f"[Worker {process_id} | {approach_name}] Ambulance classes defined but no model name provided. Skipping.")
-            ambulance_model = None
-        else:
-            print(f"[Worker {process_id} | {approach_name}] No ambulance classes specified. Skipping ambulance model load.")
-            ambulance_model = None
+    model_init_error = None
+    if lane_polygons is None and polygon_inbox is not None:
+        # Prelaunched: load and warm the models while the operator is still drawing this camera's polygons
+        load_start = time.perf_counter()
+        try:
+            general_model, ambulance_model = _load_models(general_model_name, ambulance_model_name, target_classes_list,
+                                                          ambulance_classes_list, device_str, log, inference_mode)
+            _warm_up_models(video_path, general_model, ambulance_model, conf_threshold, device_str)
+            log.info("Models loaded and warmed in %.1fs. Waiting for lane polygons...", time.perf_counter() - load_start)
+        except Exception as e_init:
+            log.exception("MODEL INIT ERROR: %s", e_init)
+            model_init_error = e_init
+        lane_polygons = polygon_inbox.get()
+        if lane_polygons is None:
+            log.info("No lane polygons defined for this camera. Exiting.")
+            return
 
-        print(f"[Worker {process_id} | {approach_name}] Model loading sequence complete.")
-        
-        results_queue.put({'type': 'status_update', 'approach': approach_name, 'status': 'Models Loaded'})
-        
+    if isinstance(lane_polygons, np.ndarray):
+        lane_polygons = {approach_name: lane_polygons}
+    zone_names = list(lane_polygons.keys()) if isinstance(lane_polygons, dict) else [approach_name]
+    if not isinstance(lane_polygons, dict) or not lane_polygons or any(
+            not isinstance(polygon, np.ndarray) or polygon.ndim != 2 or polygon.shape[1] != 2
+            for polygon in lane_polygons.values()):
+         error_msg = f"Invalid lane polygon format for {approach_name}. Expected Nx2 numpy array per zone."
+         log.error("%s", error_msg)
+         _put_for_zones(results_queue, zone_names, {'type': 'error', 'camera': approach_name, 'filename': video_filename, 'message': error_msg})
+         return
+    if len(zone_names) > 32:
+         error_msg = f"Too many zones for {approach_name} ({len(zone_names)}). At most 32 are supported."
+         log.error("%s", error_msg)
+         _put_for_zones(results_queue, zone_names, {'type': 'error', 'camera': approach_name, 'filename': video_filename, 'message': error_msg})
+         return
+    zone_polygons = [lane_polygons[zone_name] for zone_name in zone_names]
+    log.info("Classifying detections into %s zone(s): %s", len(zone_names), zone_names)
 
-    except Exception as e_init:
-        print(f"\n!!! [Worker {process_id} | {approach_name}] MODEL INIT ERROR: {e_init} !!!")
-        traceback.print_exc()
-        error_message = f"Model initialization failed: {e_init}"
-        results_queue.put({'type': 'error', 'approach': approach_name, 'filename': video_filename, 'message': error_message})
+    
+    if general_model is None and model_init_error is None:
+        try:
+            general_model, ambulance_model = _load_models(general_model_name, ambulance_model_name, target_classes_list,
+                                                          ambulance_classes_list, device_str, log, inference_mode)
+        except Exception as e_init:
+            log.exception("MODEL INIT ERROR: %s", e_init)
+            model_init_error = e_init
+    if model_init_error is not None:
+        error_message = f"Model initialization failed: {model_init_error}"
+        _put_for_zones(results_queue, zone_names, {'type': 'error', 'camera': approach_name, 'filename': video_filename, 'message': error_message})
         return 
+    log.info("Model loading sequence complete.")
+    _put_for_zones(results_queue, zone_names, {'type': 'status_update', 'camera': approach_name, 'status': 'Models Loaded'})
 
     
     frame_index = -1
-    total_counts_by_type_in_lane = defaultdict(int) 
+    first_frame_index = 0
+    last_alert_time = {}
+    total_counts_by_type_in_lane = {zone_name: defaultdict(int) for zone_name in zone_names}
     total_general_detections_outside_lane = 0
     total_ambulance_detections_outside_lane = 0 
     processed_frames_overall = 0
     processing_start_time = time.time()
     video_processed_flag = False 
     error_occurred = False
+    zone_label_map = None
+    target_classes_set = set(target_classes_list) - (prompt_ambulance_classes_set or set())
+    ambulance_classes_set = set(ambulance_classes_list)
+    frame_sampler = AdaptiveFrameSampler(process_every_n, sampling_control, **(motion_options or {}))
+    motion_gate = MotionGate(**motion_gate_options) if motion_gate_options is not None else None
+    previous_frame_result = None
+    video_capture = None
+    frames_read_since_update = 0
+    frames_skipped_since_update = 0
+    lane_update_filter = LaneUpdateFilter(**delta_options) if delta_options is not None else None
+    lane_sink = lane_channel if lane_channel is not None else results_queue
+    profiler = StageProfiler(enabled=bool(profile_options))
+    sampling_profiler = None
+    if profile_options and profile_options.get('sampling'):
+        sampling_profiler = SamplingProfiler(profile_options.get('sampling_interval_s', 0.005)).start()
 
     try:
         if not os.path.exists(video_path):
              raise FileNotFoundError(f"Video file not found: {video_path}")
 
         
-        results_queue.put({'type': 'status_update', 'approach': approach_name, 'status': 'Processing...'})
+        _put_for_zones(results_queue, zone_names, {'type': 'status_update', 'camera': approach_name, 'status': 'Processing...'})
 
-        general_results_generator = general_model.predict(video_path, conf=conf_threshold, stream=True, device=device_str, verbose=False)
+        video_capture = cv2.VideoCapture(video_path)
+        if not video_capture.isOpened():
+            raise IOError(f"Could not open video: {video_path}")
+        if start_frame > 0:
+            # Resuming after a supervisor restart: continue after the last frame the previous worker reported
+            video_capture.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+            frame_index = int(video_capture.get(cv2.CAP_PROP_POS_FRAMES)) - 1
+            log.info("Resuming at frame %s (requested %s).", frame_index + 1, start_frame)
+        first_frame_index = frame_index + 1
         video_processed_flag = True
-        print(f"[Worker {process_id} | {approach_name}] Starting prediction stream for general model...")
+        log.info("Starting frame loop (base every %s frames, adaptive: %s)...", process_every_n, sampling_control is not None)
 
-        for general_results_for_frame in general_results_generator:
-            
+        while True:
+            action = frame_sampler.next_action()
+            if action == SKIP:
+                with profiler.stage("grab_skipped"):
+                    frame_grabbed = video_capture.grab()
+                if not frame_grabbed: break
+                frame_index += 1
+                frames_read_since_update += 1
+                frames_skipped_since_update += 1
+                frame_sampler.mark_skipped()
+                continue
 
-            
+            decode_start = time.perf_counter()
+            frame_ok, current_frame_image = video_capture.read()
+            if not frame_ok or current_frame_image is None: break
+            capture_time = time.time()
+            decode_ms = (time.perf_counter() - decode_start) * 1000.0
+            profiler.add("decode", decode_ms)
             frame_index += 1
-            ambulance_detected_this_frame_in_lane = False 
-
-            if process_every_n <= 1 or frame_index % process_every_n == 0:
-                processed_frames_overall += 1
-                detected_in_lane_agg_this_frame = 0
-                detected_counts_by_type_this_frame = defaultdict(int)
-                current_frame_image = general_results_for_frame.orig_img
-
-                
-                if general_results_for_frame.boxes is not None and hasattr(general_results_for_frame, 'names'):
-                    gen_model_class_map = general_results_for_frame.names
-                    boxes = general_results_for_frame.boxes.xyxy.cpu().numpy()
-                    class_indices = general_results_for_frame.boxes.cls.cpu().numpy().astype(int)
-                    for i, box in enumerate(boxes):
-                        class_idx = class_indices[i]; class_name_detected = gen_model_class_map.get(class_idx, None)
-                        if class_name_detected and class_name_detected in target_classes_list:
-                             x1, y1, x2, y2 = box[:4]; ref_x = int((x1 + x2) / 2); ref_y = int(y2)
-                             if cv2.pointPolygonTest(lane_polygon, (ref_x, ref_y), False) >= 0:
-                                 detected_in_lane_agg_this_frame += 1
-                                 detected_counts_by_type_this_frame[class_name_detected] += 1
-                                 total_counts_by_type_in_lane[class_name_detected] += 1
-                             else: total_general_detections_outside_lane += 1
-
-                
-                if ambulance_model and ambulance_classes_list:
-                    ambulance_model_results_list = ambulance_model.predict(current_frame_image, conf=conf_threshold, device=device_str, verbose=False)
-                    if ambulance_model_results_list and isinstance(ambulance_model_results_list, list):
-                        ambulance_results_for_frame = ambulance_model_results_list[0]
-                        if ambulance_results_for_frame.boxes is not None and hasattr(ambulance_results_for_frame, 'names'):
-                            amb_model_class_map = ambulance_results_for_frame.names
-                            amb_boxes = ambulance_results_for_frame.boxes.xyxy.cpu().numpy()
-                            amb_class_indices = ambulance_results_for_frame.boxes.cls.cpu().numpy().astype(int)
-                            for i_amb, box_amb in enumerate(amb_boxes):
-                                amb_class_idx = amb_class_indices[i_amb]; amb_class_name_detected = amb_model_class_map.get(amb_class_idx, None)
-                                if amb_class_name_detected and amb_class_name_detected in ambulance_classes_list:
-                                    x1_amb, y1_amb, x2_amb, y2_amb = box_amb[:4]; ref_x_amb = int((x1_amb + x2_amb) / 2); ref_y_amb = int(y2_amb)
-                                    if cv2.pointPolygonTest(lane_polygon, (ref_x_amb, ref_y_amb), False) >= 0:
-                                        ambulance_detected_this_frame_in_lane = True; break
-                                    else: total_ambulance_detections_outside_lane += 1
-
-                
-                results_queue.put({
+            frames_read_since_update += 1
+
+            if zone_label_map is None or zone_label_map.shape[:2] != current_frame_image.shape[:2]:
+                zone_label_map = build_zone_label_map(zone_polygons, current_frame_image.shape)
+                frame_sampler.set_roi(zone_polygons, current_frame_image.shape)
+                if motion_gate is not None: motion_gate.set_roi(zone_polygons, current_frame_image.shape)
+
+            if action == MOTION_CHECK:
+                with profiler.stage("motion_check"):
+                    motion_found = frame_sampler.motion_detected(current_frame_image)
+            if action == MOTION_CHECK and not motion_found:
+                frames_skipped_since_update += 1
+                frame_sampler.mark_skipped()
+                continue
+            frame_sampler.mark_sampled(current_frame_image)
+
+            processed_frames_overall += 1
+            with profiler.stage("motion_gate"):
+                inference_skipped = motion_gate is not None and \
+                    not motion_gate.should_infer(current_frame_image, have_previous_result=previous_frame_result is not None)
+            inference_ms = None
+            inference_start_time = inference_end_time = None
+            if inference_skipped:
+                detected_counts_by_zone_this_frame, ambulance_detected_by_zone_this_frame, general_outside_this_frame, ambulance_outside_this_frame = previous_frame_result
+            else:
+                inference_start_time = time.time()
+                inference_start = time.perf_counter()
+                detected_counts_by_zone_this_frame, ambulance_detected_by_zone_this_frame, general_outside_this_frame, ambulance_outside_this_frame = \
+                    _detect_in_zones(general_model, ambulance_model, current_frame_image, conf_threshold, device_str,
+                                     zone_names, zone_label_map, target_classes_set, ambulance_classes_set, profiler,
+                                     prompt_ambulance_classes_set, verify_crop_padding)
+                inference_ms = (time.perf_counter() - inference_start) * 1000.0
+                inference_end_time = time.time()
+                previous_frame_result = (detected_counts_by_zone_this_frame, ambulance_detected_by_zone_this_frame,
+                                         general_outside_this_frame, ambulance_outside_this_frame)
+
+            if priority_queue is not None and not inference_skipped:
+                # Ambulances bypass the lane channel so preemption does not wait for the GUI's queue poll
+                for zone_name in zone_names:
+                    if ambulance_detected_by_zone_this_frame[zone_name] and capture_time - last_alert_time.get(zone_name, 0.0) >= alert_repeat_s:
+                        last_alert_time[zone_name] = capture_time
+                        priority_queue.put({'type': 'ambulance_alert', 'approach': zone_name, 'camera': approach_name,
+                                            'frame_index': frame_index, 'capture': capture_time, 'sent': time.time()})
+
+            total_general_detections_outside_lane += general_outside_this_frame
+            total_ambulance_detections_outside_lane += ambulance_outside_this_frame
+            for zone_name in zone_names:
+                for class_name_detected, count in detected_counts_by_zone_this_frame[zone_name].items():
+                    total_counts_by_type_in_lane[zone_name][class_name_detected] += count
+
+            
+            trace = {'capture': capture_time, 'inference_start': inference_start_time, 'inference_end': inference_end_time}
+            queue_put_start = time.perf_counter()
+            for zone_name in zone_names:
+                detected_counts_by_type_this_frame = detected_counts_by_zone_this_frame[zone_name]
+                lane_message = {
                     'type': 'lane_update',
-                    'approach': approach_name,
+                    'approach': zone_name,
+                    'camera': approach_name,
                     'filename': video_filename,
                     'frame_index': frame_index,
-                    'in_lane_current_frame_agg': detected_in_lane_agg_this_frame,
+                    'in_lane_current_frame_agg': sum(detected_counts_by_type_this_frame.values()),
                     'counts_by_type': dict(detected_counts_by_type_this_frame),
-                    'ambulance_detected': ambulance_detected_this_frame_in_lane
-                })
+                    'ambulance_detected': ambulance_detected_by_zone_this_frame[zone_name],
+                    'sampling_every_n': frame_sampler.current_interval(),
+                    'inference_skipped': inference_skipped,
+                    'inference_skip_ratio': motion_gate.skip_ratio if motion_gate is not None else 0.0,
+                    'trace': trace,
+                    'decode_ms': decode_ms,
+                    'inference_ms': inference_ms,
+                    'frames_read_since_update': frames_read_since_update,
+                    'frames_skipped_since_update': frames_skipped_since_update,
+                    'inferences_since_update': 0 if inference_skipped else 1
+                }
+                if lane_update_filter is None:
+                    _put_lane_update(lane_sink, lane_message)
+                else:
+                    for outgoing_message in lane_update_filter.filter(lane_message, capture_time):
+                        _put_lane_update(lane_sink, outgoing_message)
+            profiler.add("queue_put", (time.perf_counter() - queue_put_start) * 1000.0)
+            frames_read_since_update = 0
+            frames_skipped_since_update = 0
+
+        if lane_update_filter is not None:
+            for pending_message in lane_update_filter.flush():
+                _put_lane_update(lane_sink, pending_message)
 
     except FileNotFoundError as fnf_error:
-        print(f"\n!!! [Worker {process_id} | {approach_name}] FNF ERROR: {fnf_error} !!!")
+        log.error("FNF ERROR: %s", fnf_error)
         error_occurred = True
-        results_queue.put({'type': 'error', 'approach': approach_name, 'filename': video_filename, 'message': str(fnf_error)})
-    except StopIteration:
-        print(f"[Worker {process_id} | {approach_name}] Video stream ended (StopIteration). Normal.")
+        _put_for_zones(results_queue, zone_names, {'type': 'error', 'camera': approach_name, 'filename': video_filename, 'message': str(fnf_error)})
     except Exception as e_proc:
-        print(f"\n!!! [Worker {process_id} | {approach_name}] PROCESSING ERROR: {e_proc} !!!")
-        traceback.print_exc()
+        log.exception("PROCESSING ERROR: %s", e_proc)
         error_occurred = True
-        results_queue.put({'type': 'error', 'approach': approach_name, 'filename': video_filename, 'message': f"Processing error: {e_proc}"})
+        _put_for_zones(results_queue, zone_names, {'type': 'error', 'camera': approach_name, 'filename': video_filename, 'message': f"Processing error: {e_proc}", 'restartable': True})
     finally:
+        if video_capture is not None: video_capture.release()
         processing_end_time = time.time(); total_processing_duration = processing_end_time - processing_start_time
-        actual_frames_read = frame_index + 1 if frame_index >= 0 else 0
+        actual_frames_read = max(0, frame_index + 1 - first_frame_index)
         avg_reading_fps = actual_frames_read / total_processing_duration if total_processing_duration > 0.01 else 0
         avg_processing_rate_fps = processed_frames_overall / total_processing_duration if total_processing_duration > 0.01 else 0
-        total_aggregate_general_vehicles_in_lane = sum(total_counts_by_type_in_lane.values())
+        profile_report, profile_path = None, None
+        if sampling_profiler is not None: sampling_profiler.stop()
+        if profiler.enabled:
+            try:
+                profile_report, profile_path = dump_profile(
+                    profile_options.get('output_dir', 'profiles'), approach_name, profiler, sampling_profiler,
+                    extra={'frames_read': actual_frames_read, 'frames_processed': processed_frames_overall,
+                           'avg_processing_rate_fps': avg_processing_rate_fps})
+                log.info("Profile written to %s", profile_path)
+            except OSError as e_profile:
+                log.warning("Could not write profile: %s", e_profile)
 
         if not error_occurred and video_processed_flag :
-            summary_data = {
-                'type': 'final_summary', 'approach': approach_name, 'filename': video_filename,
-                'total_frames_read': actual_frames_read, 'processed_frames_counted': processed_frames_overall,
-                'total_vehicles_in_lane_agg': total_aggregate_general_vehicles_in_lane,
-                'total_counts_by_type': dict(total_counts_by_type_in_lane),
-                'total_general_vehicles_outside_lane': total_general_detections_outside_lane,
-                'total_ambulances_outside_lane': total_ambulance_detections_outside_lane,
-                'processing_time_sec': total_processing_duration,
-                'avg_reading_fps': avg_reading_fps, 'avg_processing_rate_fps': avg_processing_rate_fps
-            }
-            results_queue.put(summary_data)
-            print(f"[Worker {process_id} | {approach_name}] Processing finished. Sent summary. Read {actual_frames_read} frames.")
+            for zone_name in zone_names:
+                summary_data = {
+                    'type': 'final_summary', 'approach': zone_name, 'camera': approach_name, 'filename': video_filename,
+                    'total_frames_read': actual_frames_read, 'processed_frames_counted': processed_frames_overall, 'start_frame': first_frame_index,
+                    'total_vehicles_in_lane_agg': sum(total_counts_by_type_in_lane[zone_name].values()),
+                    'total_counts_by_type': dict(total_counts_by_type_in_lane[zone_name]),
+                    'total_general_vehicles_outside_lane': total_general_detections_outside_lane,
+                    'total_ambulances_outside_lane': total_ambulance_detections_outside_lane,
+                    'processing_time_sec': total_processing_duration,
+                    'avg_reading_fps': avg_reading_fps, 'avg_processing_rate_fps': avg_processing_rate_fps,
+                    'motion_wakeups': frame_sampler.motion_wakeups,
+                    'inference_skipped_frames': motion_gate.frames_skipped if motion_gate is not None else 0,
+                    'suppressed_repeats': lane_update_filter.suppressed[zone_name] if lane_update_filter is not None else 0
+                }
+                if profile_report is not None:
+                    summary_data['profile'] = profile_report['stages']
+                    summary_data['profile_path'] = profile_path
+                results_queue.put(summary_data)
+            log.info("Processing finished. Sent summary for %s zone(s). Read %s frames.", len(zone_names), actual_frames_read)
         elif not error_occurred and not video_processed_flag and os.path.exists(video_path):
-             results_queue.put({ 'type': 'final_summary', 'approach': approach_name, 'filename': video_filename, 'total_frames_read': 0, 'processed_frames_counted': 0,
+             _put_for_zones(results_queue, zone_names, { 'type': 'final_summary', 'camera': approach_name, 'filename': video_filename, 'total_frames_read': 0, 'processed_frames_counted': 0,
                  'total_vehicles_in_lane_agg': 0, 'total_counts_by_type': {}, 'total_vehicles_outside': 0, 'total_ambulances_outside_lane':0,
                  'processing_time_sec': total_processing_duration, 'avg_reading_fps': 0, 'avg_processing_rate_fps': 0,
                  'message': 'Video stream did not start or yielded no frames.' })
-             print(f"[Worker {process_id} | {approach_name}] Video stream empty/failed. Sent empty summary.")
+             log.info("Video stream empty/failed. Sent empty summary.")
 
-        print(f"[Worker {process_id} | {approach_name}] Cleaning up models...")
+        log.info("Cleaning up models...")
         del general_model
         if ambulance_model: del ambulance_model
         if device_str == 'cuda':
-            try: torch.cuda.empty_cache(); print(f"[Worker {process_id} | {approach_name}] CUDA cache cleared.")
-            except Exception as cache_e: print(f"[Worker {process_id} | {approach_name}] Warning: Error clearing CUDA cache: {cache_e}")
-        print(f"[Worker {process_id} | {approach_name}] Exiting worker function.")
\ No newline at end of file
+            try: torch.cuda.empty_cache(); log.info("CUDA cache cleared.")
+            except Exception as cache_e: log.warning("Error clearing CUDA cache: %s", cache_e)
+        log.info("Exiting worker function.")
\ No newline at end of file
@@ -0,0 +1,65 @@
+# Imported only by the forkserver template (see WORKER_START_METHOD in main.py): workers forked from it inherit
+# warm torch/ultralytics/cv2 imports and the preloaded weights copy-on-write. Workers reach the cache via sys.modules.
+import logging
+import time
+import cv2
+import torch
+import ultralytics  # noqa: F401  (warm import for forked workers)
+import config
+import video_processor  # also a warm module in every forked worker
+from log_utils import LOGGER_ROOT, ConsoleFormatter, get_logger
+
+logger = get_logger("preload")
+PRELOADED_MODELS = {}
+
+
+def _load(model_name, classes, inference_mode="seg"):
+    model = video_processor.load_general_model(model_name, inference_mode, logger)
+    if classes:
+        model.set_classes(classes, model.get_text_pe(classes))
+    PRELOADED_MODELS[(model_name, tuple(classes), inference_mode)] = model
+
+
+def take_model(model_name, classes=(), inference_mode="seg"):
+    """ Returns (and removes from this process's cache) the preloaded model for `model_name`, `classes` and mode, or None. """
+    return PRELOADED_MODELS.pop((model_name, tuple(classes or ()), inference_mode), None)
+
+
+def _warm():
+    # The template process has no log queue (that is set up per worker), so report on the console while warming
+    console_handler = None
+    if not logging.getLogger(LOGGER_ROOT).handlers:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(ConsoleFormatter())
+        logger.addHandler(console_handler)
+        logger.setLevel(logging.INFO)
+    try:
+        _warm_models()
+    finally:
+        if console_handler is not None:
+            logger.removeHandler(console_handler)
+            logger.setLevel(logging.NOTSET)
+
+
+def _warm_models():
+    start = time.perf_counter()
+    default_threads = torch.get_num_threads()
+    # A single intra-op thread keeps the template from starting an OpenMP pool, which forked children could not reuse.
+    torch.set_num_threads(1)
+    try:
+        prompt_mode = config.AMBULANCE_DETECTION_MODE == "prompt"
+        if config.MODEL_NAME:
+            _load(config.MODEL_NAME, video_processor.general_prompt_classes(
+                list(config.TARGET_CLASSES or []), config.AMBULANCE_PROMPT_CLASSES if prompt_mode else ()), config.INFERENCE_MODE)
+        if config.AMBULANCE_MODEL_NAME and config.AMBULANCE_CLASS_NAMES and (not prompt_mode or config.AMBULANCE_VERIFY_WITH_MODEL):
+            _load(config.AMBULANCE_MODEL_NAME, [])
+    except Exception as e:
+        logger.warning("Model preload failed, workers will load their own weights: %s", e)
+    finally:
+        torch.set_num_threads(default_threads)
+    logger.info("Worker template ready in %.1fs (models: %s, cv2 %s).", time.perf_counter() - start,
+                [name for name, _, _ in PRELOADED_MODELS] or 'none', cv2.__version__)
+
+
+if config.WORKER_PRELOAD_MODELS:
+    _warm()
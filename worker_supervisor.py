@@ -0,0 +1,58 @@
+class WorkerSupervisor:
+    """
+    Restart bookkeeping for camera workers (GUI thread only). A dead worker is restarted after an exponential
+    backoff and resumes from the frame after its last reported frame_index. The backoff resets once a worker
+    has stayed up for `healthy_after_s`; after `max_restarts` consecutive failures the camera is given up.
+    """
+    def __init__(self, max_restarts=5, backoff_initial_s=1.0, backoff_max_s=60.0, healthy_after_s=120.0):
+        self.max_restarts = max_restarts
+        self.backoff_initial_s = backoff_initial_s
+        self.backoff_max_s = backoff_max_s
+        self.healthy_after_s = healthy_after_s
+        self.workers = {}
+
+    def register(self, camera_name, video_path, zone_polygons, started_at):
+        worker = self.workers.setdefault(camera_name, {'consecutive_failures': 0, 'total_restarts': 0, 'last_frame_index': -1})
+        worker.update({'video_path': video_path, 'zone_polygons': zone_polygons, 'started_at': started_at,
+                       'restart_at': None, 'given_up': False})
+
+    def record_progress(self, camera_name, frame_index, now):
+        worker = self.workers.get(camera_name)
+        if worker is None or frame_index is None: return
+        if frame_index > worker['last_frame_index']: worker['last_frame_index'] = frame_index
+        if worker['consecutive_failures'] and now - worker['started_at'] >= self.healthy_after_s:
+            worker['consecutive_failures'] = 0
+
+    def worker_died(self, camera_name, now):
+        """ Schedules a restart; returns the backoff delay in seconds, or None when the camera is given up. """
+        worker = self.workers.get(camera_name)
+        if worker is None or worker['given_up']: return None
+        if now - worker['started_at'] >= self.healthy_after_s:
+            worker['consecutive_failures'] = 0
+        if worker['consecutive_failures'] >= self.max_restarts:
+            worker['given_up'] = True
+            return None
+        delay = min(self.backoff_initial_s * (2 ** worker['consecutive_failures']), self.backoff_max_s)
+        worker['consecutive_failures'] += 1
+        worker['restart_at'] = now + delay
+        return delay
+
+    def can_restart(self, camera_name):
+        worker = self.workers.get(camera_name)
+        return worker is not None and not worker['given_up'] and worker['consecutive_failures'] < self.max_restarts
+
+    def due_restarts(self, now):
+        return [camera_name for camera_name, worker in self.workers.items()
+                if worker['restart_at'] is not None and now >= worker['restart_at']]
+
+    def restarted(self, camera_name, now):
+        worker = self.workers[camera_name]
+        worker['restart_at'] = None
+        worker['started_at'] = now
+        worker['total_restarts'] += 1
+
+    def resume_frame(self, camera_name):
+        return self.workers[camera_name]['last_frame_index'] + 1
+
+    def pending(self):
+        return any(worker['restart_at'] is not None for worker in self.workers.values())